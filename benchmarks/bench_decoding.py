@@ -0,0 +1,48 @@
+"""Micro-benchmark: decoding a kubectl pod list body with json.loads against eks_assistant.decoding.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_decoding [--pods 50000] [--repeat 5]
+"""
+import argparse
+import json
+import timeit
+
+from benchmarks.bench_parsing import synthetic_pods
+from eks_assistant import decoding
+from eks_assistant.parsing import parse_pods
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pods', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    options = parser.parse_args()
+
+    # What the Lambda sends after projection, plus the list metadata of a page
+    body = json.dumps({'kind': 'List', 'metadata': {'continue': ''}, 'items': synthetic_pods(options.pods)})
+    data = body.encode('utf-8')
+
+    cases = {
+        'json.loads': lambda: json.loads(data),
+        'json.loads + parse_pods': lambda: parse_pods(json.loads(data)['items']),
+    }
+    if decoding.orjson is not None:
+        cases['orjson'] = lambda: decoding.orjson.loads(data)
+        cases['orjson + parse_pods'] = lambda: parse_pods(decoding.orjson.loads(data)['items'])
+    if decoding.msgspec is not None:
+        typed = decoding.list_decoder('pods')
+        cases['msgspec typed'] = lambda: typed(data)
+        cases['msgspec typed + parse_pods'] = lambda: parse_pods(typed(data)['items'])
+
+    print(f"{options.pods} pods, {len(data) / 2 ** 20:.1f} MiB body, best of {options.repeat}")
+    baselines = {}
+    for name, case in cases.items():
+        best = min(timeit.repeat(case, number=1, repeat=options.repeat))
+        # Each case is compared with json.loads doing the same amount of work
+        baseline = baselines.setdefault(name.endswith('parse_pods'), best)
+        print(f"  {name:<30} {best * 1000:9.1f} ms  {baseline / best:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Micro-benchmark: bulk pod parsing (eks_assistant.parsing) against the per-item helpers it replaced.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_parsing [--pods 50000] [--repeat 5]
+"""
+import argparse
+import random
+import timeit
+from datetime import datetime, timedelta, UTC
+
+import pandas as pd
+
+from eks_assistant.parsing import ages, parse_pods
+from eks_assistant.tables import build_tables
+
+
+# The per-item helpers streamlit_app.py used before the bulk parser, kept verbatim as the baseline (apart from
+# calculate_age's `now`, which the equivalence check fixes so a minute boundary during the run can't split them)
+def check_pod_ready(pod):
+    """Check if pod is ready"""
+    container_statuses = pod.get("status", {}).get("containerStatuses", [])
+    if not container_statuses:
+        return "0/0"
+
+    ready_count = sum(1 for status in container_statuses if status.get("ready", False))
+    return f"{ready_count}/{len(container_statuses)}"
+
+
+def get_pod_restarts(pod):
+    """Get total pod restarts"""
+    container_statuses = pod.get("status", {}).get("containerStatuses", [])
+    if not container_statuses:
+        return 0
+
+    return sum(status.get("restartCount", 0) for status in container_statuses)
+
+
+def calculate_age(timestamp_str, now=None):
+    """Calculate age from timestamp"""
+    if not timestamp_str:
+        return ""
+
+    try:
+        created_time = datetime.strptime(timestamp_str, "%Y-%m-%dT%H:%M:%SZ")
+        # Use timezone-aware datetime
+        now = now or datetime.now(UTC)
+        diff = now - created_time.replace(tzinfo=UTC)
+
+        days = diff.days
+        hours, remainder = divmod(diff.seconds, 3600)
+        minutes, _ = divmod(remainder, 60)
+
+        if days > 0:
+            return f"{days}d"
+        elif hours > 0:
+            return f"{hours}h"
+        else:
+            return f"{minutes}m"
+    except Exception:
+        return ""
+
+
+def legacy_parse_pods(items, now=None):
+    pods_list = []
+    for pod in items:
+        pod_info = {
+            "name": pod.get("metadata", {}).get("name", ""),
+            "namespace": pod.get("metadata", {}).get("namespace", ""),
+            "status": pod.get("status", {}).get("phase", ""),
+            "ready": check_pod_ready(pod),
+            "restarts": get_pod_restarts(pod),
+            "age": calculate_age(pod.get("metadata", {}).get("creationTimestamp", ""), now),
+        }
+        pods_list.append(pod_info)
+    return pods_list
+
+
+def synthetic_pods(count, seed=0):
+    """Projected pod items, the shape the kubectl Lambda returns for the dashboard"""
+    rng = random.Random(seed)
+    now = datetime.now(UTC)
+    phases = ['Running'] * 8 + ['Pending', 'Failed', 'Succeeded']
+    pods = []
+    for i in range(count):
+        created = now - timedelta(seconds=rng.randrange(60, 90 * 86400))
+        pods.append({
+            'metadata': {'name': f'app-{i}-{rng.randrange(16 ** 5):05x}', 'namespace': f'team-{i % 200}',
+                         'creationTimestamp': created.strftime('%Y-%m-%dT%H:%M:%SZ')},
+            'status': {'phase': rng.choice(phases), 'containerStatuses': [
+                {'ready': rng.random() < 0.9, 'restartCount': rng.randrange(3)}
+                for _ in range(rng.randrange(1, 4))]},
+        })
+    return pods
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pods', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    options = parser.parse_args()
+
+    pods = synthetic_pods(options.pods)
+
+    # Same answers first: the bulk parser computes ages when the tables are built
+    now = datetime.now(UTC)
+    legacy = legacy_parse_pods(pods, now)
+    parsed = parse_pods(pods)
+    bulk_ages = ages(parsed['created'], pd.Timestamp(now))
+    assert [pod['ready'] for pod in legacy] == parsed['ready'].tolist()
+    assert [pod['restarts'] for pod in legacy] == parsed['restarts'].tolist()
+    assert [pod['age'] for pod in legacy] == bulk_ages.tolist()
+
+    cases = {
+        'per-item helpers (list of dicts)': lambda: legacy_parse_pods(pods),
+        'bulk parse_pods + ages': lambda: ages(parse_pods(pods)['created']),
+        'bulk parse_pods + build_tables': lambda: build_tables({'pods': parse_pods(pods)}),
+    }
+    print(f"{options.pods} pods, best of {options.repeat}")
+    baseline = None
+    for name, case in cases.items():
+        best = min(timeit.repeat(case, number=1, repeat=options.repeat))
+        baseline = baseline or best
+        print(f"  {name:<36} {best * 1000:9.1f} ms  {baseline / best:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""Micro-benchmark: pod name search with str.contains against eks_assistant.search.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_search [--pods 50000] [--repeat 20]
+"""
+import argparse
+import timeit
+
+from benchmarks.bench_parsing import synthetic_pods
+from eks_assistant.parsing import parse_pods
+from eks_assistant.search import NameIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pods', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=20)
+    options = parser.parse_args()
+
+    names = parse_pods(synthetic_pods(options.pods))['name']
+    build = min(timeit.repeat(lambda: NameIndex(names), number=1, repeat=3))
+    index = NameIndex(names)
+    print(f"{options.pods} pods, index built in {build * 1000:.1f} ms (once per snapshot), best of {options.repeat}")
+
+    # A prefix, short and long substrings, and one a user is still typing
+    sample = names.iloc[len(names) // 2]
+    for query in (sample[:2], sample[:3], sample[-6:], sample[:-1]):
+        scan = min(timeit.repeat(lambda: names[names.str.contains(query, case=False, regex=False)],
+                                 number=1, repeat=options.repeat))
+        indexed = min(timeit.repeat(lambda: index.contains(query), number=1, repeat=options.repeat))
+        prefix = min(timeit.repeat(lambda: index.startswith(query), number=1, repeat=options.repeat))
+        print(f"  {query!r:<28} str.contains {scan * 1000:7.2f} ms   contains {indexed * 1000:6.3f} ms"
+              f"   startswith {prefix * 1000:6.3f} ms   {len(index.contains(query)):6d} matches")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,13 @@
+import asyncio
+import logging
 import chainlit as cl
-from InlineAgent.agent import InlineAgent
 from InlineAgent.tools import MCPHttp
 import os
+import time
+from eks_assistant.inline_agent import StreamingInlineAgent
+from eks_assistant.mcp_pool import MCPConnectionPool
+from eks_assistant.startup import StartupTimings
+from eks_assistant.streaming import TextChunk, instrument, stream_reply
 from dotenv import load_dotenv
 
 
@@ -10,28 +16,68 @@ load_dotenv()
 # Configuration
 EC2_HOST = os.getenv('BASTION_HOST')
 MCP_PORT = os.getenv('MCP_PORT')
+MCP_URL = f"http://{EC2_HOST}:{MCP_PORT}/sse"
 EKS_CLUSTER = os.getenv("EKS_CLUSTER")
+# Shown as the chat starts instead of asking the model for a greeting
+WELCOME_MESSAGE = ("Hello! I'm your Kubernetes assistant for the **{cluster}** EKS cluster. Ask me about its "
+                   "namespaces, pods, nodes, deployments or services, or ask me to run kubectl for you.")
+
+# MCP connections opened per server while chats' calls overlap; beyond that, chats share them
+MCP_POOL_SIZE = int(os.getenv('MCP_POOL_SIZE', '4'))
+# Seconds an unused pooled connection stays open, and between health checks of idle ones
+MCP_POOL_IDLE_SECONDS = float(os.getenv('MCP_POOL_IDLE_SECONDS', '300'))
+MCP_HEALTH_CHECK_SECONDS = float(os.getenv('MCP_HEALTH_CHECK_SECONDS', '30'))
+
+logger = logging.getLogger(__name__)
+
+
+async def open_mcp_connection(url):
+    """Open one pooled connection to the Kubernetes MCP server, reporting its tool calls to streamed turns"""
+    mcp_client = await MCPHttp.create(
+        url=url,
+        headers={},
+        timeout=10,
+        sse_read_timeout=300
+    )
+    instrument(mcp_client)
+    return mcp_client
+
+
+# MCP connections shared by every chat; each chat's agent borrows them call by call
+mcp_pool = MCPConnectionPool(open_mcp_connection, size=MCP_POOL_SIZE, idle_timeout=MCP_POOL_IDLE_SECONDS,
+                             health_interval=MCP_HEALTH_CHECK_SECONDS)
+# Task checking the pool's connections, started with the first chat
+health_checks = None
+
+
+async def connect_mcp(timings):
+    """Make sure the pool has a live connection to the Kubernetes MCP server and return this chat's client"""
+    with timings.phase('mcp_connect'):
+        async with mcp_pool.lease(MCP_URL):
+            pass
+    return mcp_pool.client(MCP_URL)
 
-# Global variables
-agent = None
-mcp_client = None
 
+def start_connecting(timings):
+    """Start connecting to the MCP server in the background, unless this chat already is"""
+    global health_checks
+    if health_checks is None:
+        health_checks = asyncio.create_task(mcp_pool.run_health_checks())
+    if cl.user_session.get("mcp_connection") is None:
+        cl.user_session.set("mcp_connection", asyncio.create_task(connect_mcp(timings)))
 
-async def initialize_agent():
-    """Initialize the MCP client and InlineAgent"""
-    global agent, mcp_client
 
+async def initialize_agent():
+    """Build this chat's agent the first time it is needed, on the MCP connection started with the chat"""
+    timings = cl.user_session.get("startup_timings") or StartupTimings()
     try:
-        # Configure connection to the Kubernetes MCP server
-        mcp_client = await MCPHttp.create(
-            url=f"http://{EC2_HOST}:{MCP_PORT}/sse",
-            headers={},
-            timeout=10,
-            sse_read_timeout=300
-        )
+        start_connecting(timings)
+        mcp_client = await cl.user_session.get("mcp_connection")
+        cl.user_session.set("mcp_client", mcp_client)
 
-        # Create the InlineAgent with the MCP client
-        agent = InlineAgent(
+        # Create the agent with the MCP client; its replies are streamed as the model writes them
+        started = time.perf_counter()
+        agent = StreamingInlineAgent(
             foundation_model="us.anthropic.claude-3-5-haiku-20241022-v1:0",
             instruction="""You are a Kubernetes cluster management assistant that helps users manage their EKS cluster.
             You have access to various kubectl commands through an MCP server.
@@ -47,23 +93,24 @@ async def initialize_agent():
                 }
             ]
         )
+        timings.record('agent_build', started)
+        logger.info("Startup timings: %s", timings.rows())
 
+        cl.user_session.set("agent", agent)
         return agent
     except Exception as e:
+        # Connect again on the next attempt
+        cl.user_session.set("mcp_connection", None)
         # Send error message
         await cl.Message(f"Error initializing agent: {str(e)}").send()
         return None
 
 
-async def close_mcp_client():
-    """Close the MCP client connection"""
-    global mcp_client
-    if mcp_client:
-        try:
-            await mcp_client.aclose()
-        except Exception:
-            pass
-        mcp_client = None
+def reset_agent():
+    """Drop this chat's agent so the next question builds it again; the pooled connections stay open"""
+    cl.user_session.set("agent", None)
+    cl.user_session.set("mcp_client", None)
+    cl.user_session.set("mcp_connection", None)
 
 
 @cl.on_chat_start
@@ -79,34 +126,20 @@ async def start_chat():
                      f"- MCP Port: `{MCP_PORT}`\n"
                      f"- Cluster: `{EKS_CLUSTER}`").send()
 
-    # Initialize the agent
-    await cl.Message("Initializing Kubernetes assistant...").send()
-
-    global agent
-    agent = await initialize_agent()
-
-    if agent:
-        await cl.Message("✅ Kubernetes assistant initialized successfully!").send()
+    # Connect to the MCP server while the user reads and types; the agent is built on the first question
+    timings = StartupTimings()
+    cl.user_session.set("startup_timings", timings)
+    start_connecting(timings)
 
-        # Initial greeting from the assistant
-        try:
-            initial_response = await agent.invoke(
-                "Hello! I'm your Kubernetes assistant. How can I help you with your EKS cluster today?"
-            )
-            await cl.Message(initial_response).send()
-        except Exception as e:
-            await cl.Message(f"Error: {str(e)}").send()
-    else:
-        await cl.Message("⚠️ Failed to initialize Kubernetes assistant.").send()
+    # Initial greeting, without a round trip to the model
+    await cl.Message(WELCOME_MESSAGE.format(cluster=EKS_CLUSTER)).send()
 
 
 @cl.on_message
 async def on_message(message: cl.Message):
     """Handle user messages"""
-    global agent
-
+    agent = cl.user_session.get("agent")
     if not agent:
-        await cl.Message("Initializing agent...").send()
         agent = await initialize_agent()
 
         if not agent:
@@ -114,24 +147,47 @@ async def on_message(message: cl.Message):
                 "⚠️ Failed to initialize the Kubernetes assistant. Please check your connection settings.").send()
             return
 
-        await cl.Message("✅ Agent initialized successfully!").send()
-
-    # Process the message
+    # Process the message, showing each tool call as a step while it runs and then the reply
+    response = cl.Message("")
+    steps = {}
     try:
-        # Let the user know we're processing
-        processing_msg = await cl.Message("Processing your request...").send()
+        async for event in stream_reply(agent, message.content, [cl.user_session.get("mcp_client")]):
+            if isinstance(event, TextChunk):
+                await response.stream_token(event.text)
+            else:
+                await show_tool_call(event, steps)
 
-        # Get response from agent
-        response = await agent.invoke(message.content)
-
-        # Send the response as a new message
-        await cl.Message(response).send()
+        await response.send()
 
     except Exception as e:
         await cl.Message(f"⚠️ Error: {str(e)}").send()
 
 
+async def show_tool_call(call, steps):
+    """Show an MCP tool call as a step when it starts, and its result and duration when it ends"""
+    if call not in steps:
+        step = cl.Step(name=call.name, type="tool")
+        step.input = call.arguments
+        step.start = call.started_at.isoformat()
+        steps[call] = step
+        await step.send()
+    if call.done:
+        step = steps[call]
+        step.output = call.error or call.output
+        step.is_error = call.error is not None
+        step.end = call.finished_at.isoformat()
+        await step.update()
+
+
 @cl.on_stop
 async def on_stop():
     """Clean up when the chat stops"""
-    await close_mcp_client()
\ No newline at end of file
+    reset_agent()
+
+
+@cl.on_app_shutdown
+async def on_app_shutdown():
+    """Close the pooled MCP connections"""
+    if health_checks is not None:
+        health_checks.cancel()
+    await mcp_pool.close()
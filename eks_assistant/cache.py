@@ -0,0 +1,124 @@
+"""Process-wide cache shared by every dashboard session"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class SharedCache:
+    """Cache of loader results with per-call TTLs, stale-while-revalidate and single-flight loads.
+
+    A value younger than its TTL is returned straight away. An older one is returned straight away too,
+    while a single background refresh replaces it; only values more than max_stale seconds past their
+    TTL are waited for. Concurrent gets of a key that is already loading wait for that load instead of
+    starting their own.
+
+    get_many() does the same for several keys, loading all of those that need it in one loader call.
+
+    Loaders are called with the value they replace (None on a first load), so they can revalidate it
+    instead of fetching it again. They run on other threads and must not touch session state.
+    """
+
+    def __init__(self, max_stale=300, max_entries=256, refresh_workers=4, clock=time.monotonic):
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (value, loaded_at), least recently used first
+        self._entries = OrderedDict()
+        # key -> Future of the load in progress
+        self._loading = {}
+        self._refresher = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="cache-refresh")
+
+    def get(self, key, loader, ttl, stale=True):
+        """Return the value cached under key, loading it with loader() when there is none young enough.
+
+        With stale=False a value past its TTL is never served: the caller waits for it to be revalidated,
+        as a poller that must publish current data does.
+        """
+        value = self.get_many({key: (ttl, stale)}, lambda previous: {key: loader(previous[key])})[key]
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    def get_many(self, requests, loader):
+        """get() for several keys at once, loading all those that need it with one loader() call.
+
+        requests maps each key to its (ttl, stale). loader is called with {key: previous value} for the keys
+        to load and returns {key: value or exception}; a key it fails (or raises for) is not cached.
+        Returns {key: value or exception} for every requested key.
+        """
+        results, waiting, loads, refreshes = {}, {}, {}, {}
+        with self._lock:
+            for key, (ttl, stale) in requests.items():
+                entry = self._entries.get(key)
+                age = self._clock() - entry[1] if entry else None
+                if entry and age < ttl:
+                    self._entries.move_to_end(key)
+                    results[key] = entry[0]
+                    continue
+
+                future = self._loading.get(key)
+                owner = future is None
+                if owner:
+                    future = self._loading[key] = Future()
+                waiting[key] = future
+                previous = entry[0] if entry else None
+
+                if stale and entry and age < ttl + self.max_stale:
+                    if owner:
+                        refreshes[key] = (previous, future)
+                    results[key] = entry[0]
+                    del waiting[key]
+                elif owner:
+                    loads[key] = (previous, future)
+
+        if loads:
+            # There is a load to wait for anyway: refresh the stale keys in the same call
+            self._load(loader, {**refreshes, **loads})
+            for key, (_, future) in refreshes.items():
+                if future.exception() is None:
+                    results[key] = future.result()
+        elif refreshes:
+            self._refresher.submit(self._load, loader, refreshes)
+        for key, future in waiting.items():
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                results[key] = e
+        return results
+
+    def invalidate(self, key=None):
+        """Forget one cached value, or all of them"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def _load(self, loader, loads):
+        """Load {key: (previous, future)} with one loader() call and settle each key's future"""
+        try:
+            values = loader({key: previous for key, (previous, _) in loads.items()})
+        except BaseException as e:
+            values = {key: e for key in loads}
+
+        with self._lock:
+            for key in loads:
+                value = values.get(key, KeyError(key))
+                if isinstance(value, BaseException):
+                    # A failed refresh keeps the stale value; the next get tries again
+                    continue
+                self._entries[key] = (value, self._clock())
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            for key in loads:
+                del self._loading[key]
+
+        for key, (_, future) in loads.items():
+            value = values.get(key, KeyError(key))
+            if isinstance(value, BaseException):
+                future.set_exception(value)
+            else:
+                future.set_result(value)
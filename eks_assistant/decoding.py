@@ -0,0 +1,163 @@
+"""Fast decoding of kubectl JSON bodies into the typed shapes the dashboard parses.
+
+orjson and msgspec are optional. With msgspec, a list body is decoded in one pass straight into the
+shapes below: plain dicts holding only the declared fields, type checked on the way. Without it the
+body is decoded by orjson (or the stdlib json module) into full dicts, which the parsers read the same
+way. Both are much faster than json.loads.
+"""
+import json
+import logging
+from typing import Dict, List, TypedDict
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+logger = logging.getLogger(__name__)
+
+
+def loads(data):
+    """json.loads, by orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class Metadata(TypedDict, total=False):
+    name: str
+    namespace: str
+    creationTimestamp: str
+    labels: Dict[str, str]
+
+
+ListMetadata = TypedDict('ListMetadata', {'continue': str, 'remainingItemCount': int, 'resourceVersion': str},
+                         total=False)
+
+
+class ContainerStatus(TypedDict, total=False):
+    ready: bool
+    restartCount: int
+
+
+class PodStatus(TypedDict, total=False):
+    phase: str
+    containerStatuses: List[ContainerStatus]
+
+
+class Pod(TypedDict, total=False):
+    metadata: Metadata
+    status: PodStatus
+
+
+class NodeCondition(TypedDict, total=False):
+    type: str
+    status: str
+
+
+class NodeAddress(TypedDict, total=False):
+    type: str
+    address: str
+
+
+class NodeInfo(TypedDict, total=False):
+    kubeletVersion: str
+
+
+class NodeStatus(TypedDict, total=False):
+    conditions: List[NodeCondition]
+    nodeInfo: NodeInfo
+    addresses: List[NodeAddress]
+    capacity: Dict[str, str]
+
+
+class Node(TypedDict, total=False):
+    metadata: Metadata
+    status: NodeStatus
+
+
+class DeploymentSpec(TypedDict, total=False):
+    replicas: int
+
+
+class DeploymentStatus(TypedDict, total=False):
+    availableReplicas: int
+    readyReplicas: int
+
+
+class Deployment(TypedDict, total=False):
+    metadata: Metadata
+    spec: DeploymentSpec
+    status: DeploymentStatus
+
+
+class ServicePort(TypedDict, total=False):
+    port: int
+    targetPort: object  # a port number or a port name
+    protocol: str
+
+
+class ServiceSpec(TypedDict, total=False):
+    type: str
+    clusterIP: str
+    ports: List[ServicePort]
+
+
+class LoadBalancerIngress(TypedDict, total=False):
+    hostname: str
+    ip: str
+
+
+class LoadBalancerStatus(TypedDict, total=False):
+    ingress: List[LoadBalancerIngress]
+
+
+class ServiceStatus(TypedDict, total=False):
+    loadBalancer: LoadBalancerStatus
+
+
+class Service(TypedDict, total=False):
+    metadata: Metadata
+    spec: ServiceSpec
+    status: ServiceStatus
+
+
+class Namespace(TypedDict, total=False):
+    metadata: Metadata
+
+
+ITEM_SHAPES = {
+    'namespaces': Namespace,
+    'pods': Pod,
+    'nodes': Node,
+    'deployments': Deployment,
+    'services': Service,
+}
+
+_decoders = {}
+
+
+def list_decoder(kind):
+    """Decoder for a kind's list body: bytes -> {'items': [...], 'metadata': {...}}"""
+    if msgspec is None or kind not in ITEM_SHAPES:
+        return loads
+    if kind not in _decoders:
+        shape = TypedDict(f'{ITEM_SHAPES[kind].__name__}List',
+                          {'items': List[ITEM_SHAPES[kind]], 'metadata': ListMetadata}, total=False)
+        decoder = msgspec.json.Decoder(shape)
+
+        def decode(data):
+            try:
+                return decoder.decode(data)
+            except msgspec.ValidationError as e:
+                # A field with an unexpected type (e.g. null); the parsers cope with whatever loads gives
+                logger.warning("Decoding a %s list into its typed shape failed (%s), decoding it untyped", kind, e)
+                return loads(data)
+
+        _decoders[kind] = decode
+    return _decoders[kind]
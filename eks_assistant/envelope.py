@@ -0,0 +1,72 @@
+"""Client side of the kubectl Lambda response envelope"""
+import base64
+import gzip
+import urllib.request
+
+from eks_assistant.decoding import loads
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Highest envelope version this client understands; sent as `Envelope` in every request
+ENVELOPE_VERSION = 1
+
+# Encodings this client can decode, in order of preference
+ACCEPT_ENCODING = ['zstd', 'gzip'] if zstandard is not None else ['gzip']
+
+
+class NotModified:
+    """Marker for an output that is unchanged since the ETag the caller sent as IfNoneMatch"""
+
+    def __init__(self, etag, metadata=None):
+        self.etag = etag
+        # list metadata (continue token, remainingItemCount) of an unchanged page
+        self.metadata = metadata or {}
+
+
+def output_etag(output):
+    """Content hash the Lambda computed for an enveloped output, to send back as IfNoneMatch"""
+    if isinstance(output, dict):
+        return output.get('ETag')
+    return None
+
+
+def decode_output(output, if_none_match=None, decode=loads):
+    """Turn a kubectl Lambda output into its final value.
+
+    JSON bodies are parsed exactly once, straight from the (decompressed) bytes, by decode (for instance
+    eks_assistant.decoding.list_decoder(kind), to get typed items); plain text bodies
+    are returned as strings, and unchanged outputs as a NotModified marker. An output whose ETag equals
+    if_none_match is not decoded at all and comes back as NotModified too, the same as if the Lambda had
+    compared it. Outputs from a Lambda that predates envelopes are returned unchanged.
+    """
+    if not isinstance(output, dict) or 'Envelope' not in output:
+        return output
+    if output['Envelope'] > ENVELOPE_VERSION:
+        raise ValueError(f"Unsupported kubectl response envelope version {output['Envelope']}")
+    if output.get('NotModified') or (if_none_match and output.get('ETag') == if_none_match):
+        return NotModified(output['ETag'], output.get('Metadata'))
+
+    encoding = output.get('Encoding', 'identity')
+    if 'Location' in output:
+        with urllib.request.urlopen(output['Location']) as response:
+            data = response.read()
+    elif encoding == 'identity':
+        data = output['Body'].encode('utf-8')
+    else:
+        data = base64.b64decode(output['Body'])
+
+    if encoding == 'gzip':
+        data = gzip.decompress(data)
+    elif encoding == 'zstd':
+        if zstandard is None:
+            raise ValueError("Received a zstd-compressed kubectl response but zstandard is not installed")
+        data = zstandard.ZstdDecompressor().decompress(data, max_output_size=output.get('Size', 0))
+    elif encoding != 'identity':
+        raise ValueError(f"Unsupported kubectl response encoding {encoding}")
+
+    if output.get('ContentType') == 'application/json':
+        return decode(data)
+    return data.decode('utf-8')
@@ -0,0 +1,106 @@
+"""Bounded history of compact snapshot summaries, for trend charts.
+
+Each sample keeps only counts: pods per namespace and status, and restarts per namespace. They are
+held in fixed-depth numpy arrays used as a ring buffer, so memory does not grow with the number of
+polls. Namespaces and statuses are columns; columns that are zero across the whole window are dropped
+when new ones are added, so they do not grow with the cluster's history either.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+class SnapshotHistory:
+    """The last `depth` summaries of a cluster's snapshots; recorded on the poller thread, read by sessions"""
+
+    def __init__(self, depth=240):
+        self.depth = depth
+        self._lock = threading.Lock()
+        self._times = np.zeros(depth, dtype='datetime64[s]')
+        self._namespaces = []
+        self._statuses = []
+        # sample, namespace, status -> pods
+        self._pods = np.zeros((depth, 0, 0), dtype=np.int32)
+        # sample, namespace -> restarts summed over its pods
+        self._restarts = np.zeros((depth, 0), dtype=np.int64)
+        self._next = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def record(self, taken_at, tables):
+        """Add a summary of a snapshot's tables (eks_assistant.tables.ResourceTables)"""
+        counts = tables.pod_status_counts
+        counts = counts[counts['count'] > 0]
+        restarts = tables.pods.groupby('namespace', observed=True)['restarts'].sum()
+        restarts = restarts[restarts > 0]
+
+        with self._lock:
+            self._add_columns(list(counts['namespace'].astype(str)) + list(restarts.index.astype(str)),
+                              list(counts['status'].astype(str)))
+            namespace_column = {namespace: column for column, namespace in enumerate(self._namespaces)}
+            status_column = {status: column for column, status in enumerate(self._statuses)}
+
+            row = self._next
+            self._times[row] = np.datetime64(pd.Timestamp(taken_at).tz_convert(None), 's')
+            self._pods[row] = 0
+            self._pods[row, [namespace_column[str(namespace)] for namespace in counts['namespace']],
+                       [status_column[str(status)] for status in counts['status']]] = counts['count'].to_numpy()
+            self._restarts[row] = 0
+            self._restarts[row, [namespace_column[str(namespace)] for namespace in restarts.index]] = (
+                restarts.to_numpy())
+            self._next = (row + 1) % self.depth
+            self._size = min(self._size + 1, self.depth)
+
+    def pods(self, by='status', namespace=None):
+        """time, <by>, count of pods per sample, by 'status' or 'namespace', over one namespace or all of them"""
+        with self._lock:
+            rows = self._rows()
+            pods, namespaces = self._pods[rows], self._namespaces
+            if namespace is not None:
+                keep = [column for column, name in enumerate(namespaces) if name == namespace]
+                pods, namespaces = pods[:, keep], [namespace] * len(keep)
+            if by == 'status':
+                return self._long(self._times[rows], pods.sum(axis=1), self._statuses, 'status', 'count')
+            return self._long(self._times[rows], pods.sum(axis=2), namespaces, 'namespace', 'count')
+
+    def restarts(self):
+        """time, namespace, restarts (total over the namespace's pods) per sample"""
+        with self._lock:
+            rows = self._rows()
+            return self._long(self._times[rows], self._restarts[rows], self._namespaces, 'namespace', 'restarts')
+
+    def _rows(self):
+        """Ring positions of the samples, oldest first"""
+        return (np.arange(self._size) + self._next - self._size) % self.depth
+
+    def _add_columns(self, namespaces, statuses):
+        new_namespaces = sorted(set(namespaces) - set(self._namespaces))
+        new_statuses = sorted(set(statuses) - set(self._statuses))
+        if not new_namespaces and not new_statuses:
+            return
+
+        # Forget namespaces and statuses that have no pods or restarts left in the window, not counting the
+        # oldest sample when it is about to be overwritten
+        rows = self._rows()[1:] if self._size == self.depth else self._rows()
+        keep_namespaces = np.flatnonzero(self._pods[rows].any(axis=(0, 2)) | self._restarts[rows].any(axis=0))
+        keep_statuses = np.flatnonzero(self._pods[rows].any(axis=(0, 1)))
+        self._namespaces = [self._namespaces[column] for column in keep_namespaces] + new_namespaces
+        self._statuses = [self._statuses[column] for column in keep_statuses] + new_statuses
+
+        pods = np.zeros((self.depth, len(self._namespaces), len(self._statuses)), dtype=np.int32)
+        pods[:, :len(keep_namespaces), :len(keep_statuses)] = self._pods[:, keep_namespaces][:, :, keep_statuses]
+        restarts = np.zeros((self.depth, len(self._namespaces)), dtype=np.int64)
+        restarts[:, :len(keep_namespaces)] = self._restarts[:, keep_namespaces]
+        self._pods, self._restarts = pods, restarts
+
+    @staticmethod
+    def _long(times, values, names, column, value):
+        """(samples x names) values as rows of time, name, value for charting"""
+        return pd.DataFrame({
+            'time': np.repeat(times, len(names)),
+            column: np.tile(np.array(names, dtype=object), len(times)),
+            value: values.reshape(-1),
+        })
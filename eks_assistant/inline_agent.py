@@ -0,0 +1,167 @@
+"""A Bedrock inline agent over MCP tools whose final response is streamed as the model writes it.
+
+It stands in for InlineAgent, taking the same foundation_model, instruction, agent_name and action_groups
+(each with its mcp_clients). Like InlineAgent, it lists each client's tools as a return-control action
+group and runs the tool calls the agent hands back. It differs in turning on streamFinalResponse, so
+stream() yields the reply's text in chunks as they arrive, not all at once at the end of the turn.
+Tool calls go through the clients' sessions, so instrument() reports them as usual.
+"""
+import asyncio
+import json
+import uuid
+
+import boto3
+
+# Parameter types a Bedrock function schema accepts; other JSON schema types are sent as strings
+PARAMETER_TYPES = {'string', 'number', 'integer', 'boolean', 'array'}
+
+# Event stream members that report a failed turn instead of carrying part of it
+ERROR_EVENTS = ('accessDeniedException', 'badGatewayException', 'conflictException', 'dependencyFailedException',
+                'internalServerException', 'resourceNotFoundException', 'serviceQuotaExceededException',
+                'throttlingException', 'validationException')
+
+
+class StreamingInlineAgent:
+    """A Bedrock inline agent whose tools are MCP clients' tools, keeping one agent session across turns"""
+
+    def __init__(self, foundation_model, instruction, agent_name, action_groups, client=None):
+        self.foundation_model = foundation_model
+        self.instruction = instruction
+        self.agent_name = agent_name
+        self.action_groups = action_groups
+        self.session_id = str(uuid.uuid4())
+        self._client = client or boto3.client('bedrock-agent-runtime')
+        # (action group, function) -> the MCP client serving it, once the tools have been listed
+        self._tools = None
+        self._schemas = None
+
+    async def invoke(self, prompt):
+        """The whole reply to prompt"""
+        return "".join([text async for text in self.stream(prompt)])
+
+    async def stream(self, prompt):
+        """Async iterator of the reply's text as the model writes it, after the turn's tool calls"""
+        if self._schemas is None:
+            await self._list_tools()
+        request = {'inputText': prompt}
+        while request is not None:
+            returned, request = request, None
+            async for event in self._events(returned):
+                if 'chunk' in event:
+                    text = event['chunk'].get('bytes', b'').decode('utf-8')
+                    if text:
+                        yield text
+                elif 'returnControl' in event:
+                    request = {'inlineSessionState': await self._run_tools(event['returnControl'])}
+                else:
+                    for name in ERROR_EVENTS:
+                        if name in event:
+                            raise RuntimeError(f"{name}: {event[name].get('message', event[name])}")
+
+    async def _list_tools(self):
+        tools, schemas = {}, []
+        for group in self.action_groups:
+            functions = []
+            for client in group.get('mcp_clients', []):
+                listed = await getattr(client, 'session', client).list_tools()
+                for tool in listed.tools:
+                    tools[group['name'], tool.name] = client
+                    functions.append(function_schema(tool))
+            schemas.append({
+                'actionGroupName': group['name'],
+                'description': group.get('description', ''),
+                'actionGroupExecutor': {'customControl': 'RETURN_CONTROL'},
+                'functionSchema': {'functions': functions},
+            })
+        self._tools, self._schemas = tools, schemas
+
+    async def _run_tools(self, control):
+        """Call the tools the agent handed back; returns the session state that gives it their results"""
+        results = []
+        for invocation in control.get('invocationInputs', []):
+            call = invocation['functionInvocationInput']
+            group, name = call['actionGroup'], call['function']
+            client = self._tools.get((group, name))
+            if client is None:
+                text, failed = f"Unknown tool {name}", True
+            else:
+                arguments = {parameter['name']: parameter_value(parameter) for parameter in call.get('parameters', [])}
+                try:
+                    result = await getattr(client, 'session', client).call_tool(name, arguments)
+                except Exception as e:
+                    text, failed = str(e), True
+                else:
+                    content = getattr(result, 'content', None) or []
+                    text = "\n".join(getattr(item, 'text', '') or '' for item in content) or str(result)
+                    failed = bool(getattr(result, 'isError', False))
+            function_result = {'actionGroup': group, 'function': name, 'responseBody': {'TEXT': {'body': text}}}
+            if failed:
+                function_result['responseState'] = 'FAILURE'
+            results.append({'functionResult': function_result})
+        return {'invocationId': control['invocationId'], 'returnControlInvocationResults': results}
+
+    async def _events(self, request):
+        """The completion events of one invoke_inline_agent call, read on a worker thread as they arrive"""
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+        finished = object()
+        request = dict(
+            request,
+            sessionId=self.session_id,
+            foundationModel=self.foundation_model,
+            instruction=self.instruction,
+            agentName=self.agent_name,
+            actionGroups=self._schemas,
+            streamingConfigurations={'streamFinalResponse': True},
+        )
+
+        def read():
+            try:
+                for event in self._client.invoke_inline_agent(**request)['completion']:
+                    loop.call_soon_threadsafe(events.put_nowait, event)
+            except Exception as e:
+                loop.call_soon_threadsafe(events.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(events.put_nowait, finished)
+
+        reader = loop.run_in_executor(None, read)
+        while (event := await events.get()) is not finished:
+            if isinstance(event, Exception):
+                raise event
+            yield event
+        await reader
+
+
+def function_schema(tool):
+    """The Bedrock function definition of an MCP tool, from its input JSON schema"""
+    schema = getattr(tool, 'inputSchema', None) or {}
+    required = set(schema.get('required', []))
+    parameters = {
+        name: {
+            'type': spec.get('type') if spec.get('type') in PARAMETER_TYPES else 'string',
+            'description': spec.get('description') or spec.get('title') or name,
+            'required': name in required,
+        }
+        for name, spec in schema.get('properties', {}).items()
+    }
+    function = {'name': tool.name, 'description': tool.description or tool.name}
+    if parameters:
+        function['parameters'] = parameters
+    return function
+
+
+def parameter_value(parameter):
+    """A tool argument from the string value Bedrock sends for a function parameter"""
+    value, kind = parameter.get('value', ''), parameter.get('type', 'string')
+    try:
+        if kind == 'integer':
+            return int(value)
+        if kind == 'number':
+            return float(value)
+        if kind == 'array':
+            return json.loads(value)
+    except ValueError:
+        return value
+    if kind == 'boolean':
+        return value.lower() == 'true'
+    return value
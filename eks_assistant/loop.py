@@ -0,0 +1,62 @@
+"""One long-lived asyncio event loop on its own thread, for code that is not async itself"""
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundLoop:
+    """An event loop running forever on a daemon thread.
+
+    Coroutines are submitted from any thread and come back as concurrent.futures.Future objects, so a
+    caller can wait for the result, poll it, or go on with other work. Objects bound to the loop (MCP
+    connections, agents) must only be used from coroutines running on it.
+    """
+
+    def __init__(self, name="background-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, coro):
+        """Schedule a coroutine on the loop; returns a concurrent.futures.Future of its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the loop and wait for its result (never call this from the loop itself)"""
+        if self.in_loop():
+            raise RuntimeError("BackgroundLoop.run() would block its own loop; await the coroutine instead")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def in_loop(self):
+        """Whether the caller is running on the loop's thread"""
+        return threading.current_thread() is self._thread
+
+    def stop(self, timeout=5):
+        """Cancel what is still running and stop the loop"""
+        if not self._thread.is_alive():
+            return
+
+        async def cancel_tasks():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        try:
+            self.submit(cancel_tasks()).result(timeout)
+        except Exception:
+            logger.exception("Cancelling the tasks of %s failed", self._thread.name)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+        self.loop.close()
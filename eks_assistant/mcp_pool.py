@@ -0,0 +1,301 @@
+"""A pool of MCP client connections per server URL, shared by every chat session.
+
+Sessions hand their agent a PooledMCPClient instead of a connection of their own; each of its calls
+borrows a connection for just that call. The pool opens up to `size` connections per URL while calls
+overlap and shares them beyond that (MCP multiplexes requests over one connection). Connections that
+have not been used for `idle_timeout` seconds are closed, idle ones are pinged every `health_interval`
+seconds, and one whose SSE stream has dropped is replaced by a fresh connection.
+
+Every connection is opened and closed by a task of its own: MCP clients hold anyio task groups that
+must be exited by the task that entered them, which a health check or another session is not.
+"""
+import asyncio
+import inspect
+import logging
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+
+async def ping(client):
+    """Default health check: an MCP ping over the client's session (or the client, if it is one)"""
+    await getattr(client, 'session', client).send_ping()
+
+
+async def close(client):
+    """Default close: the client's aclose() or, failing that, cleanup()"""
+    for name in ('aclose', 'cleanup'):
+        if callable(getattr(client, name, None)):
+            await getattr(client, name)()
+            return
+
+
+@dataclass(eq=False)
+class _Connection:
+    url: str
+    client: object
+    closing: asyncio.Event
+    task: asyncio.Task
+    last_used: float
+    # When it last answered a ping; -inf makes the next borrower check it first
+    checked_at: float
+    leases: int = 0
+    discarded: bool = False
+
+    @property
+    def dropped(self):
+        """Whether its task has ended, i.e. the connection closed or its transport failed"""
+        return self.task.done()
+
+
+@dataclass
+class _Stats:
+    opened: int = 0
+    closed: int = 0
+    evicted: int = 0
+    reconnected: int = 0
+    failed_checks: int = 0
+
+
+class MCPConnectionPool:
+    """MCP connections by server URL, opened with `await connect(url)`.
+
+    Everything but the constructor must run on one event loop: the loop the connections live on.
+    """
+
+    def __init__(self, connect, size=4, idle_timeout=300, health_interval=30, health_timeout=5,
+                 ping=ping, close=close, clock=time.monotonic):
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self._connect = connect
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self._ping = ping
+        self._close = close
+        self._clock = clock
+        self._connections = defaultdict(list)
+        # The client last opened per URL, to read attributes from while no connection is open
+        self._latest = {}
+        self._locks = defaultdict(asyncio.Lock)
+        self._stats = _Stats()
+
+    def client(self, url):
+        """An MCP client for `url` whose every call goes over a connection borrowed from this pool"""
+        return PooledMCPClient(self, url)
+
+    @asynccontextmanager
+    async def lease(self, url):
+        """Borrow a connection to `url` for the block; yields the MCP client"""
+        connection = await self._acquire(url)
+        try:
+            yield connection.client
+        except Exception:
+            # The call may have failed because the connection did; check it before it is used again
+            connection.checked_at = float('-inf')
+            raise
+        finally:
+            self._release(connection)
+
+    async def check(self):
+        """One health pass: close idle connections, ping the others and replace those that dropped"""
+        for url in list(self._connections):
+            async with self._locks[url]:
+                connections = self._connections[url]
+                dropped = False
+                for connection in list(connections):
+                    if connection.leases:
+                        continue
+                    if self._clock() - connection.last_used > self.idle_timeout:
+                        self._stats.evicted += 1
+                        self._discard(connection)
+                    elif not await self._healthy(connection, self.health_interval):
+                        dropped = True
+                        self._discard(connection)
+                if dropped and not connections:
+                    try:
+                        await self._open(url)
+                        self._stats.reconnected += 1
+                    except Exception:
+                        # The next borrower tries again
+                        logger.exception("Reconnecting to MCP server %s failed", url)
+
+    async def run_health_checks(self):
+        """check() every `health_interval` seconds until cancelled"""
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check()
+            except Exception:
+                logger.exception("MCP connection health check failed")
+
+    async def close(self, timeout=5):
+        """Close every connection, waiting up to `timeout` seconds for them to finish closing"""
+        tasks = []
+        for connections in self._connections.values():
+            for connection in list(connections):
+                tasks.append(connection.task)
+                self._discard(connection, force=True)
+        self._connections.clear()
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+
+    def stats(self):
+        """Per URL: connections open, calls in flight, and counts of what the pool has done so far"""
+        return {
+            'connections': {url: len(connections) for url, connections in self._connections.items() if connections},
+            'leases': {url: sum(connection.leases for connection in connections)
+                       for url, connections in self._connections.items() if connections},
+            'opened': self._stats.opened,
+            'closed': self._stats.closed,
+            'evicted': self._stats.evicted,
+            'reconnected': self._stats.reconnected,
+            'failed_checks': self._stats.failed_checks,
+        }
+
+    async def _acquire(self, url):
+        async with self._locks[url]:
+            connections = self._connections[url]
+            while True:
+                for connection in [connection for connection in connections if connection.dropped]:
+                    self._discard(connection)
+                free = [connection for connection in connections if not connection.leases]
+                if free:
+                    # The most recently used, so the others can go idle and be closed
+                    connection = max(free, key=lambda connection: connection.last_used)
+                    if not await self._healthy(connection, self.health_interval):
+                        self._discard(connection)
+                        continue
+                elif len(connections) < self.size:
+                    connection = await self._open(url)
+                else:
+                    connection = min(connections, key=lambda connection: connection.leases)
+                connection.leases += 1
+                connection.last_used = self._clock()
+                return connection
+
+    def _release(self, connection):
+        connection.leases -= 1
+        connection.last_used = self._clock()
+        if connection.discarded and not connection.leases:
+            connection.closing.set()
+
+    async def _healthy(self, connection, max_age):
+        """Whether a connection is up, pinging it if it has not answered one for `max_age` seconds"""
+        if connection.dropped:
+            self._stats.failed_checks += 1
+            return False
+        if self._clock() - connection.checked_at <= max_age:
+            return True
+        try:
+            await asyncio.wait_for(self._ping(connection.client), self.health_timeout)
+        except Exception as e:
+            self._stats.failed_checks += 1
+            logger.warning("MCP connection to %s failed its health check: %r", connection.url, e)
+            return False
+        connection.checked_at = self._clock()
+        return True
+
+    async def _open(self, url):
+        """Open a connection in a task that holds it until it is discarded, then closes it"""
+        opened = asyncio.get_running_loop().create_future()
+        closing = asyncio.Event()
+
+        async def hold():
+            try:
+                client = await self._connect(url)
+            except asyncio.CancelledError:
+                opened.cancel()
+                raise
+            except Exception as e:
+                opened.set_exception(e)
+                return
+            opened.set_result(client)
+            try:
+                await closing.wait()
+            finally:
+                self._stats.closed += 1
+                try:
+                    await self._close(client)
+                except Exception as e:
+                    logger.warning("Closing MCP connection to %s failed: %r", url, e)
+
+        task = asyncio.create_task(hold(), name=f"mcp-connection {url}")
+        try:
+            client = await opened
+        except BaseException:
+            closing.set()
+            raise
+        now = self._clock()
+        connection = _Connection(url, client, closing, task, last_used=now, checked_at=now)
+        self._connections[url].append(connection)
+        self._latest[url] = client
+        self._stats.opened += 1
+        return connection
+
+    def _discard(self, connection, force=False):
+        """Take a connection out of the pool; it is closed once the calls it is serving are done"""
+        if connection in self._connections.get(connection.url, ()):
+            self._connections[connection.url].remove(connection)
+        connection.discarded = True
+        if force or not connection.leases:
+            connection.closing.set()
+
+
+# ClientSession's requests, which can be proxied before the pool has opened a connection to look at
+ASYNC_METHODS = frozenset({
+    'call_tool', 'list_tools', 'list_resources', 'list_resource_templates', 'read_resource',
+    'subscribe_resource', 'unsubscribe_resource', 'list_prompts', 'get_prompt', 'complete',
+    'send_ping', 'send_progress_notification', 'send_roots_list_changed', 'set_logging_level',
+})
+
+
+class PooledMCPClient:
+    """Stands in for an MCP client: each coroutine method borrows a connection from the pool for the call.
+
+    `session` stands in the same way for the connections' ClientSession. Other attributes are read from
+    a pooled connection as they are, or from the last one opened while none is (e.g. after eviction).
+    The connections belong to the pool, so aclose() leaves them open.
+    """
+
+    def __init__(self, pool, url, path=()):
+        self._pool = pool
+        self._url = url
+        self._path = path
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        if name == 'session' and not self._path:
+            self.session = PooledMCPClient(self._pool, self._url, ('session',))
+            return self.session
+        if name not in ASYNC_METHODS:
+            connection = next(iter(self._pool._connections.get(self._url, ())), None)
+            client = connection.client if connection is not None else self._pool._latest.get(self._url)
+            if client is None:
+                raise AttributeError(f"{name!r} can't be looked up before a connection to {self._url} is opened")
+            value = getattr(self._resolve(client), name)
+            if not inspect.iscoroutinefunction(value):
+                return value
+
+        async def call(*args, **kwargs):
+            async with self._pool.lease(self._url) as client:
+                return await getattr(self._resolve(client), name)(*args, **kwargs)
+
+        call.__name__ = name
+        return call
+
+    async def aclose(self):
+        """Nothing to close: the pool keeps the connections for other sessions"""
+
+    def _resolve(self, client):
+        for name in self._path:
+            client = getattr(client, name)
+        return client
+
+    def __repr__(self):
+        return f"PooledMCPClient({self._url!r})"
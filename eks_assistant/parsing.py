@@ -0,0 +1,187 @@
+"""Bulk parsing of (projected) Kubernetes list items into columns.
+
+Each parse_* function reads every field it needs in one pass over the items and leaves the per-row
+arithmetic (container counts, timestamps, quantities) to numpy and pandas.
+"""
+import numpy as np
+import pandas as pd
+
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+# Multiplier of each Kubernetes quantity suffix to the base unit (cores, bytes)
+QUANTITY_SUFFIXES = {
+    'n': 1e-9, 'u': 1e-6, 'm': 1e-3, '': 1.0,
+    'k': 1e3, 'M': 1e6, 'G': 1e9, 'T': 1e12, 'P': 1e15, 'E': 1e18,
+    'Ki': 2.0 ** 10, 'Mi': 2.0 ** 20, 'Gi': 2.0 ** 30, 'Ti': 2.0 ** 40, 'Pi': 2.0 ** 50, 'Ei': 2.0 ** 60,
+}
+QUANTITY_PATTERN = r'^\s*([+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)([a-zA-Z]*)\s*$'
+
+
+def timestamps(values):
+    """creationTimestamp strings as UTC datetimes; NaT where missing or malformed"""
+    # numpy parses ISO 8601 several times faster than pd.to_datetime; only hand it the exact format
+    strict = [value[:-1] if isinstance(value, str) and len(value) == 20 and value[-1] == 'Z' else None
+              for value in values]
+    try:
+        parsed = np.array(strict, dtype='datetime64[s]')
+    except ValueError:
+        # Something shaped like a timestamp that isn't one; let pandas sort them out one by one
+        return pd.to_datetime(pd.Series(values, dtype=object), format=TIMESTAMP_FORMAT, utc=True, errors='coerce')
+    return pd.Series(parsed).dt.tz_localize('UTC')
+
+
+def ages(created, now=None):
+    """Age of each timestamp as '3d', '5h' or '12m' (only the largest unit); '' where it is unknown"""
+    now = pd.Timestamp.now(tz='UTC') if now is None else now
+    diff = now - created
+    days = diff.dt.days.fillna(0).astype('int64')
+    seconds = diff.dt.seconds.fillna(0).astype('int64')
+    hours, minutes = seconds // 3600, seconds % 3600 // 60
+
+    value = np.where(days > 0, days, np.where(hours > 0, hours, minutes))
+    unit = np.where(days > 0, 'd', np.where(hours > 0, 'h', 'm'))
+    age = [f"{number}{suffix}" for number, suffix in zip(value.tolist(), unit.tolist())]
+    return pd.Series(np.where(created.isna(), '', age), index=created.index, dtype=object)
+
+
+def quantities(values):
+    """Kubernetes quantities ('250m', '2', '7869548Ki', '1G', '1e3') in base units; NaN when unparsable"""
+    parts = pd.Series(values, dtype=object).astype('string').str.extract(QUANTITY_PATTERN)
+    numbers = pd.to_numeric(parts[0], errors='coerce')
+    return (numbers * parts[1].map(QUANTITY_SUFFIXES).astype('float64')).astype('float64')
+
+
+def cpu_millicores(values):
+    """CPU quantities in millicores"""
+    return quantities(values) * 1000
+
+
+def memory_bytes(values):
+    """Memory quantities in bytes, binary (Ki, Mi, Gi) and decimal (k, M, G) suffixes alike"""
+    return quantities(values)
+
+
+def parse_namespaces(items):
+    """Namespace names"""
+    return [name for name in ((item.get("metadata") or {}).get("name") for item in items) if name]
+
+
+def parse_pods(items):
+    """Pod table: name, namespace, status, ready ("ready/total" containers), restarts, created"""
+    metadata = [item.get("metadata") or {} for item in items]
+    statuses = [item.get("status") or {} for item in items]
+    containers = [status.get("containerStatuses") or () for status in statuses]
+
+    # One row per container, tagged with the index of its pod, summed back per pod
+    totals = np.fromiter(map(len, containers), dtype=np.int64, count=len(items))
+    owners = np.repeat(np.arange(len(items)), totals)
+    flat = [container for pod_containers in containers for container in pod_containers]
+    ready = np.bincount(owners, weights=[bool(container.get("ready")) for container in flat],
+                        minlength=len(items)).astype(np.int64)
+    restarts = np.bincount(owners, weights=[container.get("restartCount") or 0 for container in flat],
+                           minlength=len(items)).astype(np.int64)
+
+    return pd.DataFrame({
+        "name": [meta.get("name", "") for meta in metadata],
+        "namespace": [meta.get("namespace", "") for meta in metadata],
+        "status": [status.get("phase", "") for status in statuses],
+        "ready": pd.Series(ready, dtype=str) + "/" + pd.Series(totals, dtype=str),
+        "restarts": restarts,
+        "created": timestamps([meta.get("creationTimestamp") for meta in metadata]),
+    })
+
+
+def parse_nodes(items):
+    """Node table, with capacities in base units next to the quantities as reported"""
+    metadata = [item.get("metadata") or {} for item in items]
+    statuses = [item.get("status") or {} for item in items]
+    labels = [meta.get("labels") or {} for meta in metadata]
+    capacity = [status.get("capacity") or {} for status in statuses]
+
+    cpu = [node.get("cpu", "") for node in capacity]
+    memory = [node.get("memory", "") for node in capacity]
+    return pd.DataFrame({
+        "name": [meta.get("name", "") for meta in metadata],
+        "status": [node_status(status) for status in statuses],
+        "roles": [node_roles(node_labels) for node_labels in labels],
+        "created": timestamps([meta.get("creationTimestamp") for meta in metadata]),
+        "version": [(status.get("nodeInfo") or {}).get("kubeletVersion", "") for status in statuses],
+        "internal_ip": [internal_ip(status) for status in statuses],
+        "instance_type": [node_labels.get("node.kubernetes.io/instance-type", "") for node_labels in labels],
+        "cpu_capacity": cpu,
+        "memory_capacity": memory,
+        "cpu_millicores": cpu_millicores(cpu),
+        "memory_bytes": memory_bytes(memory),
+    })
+
+
+def parse_deployments(items):
+    """Deployment table"""
+    metadata = [item.get("metadata") or {} for item in items]
+    specs = [item.get("spec") or {} for item in items]
+    statuses = [item.get("status") or {} for item in items]
+    return pd.DataFrame({
+        "name": [meta.get("name", "") for meta in metadata],
+        "namespace": [meta.get("namespace", "") for meta in metadata],
+        "desired_replicas": [spec.get("replicas", 0) for spec in specs],
+        "available_replicas": [status.get("availableReplicas", 0) for status in statuses],
+        "ready_replicas": [status.get("readyReplicas", 0) for status in statuses],
+        "created": timestamps([meta.get("creationTimestamp") for meta in metadata]),
+    })
+
+
+def parse_services(items):
+    """Service table"""
+    metadata = [item.get("metadata") or {} for item in items]
+    specs = [item.get("spec") or {} for item in items]
+    return pd.DataFrame({
+        "name": [meta.get("name", "") for meta in metadata],
+        "namespace": [meta.get("namespace", "") for meta in metadata],
+        "type": [spec.get("type", "") for spec in specs],
+        "cluster_ip": [spec.get("clusterIP", "") for spec in specs],
+        "external_ip": [external_ip(item) for item in items],
+        "ports": [format_ports(spec.get("ports") or []) for spec in specs],
+        "created": timestamps([meta.get("creationTimestamp") for meta in metadata]),
+    })
+
+
+def node_status(status):
+    for condition in status.get("conditions") or []:
+        if condition.get("type") == "Ready" and condition.get("status") != "True":
+            return "NotReady"
+    return "Ready"
+
+
+def node_roles(labels):
+    """Node roles from node-role.kubernetes.io/<role> labels"""
+    roles = [label.split("/")[1] for label in labels if label.startswith("node-role.kubernetes.io/")]
+    return ", ".join(roles) if roles else "worker"
+
+
+def internal_ip(status):
+    for address in status.get("addresses") or []:
+        if address.get("type") == "InternalIP":
+            return address.get("address", "")
+    return ""
+
+
+def external_ip(service):
+    """External IP address (or hostname) of a LoadBalancer service"""
+    if (service.get("spec") or {}).get("type") == "LoadBalancer":
+        ingress = ((service.get("status") or {}).get("loadBalancer") or {}).get("ingress") or []
+        if ingress:
+            return ingress[0].get("hostname", "") or ingress[0].get("ip", "")
+    return "N/A"
+
+
+def format_ports(ports):
+    """Service ports as port[:targetPort]/protocol"""
+    port_strings = []
+    for port in ports:
+        port_str = f"{port.get('port', '')}"
+        if "targetPort" in port:
+            port_str += f":{port.get('targetPort', '')}"
+        port_str += f"/{port.get('protocol', 'TCP')}"
+        port_strings.append(port_str)
+
+    return ", ".join(port_strings)
@@ -0,0 +1,152 @@
+"""Pod search: an n-gram index over pod names, built once per snapshot, and a small query syntax.
+
+A query is whitespace separated terms, all of which must match:
+
+    web            name contains "web" (case-insensitive)
+    ^web           name starts with "web"
+    ns:default     in namespace default (ns: may be repeated to allow several)
+    status:failed  in status Failed (likewise)
+    restarts>3     restart count compared with >, >=, <, <=, = or :
+"""
+import bisect
+import operator
+import re
+
+import numpy as np
+
+GRAM_SIZES = (1, 2, 3)
+COMPARISONS = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le, '=': operator.eq,
+               ':': operator.eq}
+RESTARTS_PATTERN = re.compile(r'^restarts(>=|<=|>|<|=|:)(\d+)$', re.IGNORECASE)
+
+
+class NameIndex:
+    """Every 1-, 2- and 3-byte gram of a list of names (lowercased, UTF-8), with the rows containing it.
+
+    Substrings of up to three bytes are answered by one posting list; longer ones by intersecting the
+    posting lists of their trigrams and checking the few remaining candidates. Prefixes are a range of
+    the names in sorted order.
+    """
+
+    def __init__(self, names):
+        self._text = [str(name).lower().encode() for name in names]
+        lengths = np.fromiter(map(len, self._text), dtype=np.int64, count=len(self._text))
+
+        # All names back to back, with the row and the end of its name for every byte: memory follows the
+        # total length of the names, not their number times the longest one
+        characters = np.frombuffer(b''.join(self._text), dtype=np.uint8).astype(np.uint64)
+        row_of = np.repeat(np.arange(len(self._text), dtype=np.uint64), lengths)
+        end_of = np.repeat(np.cumsum(lengths), lengths)
+
+        # (gram << 32 | row) for every gram of every name, sorted and deduplicated, split into posting lists
+        keys = []
+        for size in GRAM_SIZES:
+            starts = np.arange(len(characters) - size + 1)
+            if not len(starts):
+                break
+            grams = np.full(len(starts), size, dtype=np.uint64)
+            for offset in range(size):
+                grams = grams << 8 | characters[offset:offset + len(starts)]
+            within = starts + size <= end_of[:len(starts)]
+            keys.append((grams << 32 | row_of[:len(starts)])[within])
+        keys = np.concatenate(keys) if keys else np.empty(0, dtype=np.uint64)
+        keys.sort()
+        keys = keys[np.r_[True, keys[1:] != keys[:-1]]] if len(keys) else keys
+
+        grams = keys >> 32
+        starts = np.flatnonzero(np.r_[True, grams[1:] != grams[:-1]]) if len(keys) else np.empty(0, dtype=np.int64)
+        self._grams = grams[starts]
+        self._bounds = np.r_[starts, len(keys)]
+        self._rows = (keys & 0xFFFFFFFF).astype(np.int32)
+
+        # Names in sorted order, for prefixes
+        self._order = np.array(sorted(range(len(self._text)), key=self._text.__getitem__), dtype=np.int32)
+        self._sorted = [self._text[row] for row in self._order.tolist()]
+
+    def __len__(self):
+        return len(self._text)
+
+    def postings(self, gram):
+        """Sorted rows whose name contains a gram of at most three bytes"""
+        code = len(gram)
+        for byte in gram:
+            code = code << 8 | byte
+        position = np.searchsorted(self._grams, np.uint64(code))
+        if position == len(self._grams) or self._grams[position] != code:
+            return self._rows[:0]
+        return self._rows[self._bounds[position]:self._bounds[position + 1]]
+
+    def contains(self, text):
+        """Sorted rows whose name contains text, ignoring case"""
+        needle = text.lower().encode()
+        if not needle:
+            return np.arange(len(self._text), dtype=np.int32)
+        if len(needle) <= max(GRAM_SIZES):
+            return self.postings(needle)
+
+        size = max(GRAM_SIZES)
+        lists = sorted((self.postings(needle[i:i + size]) for i in range(len(needle) - size + 1)), key=len)
+        candidates = lists[0]
+        for rows in lists[1:]:
+            if len(candidates) <= 64:
+                break
+            candidates = np.intersect1d(candidates, rows, assume_unique=True)
+        # Trigrams can all be present without being in a row
+        text = self._text
+        return np.array([row for row in candidates.tolist() if needle in text[row]], dtype=np.int32)
+
+    def startswith(self, text):
+        """Sorted rows whose name starts with text, ignoring case"""
+        prefix = text.lower().encode()
+        low = bisect.bisect_left(self._sorted, prefix)
+        # 0xff never occurs in UTF-8, so this is past every name starting with the prefix
+        high = bisect.bisect_left(self._sorted, prefix + b'\xff', low)
+        return np.sort(self._order[low:high])
+
+
+def parse_query(query):
+    """Split a search query into name terms, prefixes and filters; raises ValueError for malformed ones"""
+    parsed = {'contains': [], 'prefixes': [], 'namespaces': set(), 'statuses': set(), 'restarts': []}
+    for term in query.split():
+        field, _, value = term.partition(':')
+        comparison = RESTARTS_PATTERN.match(term)
+        if comparison:
+            parsed['restarts'].append((COMPARISONS[comparison.group(1)], int(comparison.group(2))))
+        elif term.lower().startswith('restarts') and term[len('restarts'):][:1] in ('>', '<', '=', ':'):
+            raise ValueError(f"Can't compare restarts in '{term}'; use e.g. restarts>3")
+        elif value and field.lower() in ('ns', 'namespace'):
+            parsed['namespaces'].add(value.lower())
+        elif value and field.lower() == 'status':
+            parsed['statuses'].add(value.lower())
+        elif term.startswith('^') and len(term) > 1:
+            parsed['prefixes'].append(term[1:])
+        else:
+            parsed['contains'].append(term)
+    return parsed
+
+
+def search_pods(pods, index, query):
+    """Rows of the pods table (by position) matching a query, in table order"""
+    parsed = parse_query(query)
+    matches = np.ones(len(pods), dtype=bool)
+
+    for text in parsed['contains']:
+        matches &= _mask(index.contains(text), len(pods))
+    for text in parsed['prefixes']:
+        matches &= _mask(index.startswith(text), len(pods))
+    # Categorical columns compare by code, so these cost one pass over small integers
+    for column, wanted in (('namespace', parsed['namespaces']), ('status', parsed['statuses'])):
+        if wanted:
+            categories = pods[column].cat.categories
+            codes = [code for code, category in enumerate(categories) if str(category).lower() in wanted]
+            matches &= np.isin(pods[column].cat.codes.to_numpy(), codes)
+    for compare, count in parsed['restarts']:
+        matches &= compare(pods['restarts'].to_numpy(), count)
+
+    return np.flatnonzero(matches)
+
+
+def _mask(rows, length):
+    mask = np.zeros(length, dtype=bool)
+    mask[rows] = True
+    return mask
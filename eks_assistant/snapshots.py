@@ -0,0 +1,298 @@
+"""Cluster resource snapshots kept current by one background poller per cluster"""
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, UTC
+from types import MappingProxyType
+from typing import Any, Mapping, Optional
+
+import pandas as pd
+
+from eks_assistant.decoding import list_decoder
+from eks_assistant.envelope import NotModified, decode_output, output_etag
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """One version of a cluster's parsed resources, shared by every session reading it and never modified"""
+    version: int
+    # kind -> parsed table (or list of names), read-only by convention
+    resources: Mapping[str, Any]
+    taken_at: datetime
+    # False while the first snapshot is still being paged in
+    complete: bool = True
+    # kind -> error message, for kinds whose fetch failed (their previous items are kept)
+    errors: Mapping[str, str] = field(default_factory=dict)
+    # Metrics of the kubectl Lambda invocations behind this version
+    metrics: tuple = ()
+    # What the poller's derive function made of the resources (the resource monitor's tables), if any
+    tables: Any = None
+
+
+class SnapshotPoller:
+    """Background thread that rebuilds a cluster's snapshot every `interval` seconds.
+
+    `build(previous, publish)` fetches and parses the resources and calls
+    `publish(resources, complete=True, errors=None, metrics=())` with them, possibly several times
+    (with complete=False) to show progress. It runs on the poller thread and must not touch session state.
+
+    `derive(resources)`, when given, runs once per published version on the poller thread, and its
+    result is kept as the snapshot's tables. `on_snapshot(snapshot)`, when given, is called with every
+    complete snapshot once it is published, also on the poller thread.
+
+    With `wanted` (the keys to load at first), the build is called as `build(previous, publish, wanted)`
+    and only has to load those keys; readers ask for more with want(), which polls at once for new ones.
+    Keys asked for with want() are dropped again once nobody has asked for them for `forget_after`
+    seconds, so readers keep asking for what they show; the initial keys are always loaded.
+
+    Readers call current(); when nobody has done so for `idle_after` seconds, the interval doubles on
+    every poll up to `max_interval`, and the next read brings it back with an immediate poll. After
+    `stop_after` seconds without readers the thread exits, until the next read starts it again.
+    """
+
+    def __init__(self, build, interval=15, idle_after=60, max_interval=300, stop_after=None, wanted=None,
+                 forget_after=None, derive=None, on_snapshot=None, clock=time.monotonic):
+        self.interval = interval
+        self.idle_after = idle_after
+        self.max_interval = max_interval
+        self.stop_after = stop_after
+        self.forget_after = forget_after
+        self.error = None
+        self._build = build
+        self._wanted = None if wanted is None else frozenset(wanted)
+        # key -> when a reader last asked for it with want()
+        self._asked = {}
+        self._derive = derive
+        self._on_snapshot = on_snapshot
+        self._clock = clock
+        self._changed = threading.Condition()
+        self._wake = threading.Event()
+        self._snapshot = None
+        self._last_read = clock()
+        self._idle_polls = 0
+        self._thread = None
+        self._stopped = False
+
+    def current(self) -> Optional[Snapshot]:
+        """The latest snapshot (None before the first one), starting the poller on first use"""
+        self._touch()
+        return self._snapshot
+
+    def wait(self, after_version=0, timeout=None, has=()) -> Optional[Snapshot]:
+        """Block until a snapshot newer than after_version (and with resources for every key in has) is
+        published, or the timeout passes"""
+        self._touch()
+        with self._changed:
+            self._changed.wait_for(lambda: self._snapshot and self._snapshot.version > after_version
+                                   and all(key in self._snapshot.resources for key in has), timeout)
+            return self._snapshot
+
+    def want(self, *keys):
+        """Have the builds of the next `forget_after` seconds load these keys too; returns whether any of
+        them are new"""
+        self._touch()
+        with self._changed:
+            new = frozenset(keys) - self._wanted_keys()
+            self._asked.update(dict.fromkeys(keys, self._clock()))
+        if new:
+            self._wake.set()
+        return bool(new)
+
+    def refresh(self):
+        """Poll now instead of at the end of the current interval"""
+        self._touch()
+        self._wake.set()
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+    def delay(self):
+        """Seconds until the next poll"""
+        if self._clock() - self._last_read < self.idle_after:
+            return self.interval
+        return min(self.interval * 2 ** self._idle_polls, self.max_interval)
+
+    def _touch(self):
+        with self._changed:
+            was_idle = self._idle_polls > 0
+            self._last_read = self._clock()
+            self._idle_polls = 0
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="snapshot-poller", daemon=True)
+                self._thread.start()
+        if was_idle:
+            # Someone is looking again; don't make them wait out a backed-off interval
+            self._wake.set()
+
+    def _wanted_keys(self):
+        """The keys builds load now, forgetting those nobody has asked for lately; call holding _changed"""
+        if self.forget_after is not None:
+            now = self._clock()
+            self._asked = {key: at for key, at in self._asked.items() if now - at < self.forget_after}
+        return self._wanted | frozenset(self._asked)
+
+    def _publish(self, resources, complete=True, errors=None, metrics=()):
+        resources = MappingProxyType(dict(resources))
+        tables = self._derive(resources) if self._derive else None
+        with self._changed:
+            version = self._snapshot.version + 1 if self._snapshot else 1
+            self._snapshot = Snapshot(
+                version=version,
+                resources=resources,
+                taken_at=datetime.now(UTC),
+                complete=complete,
+                errors=MappingProxyType(dict(errors or {})),
+                metrics=tuple(metrics),
+                tables=tables,
+            )
+            snapshot = self._snapshot
+            self._changed.notify_all()
+        if complete and self._on_snapshot:
+            try:
+                self._on_snapshot(snapshot)
+            except Exception:
+                # The snapshot is published regardless
+                logger.exception("Handling a new cluster snapshot failed")
+
+    def _run(self):
+        while not self._stopped:
+            try:
+                if self._wanted is None:
+                    self._build(self._snapshot, self._publish)
+                else:
+                    with self._changed:
+                        wanted = self._wanted_keys()
+                    self._build(self._snapshot, self._publish, wanted)
+                self.error = None
+            except Exception as e:
+                logger.exception("Building a cluster snapshot failed")
+                self.error = e
+
+            with self._changed:
+                if self.stop_after is not None and self._clock() - self._last_read >= self.stop_after:
+                    # Nobody is looking; the next read starts a new thread
+                    self._thread = None
+                    return
+
+            delay = self.delay()
+            if self._clock() - self._last_read >= self.idle_after:
+                self._idle_polls += 1
+            self._wake.wait(delay)
+            self._wake.clear()
+
+
+def snapshot_builder(load_first, load_page, commands, parsers):
+    """Build function for a SnapshotPoller of a cluster's resource lists, fetched through the kubectl Lambda.
+
+    `load_first(commands)` runs {kind: command} (the first page of paged kinds) in one batch invocation and
+    returns {kind: {'Output': ..., 'Metrics': ...} or the exception it failed with}.
+    `load_page(key, command, continue_token, etag)` fetches a later page ('pods#n') the same way, sending
+    etag as IfNoneMatch, and raises when it fails. `commands` maps each kind to its kubectl command and
+    `parsers` each kind to the function turning its items into a table.
+
+    Runs on the poller thread, so it never touches the page or session state. Only the kinds sessions have
+    asked for are fetched. Kinds whose output has the ETag of the one parsed last time keep their parsed
+    items. Pods are listed page by page; the first build with pods publishes them as they come in, and a
+    build in which any page fails keeps the previous pods whole rather than a truncated list.
+    """
+    # ETags and pod pages of the last build, kept together: a page is only reused while its ETag matches
+    parsed = {'etags': {}, 'pod_pages': []}
+
+    def build(previous, publish, wanted):
+        known = parsed['etags'] if previous else {}
+        before = previous.resources if previous else {}
+        etags, errors, metrics = {}, {}, []
+
+        def resource_output(key, result):
+            if isinstance(result, Exception):
+                errors[key.split('#')[0]] = str(result)
+                return None, {}
+            # The kinds fetched in one batch share its metrics
+            if result.get('Metrics') and not any(seen is result['Metrics'] for seen in metrics):
+                metrics.append(result['Metrics'])
+            output = result['Output']
+            etags[key] = output_etag(output)
+            list_metadata = output.get('Metadata') if isinstance(output, dict) else None
+            return decode_output(output, known.get(key), list_decoder(key.split('#')[0])), list_metadata or {}
+
+        # Fetch every wanted resource kind at once
+        results = load_first({kind: command for kind, command in commands.items() if kind in wanted})
+
+        resources = {}
+        for kind in results:
+            if kind == 'pods':
+                continue
+            output, _ = resource_output(kind, results[kind])
+            if isinstance(output, NotModified) or (output is None and kind in before):
+                # Unchanged (or failed) since the last build: keep the items we already parsed
+                resources[kind] = before[kind]
+            else:
+                resources[kind] = parsers[kind](output.get("items", []) if output else [])
+
+        # Process pods data one page at a time; the first build with pods shows them as they come in
+        pod_pages = []
+        page_key = 'pods'
+        pods_page, page_metadata = None, {}
+        if page_key in results:
+            pods_page, page_metadata = resource_output(page_key, results.pop(page_key))
+        results = None
+        while pods_page is not None:
+            if isinstance(pods_page, NotModified) and len(pod_pages) < len(parsed['pod_pages']):
+                pod_pages.append(parsed['pod_pages'][len(pod_pages)])
+            elif isinstance(pods_page, NotModified):
+                # Nothing to reuse for this page; forget its ETag so the next build parses it
+                etags.pop(page_key, None)
+                errors['pods'] = f"Page {len(pod_pages) + 1} of the pod list is unchanged but was never parsed"
+                break
+            else:
+                pod_pages.append(parsers['pods'](pods_page.get("items", [])))
+                # A shared, revalidated page keeps its old body; the envelope has the current token
+                page_metadata = page_metadata or pods_page.get("metadata", {})
+
+            continue_token = page_metadata.get("continue")
+            if not continue_token:
+                break
+            if 'pods' not in before:
+                publish(dict(resources, pods=pd.concat(pod_pages, ignore_index=True)),
+                        complete=False, errors=errors, metrics=metrics)
+
+            # Drop the raw page before fetching the next one
+            pods_page = None
+            page_key = f"pods#{len(pod_pages)}"
+            try:
+                # Continuation pages are never cached, so the ETag the page was parsed with is the one to send
+                result = load_page(page_key, commands['pods'], continue_token, known.get(page_key))
+            except Exception as e:
+                result = e
+            pods_page, page_metadata = resource_output(page_key, result)
+            result = None
+
+        if 'pods' in errors:
+            # Some page is missing: keep the last whole list, and the pages and ETags it was parsed from
+            if 'pods' in before:
+                resources['pods'] = before['pods']
+            elif pod_pages:
+                resources['pods'] = pd.concat(pod_pages, ignore_index=True)
+            else:
+                resources['pods'] = parsers['pods']([])
+            etags = {key: etag for key, etag in etags.items() if key.split('#')[0] != 'pods'}
+            etags.update((key, etag) for key, etag in known.items()
+                         if key.split('#')[0] == 'pods' and _page_number(key) < len(parsed['pod_pages']))
+            pod_pages = parsed['pod_pages']
+        elif 'pods' in wanted:
+            resources['pods'] = pd.concat(pod_pages, ignore_index=True) if pod_pages else parsers['pods']([])
+
+        publish(resources, errors=errors, metrics=metrics)
+        parsed['etags'] = {key: etag for key, etag in etags.items() if etag}
+        parsed['pod_pages'] = pod_pages
+
+    return build
+
+
+def _page_number(key):
+    """0 for the first page of a paged kind's keys ('pods'), n for 'pods#n'"""
+    return int(key.partition('#')[2] or 0)
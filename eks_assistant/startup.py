@@ -0,0 +1,42 @@
+"""Timings of the phases of a session's startup (MCP connection, first snapshot, agent build, ...)"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupTimings:
+    """Seconds each startup phase took, and when it ended counting from the start of the session.
+
+    Phases may run concurrently and on other threads (the MCP connection runs on the agent loop).
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self._started = clock()
+        self._lock = threading.Lock()
+        self._phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        """Time the block as the named phase; also around awaits in a coroutine"""
+        started = self._clock()
+        try:
+            yield
+        finally:
+            self.record(name, started)
+
+    def record(self, name, started):
+        """Record a phase that started at `started` (a reading of the clock) and ends now"""
+        ended = self._clock()
+        with self._lock:
+            self._phases[name] = (ended - started, ended - self._started)
+
+    def __contains__(self, name):
+        return name in self._phases
+
+    def rows(self):
+        """phase, seconds, ready_after (seconds since the session started) per recorded phase, in order"""
+        with self._lock:
+            phases = sorted(self._phases.items(), key=lambda item: item[1][1])
+        return [{'phase': name, 'seconds': round(seconds, 3), 'ready_after': round(ready_after, 3)}
+                for name, (seconds, ready_after) in phases]
@@ -0,0 +1,139 @@
+"""Agent replies as a stream of events: every MCP tool call as it starts and ends, then the reply's text.
+
+Tool calls are seen by wrapping the MCP client session's call_tool (see instrument()); a context
+variable routes each call to the turn that made it, so one client can serve concurrent turns.
+An agent with stream() (StreamingInlineAgent) has its text streamed as the model writes it; with only
+invoke(), as InlineAgent, the text arrives as one chunk after the tool calls.
+"""
+import asyncio
+import contextvars
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, UTC
+from typing import Any, Optional
+
+# Where the current turn's tool calls are reported, if it is being streamed
+_report_tool_call = contextvars.ContextVar('report_tool_call', default=None)
+
+
+@dataclass
+class TextChunk:
+    text: str
+
+
+@dataclass(eq=False)
+class ToolCall:
+    """One MCP tool call; reported when it starts and again, updated, when it ends"""
+    name: str
+    arguments: Any
+    started_at: datetime = field(default_factory=lambda: datetime.now(UTC))
+    finished_at: Optional[datetime] = None
+    # Text of the result, or the error when the call failed
+    output: str = ""
+    error: Optional[str] = None
+    _started: float = field(default_factory=time.perf_counter, repr=False)
+    duration: Optional[float] = None
+
+    @property
+    def done(self):
+        return self.finished_at is not None
+
+    def finish(self, output="", error=None):
+        self.duration = time.perf_counter() - self._started
+        self.finished_at = datetime.now(UTC)
+        self.output, self.error = output, error
+
+
+def instrument(mcp_client):
+    """Report the tool calls made through an MCP client to the turn streaming them; safe to call repeatedly.
+
+    Returns False when the client has no session with call_tool to wrap (its calls then go unreported).
+    """
+    session = next((candidate for candidate in (getattr(mcp_client, 'session', None), mcp_client)
+                    if callable(getattr(candidate, 'call_tool', None))), None)
+    if session is None:
+        return False
+    if getattr(session.call_tool, 'reports_tool_calls', False):
+        return True
+    call_tool = session.call_tool
+
+    async def reporting_call_tool(name, arguments=None, *args, **kwargs):
+        report = _report_tool_call.get()
+        if report is None:
+            return await call_tool(name, arguments, *args, **kwargs)
+        call = ToolCall(name, arguments)
+        report(call)
+        # A client's call_tool may go through an instrumented session (or pooled client) of its own: one call
+        token = _report_tool_call.set(None)
+        try:
+            result = await call_tool(name, arguments, *args, **kwargs)
+        except Exception as e:
+            call.finish(error=str(e))
+            raise
+        else:
+            call.finish(**result_text(result))
+            return result
+        finally:
+            _report_tool_call.reset(token)
+            report(call)
+
+    reporting_call_tool.reports_tool_calls = True
+    session.call_tool = reporting_call_tool
+    return True
+
+
+def result_text(result):
+    """output/error keyword arguments for ToolCall.finish() from an MCP CallToolResult"""
+    content = getattr(result, 'content', None)
+    if content is None:
+        return {'output': str(result)}
+    text = "\n".join(getattr(item, 'text', '') or f"[{getattr(item, 'type', 'content')}]" for item in content)
+    return {'error': text or "Tool call failed"} if getattr(result, 'isError', False) else {'output': text}
+
+
+async def stream_reply(agent, prompt, mcp_clients=()):
+    """Async iterator of TextChunk and ToolCall events for one agent turn; re-raises the turn's error"""
+    for client in mcp_clients:
+        instrument(client)
+    events = asyncio.Queue()
+    finished = object()
+
+    async def run_turn():
+        try:
+            if hasattr(agent, 'stream'):
+                async for text in agent.stream(prompt):
+                    events.put_nowait(TextChunk(text))
+            else:
+                events.put_nowait(TextChunk(await agent.invoke(prompt)))
+        finally:
+            events.put_nowait(finished)
+
+    # The task copies the context, so the tool calls it makes are reported here
+    token = _report_tool_call.set(events.put_nowait)
+    try:
+        turn = asyncio.create_task(run_turn())
+    finally:
+        _report_tool_call.reset(token)
+    try:
+        while (event := await events.get()) is not finished:
+            yield event
+        await turn
+    finally:
+        turn.cancel()
+
+
+class StreamedReply:
+    """What has arrived of a reply so far; filled in on the event loop, read from other threads"""
+
+    def __init__(self):
+        self.text = ""
+        self.tool_calls = []
+
+    async def collect(self, events):
+        """Consume stream_reply() events; returns the whole text"""
+        async for event in events:
+            if isinstance(event, TextChunk):
+                self.text += event.text
+            elif event not in self.tool_calls:
+                self.tool_calls.append(event)
+        return self.text
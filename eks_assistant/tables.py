@@ -0,0 +1,167 @@
+"""Columnar tables of a cluster snapshot, built once per snapshot so rendering only slices them"""
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from eks_assistant.parsing import ages, parse_deployments, parse_nodes, parse_pods, parse_services
+from eks_assistant.search import NameIndex, search_pods
+
+POD_STATUSES = ['Running', 'Pending', 'Failed', 'Succeeded', 'Unknown']
+NODE_STATUSES = ['Ready', 'NotReady']
+SERVICE_TYPES = ['ClusterIP', 'NodePort', 'LoadBalancer', 'ExternalName']
+NAMESPACED_KINDS = ['pods', 'deployments', 'services']
+PARSERS = {'pods': parse_pods, 'nodes': parse_nodes, 'deployments': parse_deployments, 'services': parse_services}
+
+# Displayed column -> dtype of each table, in display order; None marks the namespace column, whose
+# categories are the cluster's namespaces. Other columns of the parsed tables are kept after these.
+COLUMNS = {
+    'pods': {'name': object, 'namespace': None, 'status': POD_STATUSES, 'ready': object,
+             'restarts': 'int64', 'age': object},
+    'nodes': {'name': object, 'status': NODE_STATUSES, 'roles': object, 'age': object, 'version': object,
+              'internal_ip': object, 'instance_type': 'category', 'cpu_capacity': object,
+              'memory_capacity': object},
+    'deployments': {'name': object, 'namespace': None, 'desired_replicas': 'int64',
+                    'available_replicas': 'int64', 'ready_replicas': 'int64', 'age': object},
+    'services': {'name': object, 'namespace': None, 'type': SERVICE_TYPES, 'cluster_ip': object,
+                 'external_ip': object, 'ports': object, 'age': object},
+}
+
+
+@dataclass(frozen=True)
+class ResourceTables:
+    """Typed tables of one snapshot plus the aggregates the resource monitor charts.
+
+    Shared by every session showing the snapshot: slice them, never modify them in place.
+    """
+    # Sorted namespace names, from the namespace list or, when that is empty, from the namespaced kinds
+    namespaces: list
+    pods: pd.DataFrame
+    nodes: pd.DataFrame
+    deployments: pd.DataFrame
+    services: pd.DataFrame
+    # namespace, resource_type, count for every namespace and namespaced kind
+    namespace_counts: pd.DataFrame
+    # namespace, status, count of pods
+    pod_status_counts: pd.DataFrame
+    # namespace, type, count of services
+    service_type_counts: pd.DataFrame
+    # Substring and prefix index over pod names, in pods table order
+    pod_index: NameIndex
+    # Kinds the snapshot had; the tables of the others are empty because they were not loaded (yet)
+    loaded: frozenset = frozenset(COLUMNS) | {'namespaces'}
+    # (kind, column, descending) -> row positions in that order, filled in as sessions sort
+    _orders: dict = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def kind(self, kind, namespace=None):
+        """A kind's table, restricted to one namespace when given"""
+        table = getattr(self, kind)
+        if namespace is None or 'namespace' not in table.columns:
+            return table
+        return table[table['namespace'] == namespace]
+
+    def order(self, kind, column, descending=False):
+        """Row positions of a kind's table sorted by column; computed once per snapshot and column"""
+        key = (kind, column, descending)
+        if key not in self._orders:
+            if column == 'age':
+                # Ages sort by creation time, youngest first
+                column, descending = 'created', not descending
+            values = getattr(self, kind)[column]
+            self._orders[key] = values.sort_values(ascending=not descending, kind='stable',
+                                                   na_position='last').index.to_numpy()
+        return self._orders[key]
+
+    def page(self, kind, rows=None, sort_by=None, descending=False, number=1, size=100):
+        """One page of a kind's table, or of the given rows of it, and the number of pages.
+
+        Only the page is copied, so the cost of showing a table does not grow with the cluster.
+        """
+        table = getattr(self, kind)
+        rows = table if rows is None else rows
+        if sort_by:
+            positions = self.order(kind, sort_by, descending)
+            if len(rows) != len(table):
+                keep = np.zeros(len(table), dtype=bool)
+                keep[rows.index.to_numpy()] = True
+                positions = positions[keep[positions]]
+        else:
+            positions = rows.index.to_numpy()
+
+        pages = max(1, -(-len(positions) // size))
+        number = min(max(number, 1), pages)
+        return table.iloc[positions[(number - 1) * size:number * size]], pages
+
+    def search_pods(self, query):
+        """Pods matching a search query (see eks_assistant.search); raises ValueError for a malformed one"""
+        return self.pods.iloc[search_pods(self.pods, self.pod_index, query)]
+
+    def counts(self, aggregate, column, namespace=None):
+        """column, count totals of a per-namespace aggregate, over one namespace or all of them"""
+        if namespace is not None:
+            aggregate = aggregate[aggregate['namespace'] == namespace]
+        totals = aggregate.groupby(column, observed=True)['count'].sum().reset_index()
+        return totals[totals['count'] > 0].sort_values('count', ascending=False, ignore_index=True)
+
+
+def build_tables(resources, now=None):
+    """Turn a snapshot's parsed tables (see eks_assistant.parsing) into typed tables and their aggregates"""
+    # Kinds missing from a (partial) snapshot get empty tables with the same columns
+    frames = {kind: resources[kind] if resources.get(kind) is not None else PARSERS[kind]([]) for kind in COLUMNS}
+    used = set()
+    for kind in NAMESPACED_KINDS:
+        used.update(frames[kind]['namespace'].dropna().unique())
+    used.discard('')
+    namespaces = sorted(set(resources.get('namespaces', ()))) or sorted(used)
+    # Items can name a namespace created after the namespace list was fetched
+    categories = sorted(used | set(namespaces))
+
+    tables = {kind: typed_table(frames[kind], columns, categories, now) for kind, columns in COLUMNS.items()}
+
+    nodes = tables['nodes']
+    nodes['cpu_cores'] = nodes['cpu_millicores'] / 1000
+    nodes['memory_gib'] = nodes['memory_bytes'] / 2 ** 30
+
+    loaded = frozenset(kind for kind, resource in resources.items() if resource is not None)
+    # Kinds not loaded (yet) have no counts rather than zero of everything
+    namespace_counts = pd.concat(
+        [per_namespace(tables[kind], 'namespace').assign(resource_type=kind)
+         for kind in NAMESPACED_KINDS if kind in loaded] or [pd.DataFrame(columns=['namespace', 'count'])],
+        ignore_index=True
+    ).reindex(columns=['namespace', 'resource_type', 'count'])
+    namespace_counts = namespace_counts[namespace_counts['namespace'].isin(namespaces)].reset_index(drop=True)
+
+    return ResourceTables(
+        namespaces=namespaces,
+        namespace_counts=namespace_counts,
+        pod_status_counts=per_namespace(tables['pods'], 'namespace', 'status'),
+        service_type_counts=per_namespace(tables['services'], 'namespace', 'type'),
+        pod_index=NameIndex(tables['pods']['name']),
+        loaded=loaded,
+        **tables
+    )
+
+
+def typed_table(frame, columns, namespaces, now=None):
+    # Row labels double as positions for paging
+    table = frame.reset_index(drop=True)
+    if 'created' in table.columns:
+        table['age'] = ages(table['created'], now)
+    table = table[list(columns) + [column for column in table.columns if column not in columns]]
+    for column, dtype in columns.items():
+        if dtype is None:
+            table[column] = pd.Categorical(table[column], categories=namespaces)
+        elif isinstance(dtype, list):
+            # Known values first, so charts keep their colors; anything unexpected is added after them
+            extra = sorted(set(table[column].dropna()) - set(dtype))
+            table[column] = pd.Categorical(table[column], categories=dtype + extra)
+        elif dtype == 'int64':
+            table[column] = pd.to_numeric(table[column], errors='coerce').fillna(0).astype('int64')
+        elif dtype == 'category':
+            table[column] = table[column].astype('category')
+    return table
+
+
+def per_namespace(table, *columns):
+    """Counts of every combination of the (categorical) columns, including the empty ones"""
+    return table.groupby(list(columns), observed=False).size().reset_index(name='count')
@@ -1,74 +1,973 @@
+import base64
+import gzip
+import hashlib
 import json
 import logging
 import os
+import random
+import shlex
+import ssl
 import subprocess
+import threading
 import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import boto3
+import urllib3
+from botocore.signers import RequestSigner
+from pathlib import Path
+from urllib.parse import urlencode
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# these are coming from the kubectl layer
-os.environ['PATH'] = '/opt/kubectl:/opt/awscli:' + os.environ['PATH']
+# this is coming from the kubectl layer
+os.environ['PATH'] = '/opt/kubectl:' + os.environ['PATH']
 
 outdir = os.environ.get('TEST_OUTDIR', '/tmp')
-kubeconfig = os.path.join(outdir, 'kubeconfig')
+
+# Kubeconfigs survive across warm invocations of the same container, keyed by cluster name.
+# An entry is re-validated against DescribeCluster once it is older than the TTL and is only
+# rewritten when the endpoint or CA changed, or after kubectl reported an auth failure.
+KUBECONFIG_CACHE_SIZE = int(os.environ.get('KUBECONFIG_CACHE_SIZE', '8'))
+KUBECONFIG_TTL_SECONDS = int(os.environ.get('KUBECONFIG_TTL_SECONDS', '300'))
+
+# EKS accepts a signed GetCallerIdentity URL for 15 minutes; sign a fresh one shortly before that.
+TOKEN_LIFETIME_SECONDS = 15 * 60
+TOKEN_REFRESH_MARGIN_SECONDS = int(os.environ.get('TOKEN_REFRESH_MARGIN_SECONDS', '60'))
+TOKEN_PREFIX = 'k8s-aws-v1.'
+
+# Read-only `get ... -o json` commands are answered straight from the API server over a pooled
+# keep-alive connection ("native" engine); everything else still runs the kubectl binary.
+KUBECTL_ENGINE = os.environ.get('KUBECTL_ENGINE', 'auto')
+API_POOL_SIZE = int(os.environ.get('API_POOL_SIZE', '10'))
+API_TIMEOUT_SECONDS = float(os.environ.get('API_TIMEOUT_SECONDS', '30'))
+DISCOVERY_TTL_SECONDS = int(os.environ.get('DISCOVERY_TTL_SECONDS', '600'))
+AGGREGATED_DISCOVERY_ACCEPT = ('application/json;g=apidiscovery.k8s.io;v=v2;as=APIGroupDiscoveryList,'
+                               'application/json;g=apidiscovery.k8s.io;v=v2beta1;as=APIGroupDiscoveryList,'
+                               'application/json')
+
+# A `Commands` batch runs its commands on this many threads within a single invocation.
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', '8'))
+
+# Callers that send `Envelope: 1` get versioned envelopes instead of raw strings. Bodies past the
+# threshold are compressed and base64-encoded; whatever still doesn't fit Lambda's 6 MB synchronous
+# response limit is spilled to the object store and returned as a short-lived URL.
+RESPONSE_ENVELOPE_VERSION = 1
+COMPRESS_THRESHOLD_BYTES = int(os.environ.get('COMPRESS_THRESHOLD_BYTES', str(64 * 1024)))
+MAX_INLINE_BYTES = int(os.environ.get('MAX_INLINE_BYTES', str(5 * 1024 * 1024)))
+SPILL_STORE = os.environ.get('SPILL_STORE', 's3')
+SPILL_BUCKET = os.environ.get('SPILL_BUCKET')
+SPILL_DIR = os.environ.get('SPILL_DIR', os.path.join(outdir, 'spill'))
+SPILL_URL_TTL_SECONDS = int(os.environ.get('SPILL_URL_TTL_SECONDS', '300'))
+
+# Every invocation emits one CloudWatch Embedded Metric Format line with per-phase timings, retry and
+# byte counts; the same numbers come back as `Metrics` in enveloped and batch responses.
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'McpEks/KubectlLambda')
+
+# Retries: transient errors back off exponentially with full jitter, fatal errors fail at once,
+# and no attempt may outlive the Lambda (or the caller's `TimeoutSeconds`) budget.
+RETRY_MAX_ATTEMPTS = int(os.environ.get('RETRY_MAX_ATTEMPTS', '4'))
+RETRY_BASE_DELAY_SECONDS = float(os.environ.get('RETRY_BASE_DELAY_SECONDS', '0.5'))
+RETRY_MAX_DELAY_SECONDS = float(os.environ.get('RETRY_MAX_DELAY_SECONDS', '5'))
+ATTEMPT_TIMEOUT_SECONDS = float(os.environ.get('ATTEMPT_TIMEOUT_SECONDS', '30'))
+DEADLINE_MARGIN_SECONDS = float(os.environ.get('DEADLINE_MARGIN_SECONDS', '1'))
+
+TRANSIENT_ERROR_MARKERS = (
+    'i/o timeout',
+    'timed out',
+    'timeout awaiting',
+    'toomanyrequests',
+    'too many requests',
+    'throttl',
+    'rate exceeded',
+    'serviceunavailable',
+    'service unavailable',
+    'internalerror',
+    'etcdserver',
+    'connection refused',
+    'connection reset',
+    'unexpected eof',
+    'tls handshake timeout',
+)
+
+AUTH_FAILURE_MARKERS = (
+    b'Unauthorized',
+    b'You must be logged in to the server',
+    b'the server has asked for the client to provide credentials',
+    b'x509: certificate signed by unknown authority',
+)
+
+_kubeconfigs = OrderedDict()
+_tokens = {}
+_api_pools = {}
+_discovery = {}
+_object_store = None
+_eks_client = None
+_session = None
+
+
+class KubectlAuthError(Exception):
+    """kubectl was rejected by the API server, so the cached kubeconfig or token is stale"""
+
+
+class KubectlTimeoutError(Exception):
+    """A single kubectl attempt did not finish within its share of the deadline"""
+
+
+class DiscoveryError(Exception):
+    """The API server's resource discovery failed, so reads can't be served from it directly"""
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = RETRY_MAX_ATTEMPTS
+    base_delay: float = RETRY_BASE_DELAY_SECONDS
+    max_delay: float = RETRY_MAX_DELAY_SECONDS
+    attempt_timeout: float = ATTEMPT_TIMEOUT_SECONDS
+    retry_not_found: bool = True
+
+    @classmethod
+    def from_event(cls, event):
+        """Build the policy from the optional `Retry` section of the event, e.g. {"MaxAttempts": 2}"""
+        overrides = event.get('Retry') or {}
+        return cls(
+            max_attempts=int(overrides.get('MaxAttempts', RETRY_MAX_ATTEMPTS)),
+            base_delay=float(overrides.get('BaseDelaySeconds', RETRY_BASE_DELAY_SECONDS)),
+            max_delay=float(overrides.get('MaxDelaySeconds', RETRY_MAX_DELAY_SECONDS)),
+            attempt_timeout=float(overrides.get('AttemptTimeoutSeconds', ATTEMPT_TIMEOUT_SECONDS)),
+            retry_not_found=bool(overrides.get('RetryNotFound', True)),
+        )
+
+    def is_transient(self, error):
+        """Throttling, timeouts, API server hiccups and (while waiting) NotFound are worth another attempt"""
+        if isinstance(error, (KubectlTimeoutError, urllib3.exceptions.HTTPError)):
+            return True
+        message = str(error).lower()
+        if self.retry_not_found and 'notfound' in message:
+            return True
+        return any(marker in message for marker in TRANSIENT_ERROR_MARKERS)
+
+    def backoff(self, attempt):
+        """Exponential backoff with full jitter for the given (1-based) retry"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class InvocationMetrics:
+    """Per-phase timings (summed across concurrent commands) and counters of one invocation"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.values = {}
+        self.units = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(f'{name}Ms', (time.monotonic() - started) * 1000, 'Milliseconds')
+
+    def count(self, name, value=1, unit='Count'):
+        self.add(name, value, unit)
+
+    def add(self, name, value, unit):
+        with self.lock:
+            self.values[name] = self.values.get(name, 0) + value
+            self.units[name] = unit
+
+    def summary(self):
+        with self.lock:
+            summary = {name: round(value, 2) for name, value in self.values.items()}
+        summary['TotalMs'] = round((time.monotonic() - self.started) * 1000, 2)
+        return summary
+
+    def emit(self, cluster_name):
+        """Print the metrics as one EMF line; it has to be bare JSON, so it bypasses the logger's prefix"""
+        summary = self.summary()
+        units = dict(self.units, TotalMs='Milliseconds')
+        print(json.dumps({
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': [['ClusterName']],
+                    'Metrics': [{'Name': name, 'Unit': units[name]} for name in summary],
+                }],
+            },
+            'ClusterName': cluster_name,
+            **summary,
+        }), flush=True)
+
+
+_metrics = InvocationMetrics()
+
+
+def get_deadline(event, context):
+    """Monotonic time by which all work must be done: the Lambda's remaining time or the caller's budget"""
+    budget = None
+    if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+        budget = context.get_remaining_time_in_millis() / 1000 - DEADLINE_MARGIN_SECONDS
+    if event.get('TimeoutSeconds') is not None:
+        client_budget = float(event['TimeoutSeconds'])
+        budget = client_budget if budget is None else min(budget, client_budget)
+    if budget is None:
+        budget = ATTEMPT_TIMEOUT_SECONDS * RETRY_MAX_ATTEMPTS
+    return time.monotonic() + max(budget, 0)
 
 
 def handler(event, context):
+    global _metrics
+    _metrics = InvocationMetrics()
+    try:
+        return handle(event, context)
+    except Exception:
+        _metrics.count('Failures')
+        raise
+    finally:
+        _metrics.emit(event.get('ClusterName'))
+
+
+def handle(event, context):
     logger.info(json.dumps(dict(event)))
 
     cluster_name = event['ClusterName']
-    command = event['Command']
+    engine = event.get('Engine', KUBECTL_ENGINE)
+    policy = RetryPolicy.from_event(event)
+    deadline = get_deadline(event, context)
 
-    # "log in" to the cluster
-    subprocess.check_call(['aws', 'eks', 'update-kubeconfig',
-                           '--name', cluster_name,
-                           '--kubeconfig', kubeconfig
-                           ])
+    enveloped = event.get('Envelope', 0) >= RESPONSE_ENVELOPE_VERSION
+    accept_encoding = event.get('AcceptEncoding', [])
 
-    if os.path.isfile(kubeconfig):
-        os.chmod(kubeconfig, 0o600)
+    if 'Commands' in event:
+        # batch envelope: one result (or error) per command, so one failing kind doesn't fail the rest
+        commands = {}
+        results = {}
+        for entry in event['Commands']:
+            if isinstance(entry, str):
+                entry = {'Id': entry, 'Command': entry}
+            try:
+                commands[entry['Id']] = parse_command(entry)
+            except Exception as e:
+                # A malformed command fails its own entry, not the ones around it
+                _metrics.count('Errors')
+                results[entry['Id']] = {'Error': str(e)}
+
+        outputs = run_commands(cluster_name, commands, engine, policy, deadline) if commands else {}
+        for key, output in outputs.items():
+            if isinstance(output, Exception):
+                _metrics.count('Errors')
+                results[key] = {'Error': str(output)}
+            elif enveloped:
+                results[key] = {'Output': encode_result(output, commands[key], accept_encoding)}
+            else:
+                results[key] = {'Output': output}
+        if enveloped:
+            fit_inline([result['Output'] for result in results.values() if 'Output' in result])
+            logger.info(f"Response: {json.dumps(describe_results(results))}")
+        else:
+            logger.info(f"Response: {json.dumps(results)}")
+        return {'Results': results, 'Metrics': _metrics.summary()}
+
+    command = parse_command(event)
+    output = run_commands(cluster_name, {'command': command}, engine, policy, deadline)['command']
+    if isinstance(output, Exception):
+        raise output
+
+    if enveloped:
+        envelope = encode_result(output, command, accept_encoding)
+        fit_inline([envelope])
+        logger.info(f"Response: {json.dumps(describe_envelope(envelope))}")
+        envelope['Metrics'] = _metrics.summary()
+        return envelope
 
-    timeout_seconds = 10
-    output = wait_for_output(command.split()[1:], int(timeout_seconds))
     logger.info(f"Response: {output}")
 
     return output
 
 
-def wait_for_output(args, timeout_seconds):
-    end_time = time.time() + timeout_seconds
+def parse_command(entry):
+    """Turn an event (or a `Commands` entry) into {'args': [...], 'projection': tree or None, 'page': ..., ...}"""
+    page = None
+    if entry.get('Limit') or entry.get('Continue'):
+        # only the native engine can page; kubectl itself always returns the whole list
+        page = {'limit': entry.get('Limit'), 'continue': entry.get('Continue')}
+    return {
+        # shell-style quoting keeps selectors such as `-l 'env in (prod, qa)'` in one argument
+        'args': shlex.split(entry['Command'])[1:],
+        'projection': compile_projection(entry.get('Projection')),
+        'page': page,
+        'if_none_match': entry.get('IfNoneMatch'),
+    }
+
+
+def compile_projection(paths):
+    """Compile dotted field paths into a tree of the fields to keep, e.g.
+
+    ['metadata.name', 'status.containerStatuses.ready'] -> {'metadata': {'name': True},
+                                                          'status': {'containerStatuses': {'ready': True}}}
+    Lists are projected element by element, so paths don't need to mention them.
+    """
+    if not paths:
+        return None
+
+    tree = {}
+    for path in paths:
+        node = tree
+        parts = path.split('.')
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+            if node is True:
+                break
+        else:
+            node[parts[-1]] = True
+    return tree
+
+
+def project(value, tree):
+    if tree is True:
+        return value
+    if isinstance(value, list):
+        return [project(element, tree) for element in value]
+    if not isinstance(value, dict):
+        return value
+    return {key: project(value[key], subtree) for key, subtree in tree.items() if key in value}
+
+
+def project_document(document, tree):
+    """Reduce each item of a list (or a single object) to the projected fields"""
+    if 'items' in document:
+        document['items'] = [project(item, tree) for item in document['items'] or []]
+        return document
+    return project(document, tree)
+
+
+def encode_result(output, command, accept_encoding):
+    """Envelope a command's output, or send a tiny NotModified marker when it matches the caller's IfNoneMatch"""
+    etag, list_metadata = fingerprint(output, command)
+    if command['if_none_match'] and command['if_none_match'] == etag:
+        _metrics.count('NotModified')
+        envelope = {'Envelope': RESPONSE_ENVELOPE_VERSION, 'NotModified': True, 'ETag': etag}
+    else:
+        envelope = encode_output(output, command['args'], accept_encoding)
+        envelope['ETag'] = etag
+    if list_metadata:
+        # lets the caller page on without decoding the body, or with a body it kept from an earlier call
+        envelope['Metadata'] = list_metadata
+    return envelope
+
+
+def fingerprint(output, command):
+    """Content hash of an output, plus the list metadata of paged outputs.
+
+    A page's continue token changes with every write anywhere in the cluster, so it is left out of the hash.
+    """
+    if not command['page'] or output_format(command['args']) != 'json':
+        return hashlib.sha256(output.encode('utf-8')).hexdigest()[:32], None
+
+    document = json.loads(output)
+    metadata = document.pop('metadata', None) or {}
+    list_metadata = {key: metadata[key] for key in ('continue', 'remainingItemCount') if key in metadata}
+    return hashlib.sha256(json.dumps(document).encode('utf-8')).hexdigest()[:32], list_metadata
+
+
+def encode_output(output, args, accept_encoding):
+    """Wrap kubectl output in a versioned envelope, compressing it once it passes the threshold"""
+    with _metrics.phase('Encode'):
+        envelope = _encode_output(output, args, accept_encoding)
+    _metrics.count('ResponseBytes', len(envelope['Body']), 'Bytes')
+    return envelope
+
+
+def _encode_output(output, args, accept_encoding):
+    body = output.encode('utf-8')
+    envelope = {
+        'Envelope': RESPONSE_ENVELOPE_VERSION,
+        'ContentType': 'application/json' if output_format(args) == 'json' else 'text/plain',
+        'Size': len(body),
+        'Encoding': 'identity',
+    }
+    if len(body) < COMPRESS_THRESHOLD_BYTES:
+        envelope['Body'] = output
+        return envelope
+
+    if 'zstd' in accept_encoding and zstandard is not None:
+        envelope['Encoding'] = 'zstd'
+        data = zstandard.ZstdCompressor(level=3).compress(body)
+    elif 'gzip' in accept_encoding:
+        envelope['Encoding'] = 'gzip'
+        data = gzip.compress(body, compresslevel=6)
+    else:
+        envelope['Body'] = output
+        return envelope
+
+    envelope['Body'] = base64.b64encode(data).decode('ascii')
+    return envelope
+
+
+def fit_inline(envelopes):
+    """Spill the largest bodies to the object store until the inline ones fit in a Lambda response"""
+    inline = sorted((envelope for envelope in envelopes if 'Body' in envelope),
+                    key=lambda envelope: len(envelope['Body']), reverse=True)
+    total = sum(len(envelope['Body']) for envelope in inline)
+    for envelope in inline:
+        if total <= MAX_INLINE_BYTES:
+            break
+        body = envelope.pop('Body')
+        total -= len(body)
+        data = body.encode('utf-8') if envelope['Encoding'] == 'identity' else base64.b64decode(body)
+        with _metrics.phase('Spill'):
+            envelope['Location'] = object_store().put(f'kubectl-output/{uuid.uuid4()}', data)
+        _metrics.count('ResponseBytes', -len(body), 'Bytes')
+        _metrics.count('SpilledBytes', len(data), 'Bytes')
+
+
+def output_format(args):
+    for i, arg in enumerate(args):
+        if arg in ('-o', '--output') and i + 1 < len(args):
+            return args[i + 1]
+        if arg.startswith('--output='):
+            return arg.split('=', 1)[1]
+        if arg.startswith('-o') and not arg.startswith('--'):
+            return arg[2:].lstrip('=')
+    return None
+
+
+def describe_envelope(envelope):
+    """Envelope metadata without the body, for logging"""
+    return {key: value for key, value in envelope.items() if key != 'Body'}
+
+
+def describe_results(results):
+    return {key: {'Output': describe_envelope(result['Output'])} if 'Output' in result else result
+            for key, result in results.items()}
+
+
+class LocalObjectStore:
+    """Object store on the local filesystem, a stand-in for S3 when the caller shares the filesystem"""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def put(self, key, data):
+        path = self.directory / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        return path.resolve().as_uri()
+
+
+class S3ObjectStore:
+    """Object store in S3, handing out presigned URLs so callers need no bucket permissions"""
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.client = session().client('s3')
+
+    def put(self, key, data):
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data)
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': key}, ExpiresIn=SPILL_URL_TTL_SECONDS)
+
+
+def object_store():
+    global _object_store
+    if _object_store is None:
+        if SPILL_STORE == 'local':
+            _object_store = LocalObjectStore(SPILL_DIR)
+        elif SPILL_BUCKET:
+            _object_store = S3ObjectStore(SPILL_BUCKET)
+        else:
+            raise RuntimeError('kubectl output is too large to return inline and SPILL_BUCKET is not set')
+    return _object_store
+
+
+def run_commands(cluster_name, commands, engine, policy, deadline):
+    """Run {id: command} concurrently and return {id: output or exception}"""
+    results = run_concurrently(cluster_name, commands, engine, policy, deadline)
+
+    stale = [key for key, output in results.items() if isinstance(output, KubectlAuthError)]
+    if stale:
+        # "log in" to the cluster again and give the rejected commands one more chance
+        logger.info(f"Auth failure, rebuilding kubeconfig for {cluster_name}: {results[stale[0]]}")
+        invalidate_kubeconfig(cluster_name)
+        results.update(run_concurrently(cluster_name, {key: commands[key] for key in stale}, engine, policy, deadline))
+    return results
+
+
+def run_concurrently(cluster_name, commands, engine, policy, deadline):
+    with _metrics.phase('Kubeconfig'):
+        cluster = get_cluster(cluster_name)
+    with _metrics.phase('Token'):
+        token = get_token(cluster_name)
+    _metrics.count('Commands', len(commands))
+
+    def run(command):
+        try:
+            return wait_for_output(command['args'], policy, deadline, cluster['path'], token,
+                                   cluster if engine != 'subprocess' else None, command['projection'],
+                                   command['page'])
+        except Exception as e:
+            return e
+
+    if len(commands) == 1:
+        return {key: run(command) for key, command in commands.items()}
+
+    with ThreadPoolExecutor(max_workers=min(BATCH_CONCURRENCY, len(commands))) as executor:
+        futures = {key: executor.submit(run, command) for key, command in commands.items()}
+        return {key: future.result() for key, future in futures.items()}
+
+
+def session():
+    global _session
+    if _session is None:
+        _session = boto3.session.Session()
+    return _session
+
+
+def eks_client():
+    global _eks_client
+    if _eks_client is None:
+        _eks_client = session().client('eks')
+    return _eks_client
+
+
+def region():
+    return os.environ.get('AWS_REGION') or session().region_name
+
+
+def describe_cluster(cluster_name):
+    """Return the (endpoint, certificate authority data) pair of an EKS cluster"""
+    cluster = eks_client().describe_cluster(name=cluster_name)['cluster']
+    return cluster['endpoint'], cluster['certificateAuthority']['data']
+
+
+def get_cluster(cluster_name):
+    """Return the cached kubeconfig entry (path, endpoint, CA) of the cluster, rebuilding it when stale"""
+    entry = _kubeconfigs.get(cluster_name)
+    now = time.time()
+
+    if entry and os.path.isfile(entry['path']) and now - entry['checked_at'] < KUBECONFIG_TTL_SECONDS:
+        _kubeconfigs.move_to_end(cluster_name)
+        return entry
+
+    _metrics.count('DescribeClusterCalls')
+    endpoint, ca_data = describe_cluster(cluster_name)
+    if entry and os.path.isfile(entry['path']) and (entry['endpoint'], entry['ca_data']) == (endpoint, ca_data):
+        entry['checked_at'] = now
+        _kubeconfigs.move_to_end(cluster_name)
+        return entry
+
+    if entry:
+        drop_api_state(entry)
+    path = os.path.join(outdir, f'kubeconfig-{cluster_name}')
+    write_kubeconfig(path, cluster_name, endpoint, ca_data)
+    _kubeconfigs[cluster_name] = {
+        'name': cluster_name,
+        'path': path,
+        'endpoint': endpoint,
+        'ca_data': ca_data,
+        'checked_at': now,
+    }
+    _kubeconfigs.move_to_end(cluster_name)
+
+    while len(_kubeconfigs) > KUBECONFIG_CACHE_SIZE:
+        _, evicted = _kubeconfigs.popitem(last=False)
+        drop_api_state(evicted)
+        if os.path.isfile(evicted['path']):
+            os.remove(evicted['path'])
+
+    return _kubeconfigs[cluster_name]
+
+
+def invalidate_kubeconfig(cluster_name):
+    _tokens.pop(cluster_name, None)
+    entry = _kubeconfigs.pop(cluster_name, None)
+    if entry:
+        drop_api_state(entry)
+        if os.path.isfile(entry['path']):
+            os.remove(entry['path'])
+
+
+def get_token(cluster_name):
+    """Return a bearer token for the cluster, signing a new one only when the cached one is about to expire"""
+    cached = _tokens.get(cluster_name)
+    now = time.time()
+    if cached and now < cached['expires_at'] - TOKEN_REFRESH_MARGIN_SECONDS:
+        return cached['token']
+
+    _metrics.count('TokensSigned')
+    token = sign_token(cluster_name)
+    _tokens[cluster_name] = {'token': token, 'expires_at': now + TOKEN_LIFETIME_SECONDS}
+    return token
+
+
+def sign_token(cluster_name):
+    """Presign STS GetCallerIdentity the way `aws eks get-token` does, without starting the AWS CLI"""
+    sts_region = region()
+    sts = session().client('sts', region_name=sts_region)
+    signer = RequestSigner(sts.meta.service_model.service_id, sts_region, 'sts', 'v4',
+                           session().get_credentials(), session().events)
+    params = {
+        'method': 'GET',
+        'url': f'https://sts.{sts_region}.amazonaws.com/?Action=GetCallerIdentity&Version=2011-06-15',
+        'body': {},
+        'headers': {'x-k8s-aws-id': cluster_name},
+        'context': {},
+    }
+    signed_url = signer.generate_presigned_url(params, region_name=sts_region, expires_in=60, operation_name='')
+    return TOKEN_PREFIX + base64.urlsafe_b64encode(signed_url.encode('utf-8')).decode('utf-8').rstrip('=')
+
+
+def write_kubeconfig(path, cluster_name, endpoint, ca_data):
+    """Write a kubeconfig for the cluster; the bearer token is passed to kubectl per call instead of an exec plugin"""
+    config = {
+        'apiVersion': 'v1',
+        'kind': 'Config',
+        'clusters': [{
+            'name': cluster_name,
+            'cluster': {'server': endpoint, 'certificate-authority-data': ca_data},
+        }],
+        'contexts': [{
+            'name': cluster_name,
+            'context': {'cluster': cluster_name, 'user': cluster_name},
+        }],
+        'current-context': cluster_name,
+        'preferences': {},
+        'users': [{
+            'name': cluster_name,
+            'user': {},
+        }],
+    }
+
+    with open(path, 'w') as f:
+        json.dump(config, f)
+    os.chmod(path, 0o600)
+
+
+def wait_for_output(args, policy, deadline, kubeconfig, token=None, cluster=None, projection=None,
+                    page=None):
+    """Run the command until it produces output, retrying transient errors within the deadline"""
     error = None
+    attempt = 0
 
-    while time.time() < end_time:
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        attempt += 1
+        _metrics.count('Attempts')
         try:
-            # the output is surrounded with '', so we unquote
-            output = kubectl(args).decode('utf-8')
+            output = execute(args, kubeconfig, token, cluster, min(remaining, policy.attempt_timeout),
+                             projection, page).decode('utf-8')
             if output:
+                _metrics.count('OutputBytes', len(output), 'Bytes')
                 return output
+        except KubectlAuthError:
+            raise
         except Exception as e:
-            error = str(e)
-            # also a recoverable error
-            if 'NotFound' in error:
-                pass
-        time.sleep(10)
+            error = e
+            if not policy.is_transient(e):
+                raise
+        if attempt >= policy.max_attempts:
+            raise RuntimeError(f'Giving up on kubectl command after {attempt} attempts: {args} (last_error={error})')
+
+        delay = policy.backoff(attempt)
+        if time.monotonic() + delay >= deadline:
+            break
+        logger.info(f"Retrying kubectl command in {delay:.2f}s (attempt {attempt}, last_error={error})")
+        _metrics.count('Retries')
+        with _metrics.phase('RetrySleep'):
+            time.sleep(delay)
 
     raise RuntimeError(f'Timeout waiting for output from kubectl command: {args} (last_error={error})')
 
 
-def kubectl(args):
-    retry = 3
-    while retry > 0:
-        try:
-            cmd = ['kubectl', '--kubeconfig', kubeconfig] + args
-            output = subprocess.check_output(cmd, stderr=subprocess.PIPE)
-        except subprocess.CalledProcessError as exc:
-            output = exc.output + exc.stderr
-            if b'i/o timeout' in output and retry > 0:
-                logger.info("kubectl timed out, retries left: %s" % retry)
-                retry = retry - 1
+def execute(args, kubeconfig, token=None, cluster=None, timeout=None, projection=None, page=None):
+    """Serve supported reads from the API server directly and fall back to the kubectl binary for the rest"""
+    if cluster is not None:
+        request = parse_read_command(args)
+        if request is not None:
+            try:
+                resource = resolve_resource(cluster, token, request['resource'], timeout)
+            except DiscoveryError as e:
+                # discovery is only a shortcut: a cluster that refuses or fails it can still be read with kubectl
+                logger.warning(f"API discovery failed, falling back to kubectl: {e}")
+                _metrics.count('ApiFallbacks')
+                resource = None
+            if resource is not None:
+                try:
+                    with _metrics.phase('ApiRead'):
+                        return api_read(cluster, token, resource, request, timeout, projection, page)
+                except urllib3.exceptions.TimeoutError:
+                    # the attempt's time is spent; the retry loop decides what happens next
+                    raise
+                except urllib3.exceptions.HTTPError as e:
+                    # the connection failed rather than the request: kubectl may still get through
+                    logger.warning(f"API server read failed, falling back to kubectl: {e!r}")
+                    _metrics.count('ApiFallbacks')
+
+    with _metrics.phase('Kubectl'):
+        output = kubectl(args, kubeconfig, token, timeout)
+    if projection is not None and output_format(args) == 'json':
+        with _metrics.phase('Projection'):
+            output = json.dumps(project_document(json.loads(output), projection)).encode('utf-8')
+    return output
+
+
+def parse_read_command(args):
+    """Parse `get <resource> [name] ... -o json` into a request dict, or None if only kubectl can run it"""
+    if len(args) < 2 or args[0] != 'get':
+        return None
+
+    request = {'namespace': 'default', 'all_namespaces': False, 'name': None, 'query': {}}
+    positional = []
+    output = None
+    value_flags = {
+        '-n': 'namespace', '--namespace': 'namespace',
+        '-o': 'output', '--output': 'output',
+        '-l': 'labelSelector', '--selector': 'labelSelector',
+        '--field-selector': 'fieldSelector',
+    }
+
+    i = 1
+    while i < len(args):
+        arg = args[i]
+        flag, _, inline_value = arg.partition('=')
+        if arg in ('-A', '--all-namespaces'):
+            request['all_namespaces'] = True
+        elif flag in value_flags or (arg.startswith('-o') and len(arg) > 2) or (arg.startswith('-n') and len(arg) > 2):
+            if flag in value_flags and inline_value:
+                key, value = value_flags[flag], inline_value
+            elif flag in value_flags:
+                if i + 1 >= len(args):
+                    return None
+                key, value = value_flags[flag], args[i + 1]
+                i += 1
             else:
-                raise Exception(output)
+                key, value = value_flags[arg[:2]], arg[2:]
+            if key == 'namespace':
+                request['namespace'] = value
+            elif key == 'output':
+                output = value
+            else:
+                request['query'][key] = value
+        elif arg.startswith('-'):
+            return None
         else:
-            logger.info(output)
-            return output
+            positional.append(arg)
+        i += 1
+
+    if output != 'json' or not positional or len(positional) > 2 or ',' in positional[0]:
+        return None
+    if '/' in positional[0]:
+        if len(positional) > 1:
+            return None
+        positional = positional[0].split('/', 1)
+
+    request['resource'] = positional[0].lower()
+    if len(positional) == 2:
+        if request['all_namespaces']:
+            return None
+        request['name'] = positional[1]
+    return request
+
+
+def drop_api_state(cluster):
+    pool = _api_pools.pop(cluster['endpoint'], None)
+    if pool is not None:
+        pool.clear()
+    _discovery.pop(cluster['endpoint'], None)
+
+
+def api_pool(cluster):
+    """Return the module-level keep-alive connection pool for the cluster API server"""
+    pool = _api_pools.get(cluster['endpoint'])
+    if pool is None:
+        pool = urllib3.PoolManager(
+            num_pools=1,
+            maxsize=API_POOL_SIZE,
+            block=False,
+            retries=False,
+            timeout=urllib3.Timeout(total=API_TIMEOUT_SECONDS),
+            cert_reqs='CERT_REQUIRED',
+            ca_cert_data=base64.b64decode(cluster['ca_data']).decode('utf-8'),
+        )
+        _api_pools[cluster['endpoint']] = pool
+    return pool
+
+
+def api_get(cluster, token, path, query=None, accept='application/json', timeout=None):
+    url = cluster['endpoint'].rstrip('/') + path
+    if query:
+        url += '?' + urlencode(query)
+    headers = {'Accept': accept}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+
+    try:
+        response = api_pool(cluster).request('GET', url, headers=headers, preload_content=True,
+                                             timeout=urllib3.Timeout(total=timeout) if timeout else None)
+    except urllib3.exceptions.HTTPError as e:
+        if is_certificate_failure(e):
+            # The cluster CA rotated: rebuild the kubeconfig and pool, as kubectl's x509 error does
+            raise KubectlAuthError(str(e)) from e
+        raise
+    if response.status == 401:
+        raise KubectlAuthError(response.data)
+    if response.status >= 400:
+        try:
+            status = json.loads(response.data)
+            message = f"Error from server ({status.get('reason', response.status)}): {status.get('message', '')}"
+        except ValueError:
+            message = f'Error from server ({response.status}): {response.data[:200]!r}'
+        raise Exception(message)
+    return json.loads(response.data)
+
+
+def is_certificate_failure(error):
+    """Whether a urllib3 error is the API server's certificate failing verification against the cached CA"""
+    reason = error.reason if isinstance(error, urllib3.exceptions.MaxRetryError) else error
+    if not isinstance(reason, urllib3.exceptions.SSLError):
+        return False
+    cause = reason.args[0] if reason.args else None
+    return isinstance(cause, ssl.SSLCertVerificationError) or 'certificate verify failed' in str(reason).lower()
+
+
+def resolve_resource(cluster, token, name, timeout=None):
+    """Map a kubectl resource name (plural, singular, short name or kind) to its API path via cached discovery"""
+    cached = _discovery.get(cluster['endpoint'])
+    if cached is None or time.time() - cached['fetched_at'] >= DISCOVERY_TTL_SECONDS:
+        with _metrics.phase('Discovery'):
+            try:
+                cached = {'resources': discover_resources(cluster, token, timeout), 'fetched_at': time.time()}
+            except KubectlAuthError:
+                raise
+            except Exception as e:
+                raise DiscoveryError(str(e)) from e
+        _discovery[cluster['endpoint']] = cached
+    return cached['resources'].get(name)
+
+
+def discover_resources(cluster, token, timeout=None):
+    resources = {}
+
+    def add(group, version, item):
+        name = item['name']
+        if '/' in name or 'get' not in item.get('verbs', ['get']):
+            return
+        api_version = f'{group}/{version}' if group else version
+        entry = {
+            'path': f'/apis/{api_version}' if group else f'/api/{version}',
+            'api_version': api_version,
+            'resource': name,
+            'kind': item['kind'],
+            'namespaced': item['namespaced'],
+        }
+        keys = [name, item.get('singularName') or item['kind'].lower(), item['kind'].lower()]
+        keys += item.get('shortNames') or []
+        if group:
+            keys.append(f'{name}.{group}')
+        for key in keys:
+            resources.setdefault(key, entry)
+
+    for prefix in ('/api', '/apis'):
+        document = api_get(cluster, token, prefix, accept=AGGREGATED_DISCOVERY_ACCEPT, timeout=timeout)
+        if document.get('kind') == 'APIGroupDiscoveryList':
+            for group in document.get('items', []):
+                group_name = group.get('metadata', {}).get('name', '')
+                # versions are listed in order of preference
+                version = group['versions'][0]
+                for resource in version.get('resources', []):
+                    add(group_name, version['version'], {
+                        'name': resource['resource'],
+                        'singularName': resource.get('singularResource'),
+                        'kind': resource.get('responseKind', {}).get('kind', ''),
+                        'namespaced': resource.get('scope') == 'Namespaced',
+                        'shortNames': resource.get('shortNames'),
+                        'verbs': resource.get('verbs'),
+                    })
+        elif prefix == '/api':
+            for version in document.get('versions', ['v1'])[:1]:
+                for resource in api_get(cluster, token, f'/api/{version}', timeout=timeout).get('resources', []):
+                    add('', version, resource)
+        else:
+            for group in document.get('groups', []):
+                group_version = group['preferredVersion']['groupVersion']
+                resource_list = api_get(cluster, token, f'/apis/{group_version}', timeout=timeout)
+                for resource in resource_list.get('resources', []):
+                    add(group['name'], group['preferredVersion']['version'], resource)
+
+    return resources
+
+
+def api_read(cluster, token, resource, request, timeout=None, projection=None, page=None):
+    """Run a parsed `get` against the API server and shape the result like `kubectl get -o json`.
+
+    With a page ({'limit': n, 'continue': token}) only that chunk of the list is read, and the token for
+    the next one comes back in metadata.continue.
+    """
+    path = resource['path']
+    if resource['namespaced'] and not request['all_namespaces']:
+        path += f"/namespaces/{request['namespace']}"
+    path += f"/{resource['resource']}"
+    if request['name']:
+        path += f"/{request['name']}"
+
+    query = dict(request['query'])
+    if page and not request['name']:
+        if page.get('limit'):
+            query['limit'] = str(page['limit'])
+        if page.get('continue'):
+            query['continue'] = page['continue']
+
+    result = api_get(cluster, token, path, query, timeout=timeout)
+    if request['name']:
+        if projection is not None:
+            result = project(result, projection)
+        return json.dumps(result).encode('utf-8')
+
+    # list items come back without type information, kubectl fills it in
+    items = result.get('items') or []
+    for item in items:
+        item.setdefault('apiVersion', resource['api_version'])
+        item.setdefault('kind', resource['kind'])
+    if projection is not None:
+        items = [project(item, projection) for item in items]
+    metadata = {'resourceVersion': ''}
+    if page:
+        list_metadata = result.get('metadata', {})
+        metadata['continue'] = list_metadata.get('continue', '')
+        if 'remainingItemCount' in list_metadata:
+            metadata['remainingItemCount'] = list_metadata['remainingItemCount']
+    listing = {'apiVersion': 'v1', 'items': items, 'kind': 'List', 'metadata': metadata}
+    return json.dumps(listing).encode('utf-8')
+
+
+def kubectl(args, kubeconfig, token=None, timeout=None):
+    cmd = ['kubectl', '--kubeconfig', kubeconfig]
+    if token:
+        cmd += ['--token', token]
+    cmd += args
+    try:
+        output = subprocess.check_output(cmd, stderr=subprocess.PIPE, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise KubectlTimeoutError(f'kubectl timed out after {timeout:.1f}s')
+    except subprocess.CalledProcessError as exc:
+        output = exc.output + exc.stderr
+        if any(marker in output for marker in AUTH_FAILURE_MARKERS):
+            raise KubectlAuthError(output)
+        raise Exception(output)
+    else:
+        logger.info(output)
+        return output
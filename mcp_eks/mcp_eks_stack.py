@@ -8,11 +8,11 @@ from aws_cdk import (
     aws_eks as eks,
     aws_iam as iam,
     aws_lambda as lambda_,
+    aws_s3 as s3,
     RemovalPolicy,
     Duration
 )
 from aws_cdk.lambda_layer_kubectl_v32 import KubectlV32Layer
-from aws_cdk.lambda_layer_awscli import AwsCliLayer
 from constructs import Construct
 import requests
 
@@ -68,13 +68,23 @@ class EksClusterStack(Stack):
         )
 
         kubectl_lambda_layer = KubectlV32Layer(self, "kubectl")
-        awscli_lambda_layer = AwsCliLayer(self, "AwsCliLayer")
 
         kubectl_lambda_role = iam.Role(
             self, "KubectlLambdaRole",
             assumed_by=iam.ServicePrincipal("lambda.amazonaws.com")
         )
 
+        # Large kubectl outputs that don't fit a synchronous Lambda response are spilled here
+        kubectl_output_bucket = s3.Bucket(
+            self,
+            "KubectlOutputBucket",
+            block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
+            enforce_ssl=True,
+            removal_policy=RemovalPolicy.DESTROY,
+            auto_delete_objects=True,
+            lifecycle_rules=[s3.LifecycleRule(expiration=Duration.days(1))]
+        )
+
         kubectl_lambda = lambda_.Function(
             self,
             "KubectlExecutionFunction",
@@ -84,8 +94,12 @@ class EksClusterStack(Stack):
             role=kubectl_lambda_role,
             timeout=Duration.seconds(300),
             memory_size=512,
-            layers=[kubectl_lambda_layer, awscli_lambda_layer]
+            layers=[kubectl_lambda_layer],
+            environment={
+                "SPILL_BUCKET": kubectl_output_bucket.bucket_name
+            }
         )
+        kubectl_output_bucket.grant_read_write(kubectl_lambda_role)
 
         # Add necessary permissions to execute kubectl commands against the EKS cluster
         kubectl_lambda_role.add_managed_policy(
@@ -1,31 +1,91 @@
 import streamlit as st
-import asyncio
-import threading
 import atexit
-from InlineAgent.agent import InlineAgent
 from InlineAgent.tools import MCPHttp
 import pandas as pd
 import altair as alt
 import json
-from datetime import datetime, UTC
-import re
-import nest_asyncio
+import shlex
+import time
+from datetime import datetime
 from dotenv import load_dotenv
 import os
 import boto3
+from botocore.config import Config
+from collections import deque
+from eks_assistant.cache import SharedCache
+from eks_assistant.history import SnapshotHistory
+from eks_assistant.inline_agent import StreamingInlineAgent
+from eks_assistant.loop import BackgroundLoop
+from eks_assistant.mcp_pool import MCPConnectionPool
+from eks_assistant.prefetch import NextTabPredictor
+from eks_assistant.snapshots import SnapshotPoller, snapshot_builder
+from eks_assistant.startup import StartupTimings
+from eks_assistant.streaming import StreamedReply, instrument, stream_reply
+from eks_assistant.decoding import loads
+from eks_assistant.parsing import parse_namespaces, parse_pods, parse_nodes, parse_deployments, parse_services
+from eks_assistant.tables import COLUMNS as TABLE_COLUMNS, build_tables
+from eks_assistant.envelope import ENVELOPE_VERSION, ACCEPT_ENCODING, output_etag
 
 
 load_dotenv()
-nest_asyncio.apply()
 
 # Configuration
 EC2_HOST = os.getenv('BASTION_HOST')
 MCP_PORT = os.getenv('MCP_PORT')
+MCP_URL = f"http://{EC2_HOST}:{MCP_PORT}/sse"
 AWS_REGION = os.getenv('AWS_REGION')
 EKS_CLUSTER = os.getenv('EKS_CLUSTER')
 LAMBDA_ARN = os.getenv('LAMBDA_ARN')
-
-lambda_client = boto3.client("lambda")
+# Seconds the first question waits for the MCP connection started with the session
+MCP_CONNECT_TIMEOUT_SECONDS = float(os.getenv('MCP_CONNECT_TIMEOUT_SECONDS', '30'))
+# MCP connections opened per server while sessions' calls overlap; beyond that, sessions share them
+MCP_POOL_SIZE = int(os.getenv('MCP_POOL_SIZE', '4'))
+# Seconds an unused pooled connection stays open, and between health checks of idle ones
+MCP_POOL_IDLE_SECONDS = float(os.getenv('MCP_POOL_IDLE_SECONDS', '300'))
+MCP_HEALTH_CHECK_SECONDS = float(os.getenv('MCP_HEALTH_CHECK_SECONDS', '30'))
+# Shown as the session starts instead of asking the model for a greeting
+WELCOME_MESSAGE = ("Hello! I'm your Kubernetes assistant for the **{cluster}** EKS cluster. Ask me about its "
+                   "namespaces, pods, nodes, deployments or services, or ask me to run kubectl for you.")
+# Budget the kubectl Lambda gets per request before it gives up instead of retrying further
+KUBECTL_TIMEOUT_SECONDS = float(os.getenv('KUBECTL_TIMEOUT_SECONDS', '60'))
+# Pods are listed in pages of this size so neither the Lambda nor the app holds a whole large cluster at once
+PODS_PAGE_SIZE = int(os.getenv('PODS_PAGE_SIZE', '500'))
+# Seconds a kubectl get result is shared between sessions, for kinds without their own TTL below
+KUBECTL_CACHE_TTL_SECONDS = float(os.getenv('KUBECTL_CACHE_TTL_SECONDS', '10'))
+# How long past its TTL a result may still be served while it is refreshed in the background
+KUBECTL_CACHE_MAX_STALE_SECONDS = float(os.getenv('KUBECTL_CACHE_MAX_STALE_SECONDS', '120'))
+# Seconds between rebuilds of a cluster's shared resource snapshot while someone is watching it
+SNAPSHOT_INTERVAL_SECONDS = float(os.getenv('SNAPSHOT_INTERVAL_SECONDS', '15'))
+# With no session reading a snapshot for this long, rebuilds back off up to SNAPSHOT_MAX_INTERVAL_SECONDS apart
+SNAPSHOT_IDLE_AFTER_SECONDS = float(os.getenv('SNAPSHOT_IDLE_AFTER_SECONDS', '60'))
+SNAPSHOT_MAX_INTERVAL_SECONDS = float(os.getenv('SNAPSHOT_MAX_INTERVAL_SECONDS', '300'))
+# Kinds no session has shown (or been predicted to) for this long drop out of the snapshot's polls
+SNAPSHOT_FORGET_AFTER_SECONDS = float(os.getenv('SNAPSHOT_FORGET_AFTER_SECONDS', str(3 * SNAPSHOT_INTERVAL_SECONDS)))
+# A snapshot nobody has read for this long stops being rebuilt until someone reads it again
+SNAPSHOT_STOP_AFTER_SECONDS = float(os.getenv('SNAPSHOT_STOP_AFTER_SECONDS', '900'))
+# Snapshot summaries kept per cluster and scope for the trend tabs (an hour at the default interval)
+SNAPSHOT_HISTORY_DEPTH = int(os.getenv('SNAPSHOT_HISTORY_DEPTH', '240'))
+# Choices of rows per page for the pod and node tables
+TABLE_PAGE_SIZES = [50, 100, 250, 500]
+# kubectl Lambda invocations in flight at once, across the snapshots of every cluster and scope
+FETCH_CONCURRENCY = int(os.getenv('FETCH_CONCURRENCY', '5'))
+
+
+@st.cache_resource
+def get_lambda_client():
+    """One Lambda client for the whole process, with a connection for each concurrent fetch kept alive"""
+    return boto3.client("lambda", config=Config(
+        max_pool_connections=FETCH_CONCURRENCY * 2,
+        tcp_keepalive=True,
+        connect_timeout=5,
+        # The Lambda stops retrying after KUBECTL_TIMEOUT_SECONDS; leave it time to answer
+        read_timeout=KUBECTL_TIMEOUT_SECONDS + 15,
+        # The Lambda already retries kubectl within its deadline, so only retry the invoke itself once
+        retries={"mode": "standard", "max_attempts": 2}
+    ))
+
+
+lambda_client = get_lambda_client()
 
 # Page configuration
 st.set_page_config(
@@ -39,144 +99,432 @@ if 'messages' not in st.session_state:
     st.session_state.messages = []
 if 'agent' not in st.session_state:
     st.session_state.agent = None
-if 'kubernetes_resources' not in st.session_state:
-    st.session_state.kubernetes_resources = {
-        'namespaces': [],
-        'pods': [],
-        'nodes': [],
-        'deployments': [],
-        'services': []
-    }
+if 'resource_tables' not in st.session_state:
+    st.session_state.resource_tables = None
 if 'resource_timestamp' not in st.session_state:
     st.session_state.resource_timestamp = datetime.now()
-if 'agent_lock' not in st.session_state:
-    st.session_state.agent_lock = threading.Lock()
-if 'is_agent_initialized' not in st.session_state:
-    st.session_state.is_agent_initialized = False
+if 'session_started' not in st.session_state:
+    st.session_state.session_started = False
+    st.session_state.startup_timings = StartupTimings()
+    st.session_state.mcp_connection = None
 if 'cluster_name' not in st.session_state:
     st.session_state.cluster_name = None
 if 'mcp_client' not in st.session_state:
     st.session_state.mcp_client = None
-if 'sse_task' not in st.session_state:
-    st.session_state.sse_task = None
-if 'event_loop' not in st.session_state:
-    st.session_state.event_loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(st.session_state.event_loop)
-if 'resource_stack' not in st.session_state:
-    st.session_state.resource_stack = None
-
-
-# Helper function to run async code properly in Streamlit
-def run_async(coro):
-    """Properly run coroutines within Streamlit"""
-    loop = asyncio.get_event_loop()
-    if loop.is_running():
-        # If we're in a running event loop, use create_task
-        return asyncio.create_task(coro)
-    else:
-        # Otherwise run in the session's event loop
-        return st.session_state.event_loop.run_until_complete(coro)
+if 'pending_reply' not in st.session_state:
+    st.session_state.pending_reply = None
+    st.session_state.streamed_reply = None
+if 'lambda_metrics' not in st.session_state:
+    st.session_state.lambda_metrics = deque(maxlen=50)
+if 'snapshot_version' not in st.session_state:
+    st.session_state.snapshot_version = 0
+if 'shown_tab' not in st.session_state:
+    st.session_state.shown_tab = None
+
+
+@st.cache_resource
+def get_agent_loop():
+    """The one event loop, on its own thread, that every session's MCP client and agent live on.
+
+    Agent calls are submitted to it as futures, so a chat turn no longer blocks the script run and the
+    resource monitor keeps refreshing while the assistant is thinking.
+    """
+    loop = BackgroundLoop(name="agent-loop")
+    atexit.register(loop.stop)
+    return loop
+
+
+async def open_mcp_connection(url):
+    """Open one pooled connection to the Kubernetes MCP server, reporting its tool calls to streamed turns"""
+    mcp_client = await MCPHttp.create(
+        url=url,
+        headers={},
+        timeout=10,
+        sse_read_timeout=300
+    )
+    instrument(mcp_client)
+    return mcp_client
+
+
+@st.cache_resource
+def get_mcp_pool():
+    """MCP connections shared by every session, living on the agent loop and health-checked there"""
+    loop = get_agent_loop()
+    pool = MCPConnectionPool(open_mcp_connection, size=MCP_POOL_SIZE, idle_timeout=MCP_POOL_IDLE_SECONDS,
+                             health_interval=MCP_HEALTH_CHECK_SECONDS)
+    loop.submit(pool.run_health_checks())
+    # Exit handlers run last first, so the connections close before the loop stops
+    atexit.register(lambda: loop.run(pool.close(), timeout=10))
+    return pool
+
+
+async def connect_mcp(pool, timings):
+    """Make sure the pool has a live connection to the Kubernetes MCP server and return this session's
+    client for it; runs on the agent loop, started as the session starts"""
+    with timings.phase('mcp_connect'):
+        async with pool.lease(MCP_URL):
+            pass
+    return pool.client(MCP_URL)
+
+
+async def initialize_agent(mcp_client):
+    """Create the agent on an MCP client, streaming its replies; runs on the agent loop"""
+    return StreamingInlineAgent(
+        foundation_model="us.anthropic.claude-3-5-haiku-20241022-v1:0",
+        instruction="""You are a Kubernetes cluster management assistant that helps users manage their EKS cluster.
+        You have access to various kubectl commands through an MCP server.
+        When users ask you about Kubernetes resources or want to perform actions, use the appropriate tools.
+        Always show the relevant information clearly and explain what you're doing.
+        """,
+        agent_name="kubernetes-assistant",
+        action_groups=[
+            {
+                "name": "KubernetesActions",
+                "description": "Tools for managing Kubernetes clusters",
+                "mcp_clients": [mcp_client]
+            }
+        ]
+    )
 
 
-async def initialize_agent():
-    """Initialize the MCP client and InlineAgent"""
-    try:
-        from contextlib import AsyncExitStack
-
-        # Create an exit stack to manage resources
-        stack = AsyncExitStack()
-
-        # Configure connection to the Kubernetes MCP server
-        if st.session_state.mcp_client is None:
-            client = await MCPHttp.create(
-                url=f"http://{EC2_HOST}:{MCP_PORT}/sse",
-                headers={},
-                timeout=10,
-                sse_read_timeout=300
-            )
-            # Register for proper cleanup
-            st.session_state.mcp_client = client
-            st.session_state.resource_stack = stack
-
-        # Create the InlineAgent with the MCP client
-        agent = InlineAgent(
-            foundation_model="us.anthropic.claude-3-5-haiku-20241022-v1:0",
-            instruction="""You are a Kubernetes cluster management assistant that helps users manage their EKS cluster.
-            You have access to various kubectl commands through an MCP server.
-            When users ask you about Kubernetes resources or want to perform actions, use the appropriate tools.
-            Always show the relevant information clearly and explain what you're doing.
-            """,
-            agent_name="kubernetes-assistant",
-            action_groups=[
-                {
-                    "name": "KubernetesActions",
-                    "description": "Tools for managing Kubernetes clusters",
-                    "mcp_clients": [st.session_state.mcp_client]
-                }
-            ]
-        )
+def start_session():
+    """Greet the user and start connecting to the MCP server, without waiting for either model or server"""
+    st.session_state.messages.append({"role": "assistant", "content": WELCOME_MESSAGE.format(cluster=EKS_CLUSTER)})
+    st.session_state.mcp_connection = get_agent_loop().submit(
+        connect_mcp(get_mcp_pool(), st.session_state.startup_timings))
 
-        # Add welcome message
-        welcome_message = await agent.invoke(
-            "Hello! I'm your Kubernetes assistant. How can I help you with your EKS cluster today?"
-        )
-        st.session_state.messages.append({"role": "assistant", "content": welcome_message})
 
-        return agent
+def ensure_agent():
+    """Build this session's agent the first time it is needed, on the connection started with the session"""
+    if st.session_state.agent is not None:
+        return st.session_state.agent
+    timings = st.session_state.startup_timings
+    try:
+        with st.spinner("Connecting to the Kubernetes assistant..."):
+            if st.session_state.mcp_connection is None:
+                st.session_state.mcp_connection = get_agent_loop().submit(connect_mcp(get_mcp_pool(), timings))
+            started = time.perf_counter()
+            st.session_state.mcp_client = st.session_state.mcp_connection.result(MCP_CONNECT_TIMEOUT_SECONDS)
+            timings.record('agent_waited_for_mcp', started)
+            with timings.phase('agent_build'):
+                st.session_state.agent = get_agent_loop().run(initialize_agent(st.session_state.mcp_client))
     except Exception as e:
+        # Connect again on the next question
+        st.session_state.mcp_connection = None
         st.error(f"Error initializing agent: {str(e)}")
-        return None
+    return st.session_state.agent
 
 
-# Properly clean up resources
-async def cleanup():
-    """Clean up resources properly"""
-    if hasattr(st.session_state, 'resource_stack'):
-        await st.session_state.resource_stack.aclose()
-    elif st.session_state.mcp_client:
-        try:
-            if hasattr(st.session_state.mcp_client, 'aclose'):
-                await st.session_state.mcp_client.aclose()
-        except Exception as e:
-            print(f"Error closing MCP client: {str(e)}")
+def get_eks_clusters():
+    """Get list of EKS clusters using boto3"""
+    return [EKS_CLUSTER]
 
 
-# Register cleanup function with proper event loop handling
-atexit.register(lambda: run_async(cleanup()))
+def record_lambda_metrics(metrics):
+    """Keep the per-phase timings and counts the kubectl Lambda reports for the timings panel"""
+    # A cached result carries the metrics of the invocation that produced it; count those only once
+    if metrics and not any(recorded is metrics for recorded in st.session_state.lambda_metrics):
+        st.session_state.lambda_metrics.append(metrics)
 
 
-def get_eks_clusters():
-    """Get list of EKS clusters using boto3"""
-    return [EKS_CLUSTER]
+@st.cache_resource
+def get_kubectl_cache():
+    """kubectl Lambda results shared by every session of this process"""
+    return SharedCache(max_stale=KUBECTL_CACHE_MAX_STALE_SECONDS)
 
 
-def run_kubectl_command(command):
-    """Run kubectl command and return the output"""
-    event = {
-        "ClusterName": EKS_CLUSTER,
-        "Command": command
+def cache_ttl(command):
+    """Seconds the result of a command may be shared before it is refreshed; 0 for anything but kubectl get"""
+    args = command.split()
+    if len(args) < 3 or args[1] != 'get':
+        return 0
+    return RESOURCE_CACHE_TTLS.get(args[2], KUBECTL_CACHE_TTL_SECONDS)
+
+
+def cache_key(event):
+    """The shared cache key of an event: what it asks for, without the per-request Continue and IfNoneMatch"""
+    commands = [{field: value for field, value in entry.items() if field not in ('Continue', 'IfNoneMatch')}
+                for entry in event.get('Commands', [])]
+    return json.dumps(dict(event, Commands=commands) if commands else event, sort_keys=True)
+
+
+def revalidated(previous, output):
+    """The output a cache entry is refreshed with: its previous output again when the Lambda reports no change"""
+    if previous is None or not (isinstance(output, dict) and output.get('NotModified')):
+        return output
+    refreshed = dict(previous)
+    for key in ('Metadata', 'Metrics'):
+        if key in output:
+            refreshed[key] = output[key]
+    return refreshed
+
+
+def invoke_kubectl_lambda(event):
+    """Invoke the kubectl Lambda and return its payload.
+
+    Safe to call from worker threads: it touches neither the page nor session state.
+    """
+    response = lambda_client.invoke(
+        FunctionName=LAMBDA_ARN,
+        InvocationType='RequestResponse',
+        Payload=json.dumps(event)
+    )
+    payload_bytes = response['Payload'].read()
+    result = loads(payload_bytes)
+    if response.get('FunctionError'):
+        message = result.get('errorMessage') if isinstance(result, dict) else None
+        raise RuntimeError(message or payload_bytes.decode('utf-8'))
+    return result
+
+
+def kubectl_batch_event(commands, options=None, cluster_name=EKS_CLUSTER):
+    """Build the event for running several kubectl commands in a single Lambda invocation.
+
+    Commands are keyed by "<kind>" or "<kind>#<page>"; options maps a key to extra event fields such as
+    Continue.
+    """
+    options = options or {}
+    entries = []
+    for key, command in commands.items():
+        kind = key.split('#')[0]
+        entry = {
+            "Id": key,
+            "Command": command,
+            "Projection": RESOURCE_PROJECTIONS.get(kind),
+            "Limit": RESOURCE_PAGE_SIZES.get(kind)
+        }
+        entry.update(options.get(key, {}))
+        entries.append(entry)
+
+    return {
+        "ClusterName": cluster_name,
+        "Commands": entries,
+        "TimeoutSeconds": KUBECTL_TIMEOUT_SECONDS,
+        "Envelope": ENVELOPE_VERSION,
+        "AcceptEncoding": ACCEPT_ENCODING
     }
 
-    payload = json.dumps(event)
-
-    try:
-        response = lambda_client.invoke(
-            FunctionName=LAMBDA_ARN,
-            InvocationType='RequestResponse',
-            Payload=payload
-        )
-        payload_bytes = response['Payload'].read()
-        payload_str = payload_bytes.decode('utf-8')
-        return json.loads(payload_str)
 
-    except Exception as e:
-        st.error(f"Error running kubectl command: {str(e)}")
-        raise
+def command_result(result, key):
+    """One command's {'Output': ..., 'Metrics': ...} from a batch invocation's payload, raising its error"""
+    if 'Results' not in result:
+        raise RuntimeError(result.get('errorMessage', str(result)))
+    outcome = result['Results'].get(key, {'Error': f"No result for {key}"})
+    if 'Error' in outcome:
+        raise RuntimeError(outcome['Error'])
+    return {'Output': outcome['Output'], 'Metrics': result.get('Metrics')}
+
+
+def load_first_pages(commands, cluster_name=EKS_CLUSTER, cache=None):
+    """Run {kind: command} through the shared cache, fetching every kind it has no current output for in
+    one batch invocation; paged kinds get their first page.
+
+    Returns {kind: {'Output': ..., 'Metrics': ...} or the exception it failed with}. A refresh sends the
+    cached output's ETag, so an unchanged kind costs its place in the batch but not the transfer. Failed
+    commands are not cached. STALE_KINDS are served past their TTL while they are refreshed; the rest
+    are waited for, so a snapshot is not published one poll behind.
+    """
+    event = kubectl_batch_event(commands, cluster_name=cluster_name)
+    entries = {entry['Id']: entry for entry in event['Commands']}
+    kinds = {cache_key(dict(event, Commands=[entry])): kind for kind, entry in entries.items()}
+
+    def load(previous):
+        batch = []
+        for key, cached in previous.items():
+            entry = entries[kinds[key]]
+            if cached is not None:
+                entry = dict(entry, IfNoneMatch=output_etag(cached['Output']))
+            batch.append(entry)
+        result = invoke_kubectl_lambda(dict(event, Commands=batch))
+        loaded = {}
+        for key, cached in previous.items():
+            try:
+                loaded[key] = command_result(result, kinds[key])
+            except RuntimeError as e:
+                loaded[key] = e
+                continue
+            loaded[key]['Output'] = revalidated(cached['Output'] if cached else None, loaded[key]['Output'])
+        return loaded
+
+    requests = {key: (cache_ttl(commands[kind]), kind in STALE_KINDS) for key, kind in kinds.items()}
+    results = (cache or get_kubectl_cache()).get_many(requests, load)
+    return {kinds[key]: result for key, result in results.items()}
+
+
+def load_kubectl_page(key, command, continue_token, etag=None, cluster_name=EKS_CLUSTER):
+    """Fetch a later page ("<kind>#<n>") of a paged kind, sending etag as IfNoneMatch.
+
+    Pages are not cached: each continue token is read once, by the build paging through the list. An
+    unchanged page comes back as a NotModified marker that still carries the next continue token.
+    """
+    options = {key: {"Continue": continue_token, "IfNoneMatch": etag}}
+    return command_result(invoke_kubectl_lambda(kubectl_batch_event({key: command}, options, cluster_name)), key)
+
+
+RESOURCE_COMMANDS = {
+    'namespaces': "kubectl get namespaces -o json",
+    'pods': "kubectl get pods --all-namespaces -o json",
+    'nodes': "kubectl get nodes -o json",
+    'deployments': "kubectl get deployments --all-namespaces -o json",
+    'services': "kubectl get services --all-namespaces -o json",
+}
+
+# Fields the kubectl Lambda keeps per item: exactly what the eks_assistant.parsing functions read
+RESOURCE_PROJECTIONS = {
+    'namespaces': ["metadata.name"],
+    'pods': [
+        "metadata.name", "metadata.namespace", "metadata.creationTimestamp",
+        "status.phase", "status.containerStatuses.ready", "status.containerStatuses.restartCount",
+    ],
+    'nodes': [
+        "metadata.name", "metadata.creationTimestamp", "metadata.labels",
+        "status.conditions.type", "status.conditions.status", "status.nodeInfo.kubeletVersion",
+        "status.addresses", "status.capacity.cpu", "status.capacity.memory",
+    ],
+    'deployments': [
+        "metadata.name", "metadata.namespace", "metadata.creationTimestamp",
+        "spec.replicas", "status.availableReplicas", "status.readyReplicas",
+    ],
+    'services': [
+        "metadata.name", "metadata.namespace", "metadata.creationTimestamp",
+        "spec.type", "spec.clusterIP", "spec.ports", "status.loadBalancer.ingress",
+    ],
+}
+
+# Seconds a kind's list is shared between sessions before it is refreshed
+RESOURCE_CACHE_TTLS = {
+    kind: float(os.getenv(f'KUBECTL_CACHE_TTL_{kind.upper()}', default))
+    for kind, default in (('namespaces', 60), ('pods', 10), ('nodes', 30), ('deployments', 15), ('services', 30))
+}
+
+# Kinds a snapshot may take from the shared cache past their TTL while the cache refreshes them: they
+# change too rarely for a build to need to wait for their revalidation
+STALE_KINDS = {'namespaces', 'nodes'}
+
+# Scope of the cluster-wide snapshot: all namespaces, no label or field selector
+UNSCOPED = (None, '', '')
+
+# Kinds that are listed page by page; the first page comes with the batch, the rest are fetched in turn
+RESOURCE_PAGE_SIZES = {
+    'pods': PODS_PAGE_SIZE,
+}
+
+
+# Resource monitor tab -> the kinds it shows
+RESOURCE_TABS = {
+    "Namespaces": ['namespaces'],
+    "Pods": ['pods'],
+    "Nodes": ['nodes'],
+    "Deployments": ['deployments'],
+    "Services": ['services'],
+    "Pod trends": ['pods'],
+    "Restart trends": ['pods'],
+}
+
+# Kinds counted per namespace in the Namespaces tab's chart
+NAMESPACE_CHART_KINDS = ['pods', 'deployments', 'services']
+
+RESOURCE_PARSERS = {
+    'namespaces': parse_namespaces,
+    'pods': parse_pods,
+    'nodes': parse_nodes,
+    'deployments': parse_deployments,
+    'services': parse_services,
+}
+
+
+def scoped_commands(scope):
+    """RESOURCE_COMMANDS narrowed to a scope: (namespace or None, label selector, pod field selector).
+
+    Nodes and namespaces are always listed in full; the unscoped scope gives RESOURCE_COMMANDS itself.
+    """
+    namespace, label_selector, field_selector = scope
+    commands = dict(RESOURCE_COMMANDS)
+    for kind in ('pods', 'deployments', 'services'):
+        args = ["kubectl", "get", kind]
+        args += ["-n", shlex.quote(namespace)] if namespace else ["--all-namespaces"]
+        if label_selector:
+            args += ["-l", shlex.quote(label_selector)]
+        if field_selector and kind == 'pods':
+            args += ["--field-selector", shlex.quote(field_selector)]
+        commands[kind] = " ".join(args + ["-o", "json"])
+    return commands
+
+
+def resource_scope():
+    """The scope chosen in the resource monitor, from its widgets' session state"""
+    namespace = st.session_state.get('scope_namespace', 'All namespaces')
+    return (
+        None if namespace == 'All namespaces' else namespace,
+        st.session_state.get('scope_labels', '').strip(),
+        st.session_state.get('scope_fields', '').strip()
+    )
+
+
+@st.cache_resource
+def get_tab_predictor():
+    """Which resource tab follows which, learnt from every session"""
+    return NextTabPredictor(RESOURCE_TABS)
+
+
+@st.cache_resource(max_entries=64)
+def get_snapshot_history(cluster_name, scope=UNSCOPED):
+    """Summaries of the last SNAPSHOT_HISTORY_DEPTH snapshots of a cluster and scope with pods"""
+    return SnapshotHistory(SNAPSHOT_HISTORY_DEPTH)
+
+
+@st.cache_resource(max_entries=64)
+def get_snapshot_poller(cluster_name, scope=UNSCOPED):
+    """The one poller keeping a cluster's resource snapshot for a scope current for every session.
+
+    Only the unscoped poller lists namespaced kinds across the whole cluster. Pollers nobody reads
+    stop, so a cluster-wide list only runs while someone is looking at all namespaces.
+    """
+    history = get_snapshot_history(cluster_name, scope)
+
+    cache = get_kubectl_cache()
+
+    def load_first(commands):
+        return load_first_pages(commands, cluster_name, cache)
+
+    def load_page(key, command, continue_token, etag):
+        return load_kubectl_page(key, command, continue_token, etag, cluster_name)
+
+    def record(snapshot):
+        # A pod list that failed to load is the previous one again, not a new sample
+        if 'pods' in snapshot.tables.loaded and 'pods' not in snapshot.errors:
+            history.record(snapshot.taken_at, snapshot.tables)
+
+    return SnapshotPoller(
+        snapshot_builder(load_first, load_page, scoped_commands(scope), RESOURCE_PARSERS),
+        interval=SNAPSHOT_INTERVAL_SECONDS,
+        idle_after=SNAPSHOT_IDLE_AFTER_SECONDS,
+        max_interval=SNAPSHOT_MAX_INTERVAL_SECONDS,
+        stop_after=SNAPSHOT_STOP_AFTER_SECONDS,
+        wanted=['namespaces'],
+        forget_after=SNAPSHOT_FORGET_AFTER_SECONDS,
+        derive=build_tables,
+        on_snapshot=record
+    )
+
+
+def use_snapshot(snapshot):
+    """Point this session at a snapshot; sessions share its tables instead of holding their own copies"""
+    st.session_state.resource_tables = snapshot.tables
+    st.session_state.snapshot_version = snapshot.version
+    st.session_state.resource_timestamp = snapshot.taken_at.astimezone()
+    for metrics in snapshot.metrics:
+        record_lambda_metrics(metrics)
+    for kind, error in snapshot.errors.items():
+        # The other kinds still render
+        st.warning(f"Error fetching {kind}: {error}")
+    if not snapshot.complete:
+        st.caption(f"Loaded {len(snapshot.resources['pods'])} pods so far...")
 
 
 @st.fragment
-def fetch_kubernetes_resources():
-    """Fetch Kubernetes resources using kubectl commands"""
+def fetch_kubernetes_resources(refresh=False):
+    """Show the latest snapshot of the cluster's Kubernetes resources, waiting for one if there is none yet"""
     # Make sure we have a selected cluster
     if not st.session_state.cluster_name:
         clusters = get_eks_clusters()
@@ -187,224 +535,151 @@ def fetch_kubernetes_resources():
             return
 
     try:
-        # Fetch namespaces first
-        namespaces_cmd = "kubectl get namespaces -o json"
-        namespaces_output = run_kubectl_command(namespaces_cmd)
-        namespaces_data = json.loads(namespaces_output) if namespaces_output else {"items": []}
-
-        # Process namespaces data
-        namespaces_list = []
-        for namespace in namespaces_data.get("items", []):
-            namespace_name = namespace.get("metadata", {}).get("name", "")
-            if namespace_name:
-                namespaces_list.append(namespace_name)
-
-        # Add namespaces to kubernetes_resources dictionary
-        # (We'll update the full dictionary at the end)
-
-        # Fetch pods
-        pods_cmd = "kubectl get pods --all-namespaces -o json"
-        pods_output = run_kubectl_command(pods_cmd)
-        pods_data = json.loads(pods_output) if pods_output else {"items": []}
-
-        # Process pods data
-        pods_list = []
-        for pod in pods_data.get("items", []):
-            pod_info = {
-                "name": pod.get("metadata", {}).get("name", ""),
-                "namespace": pod.get("metadata", {}).get("namespace", ""),
-                "status": pod.get("status", {}).get("phase", ""),
-                "ready": check_pod_ready(pod),
-                "restarts": get_pod_restarts(pod),
-                "age": calculate_age(pod.get("metadata", {}).get("creationTimestamp", "")),
-            }
-            pods_list.append(pod_info)
-
-        # Fetch nodes
-        nodes_cmd = "kubectl get nodes -o json"
-        nodes_output = run_kubectl_command(nodes_cmd)
-        nodes_data = json.loads(nodes_output) if nodes_output else {"items": []}
-
-        # Process nodes data
-        nodes_list = []
-        for node in nodes_data.get("items", []):
-            node_status = "Ready"
-            for condition in node.get("status", {}).get("conditions", []):
-                if condition.get("type") == "Ready" and condition.get("status") != "True":
-                    node_status = "NotReady"
-
-            node_info = {
-                "name": node.get("metadata", {}).get("name", ""),
-                "status": node_status,
-                "roles": get_node_roles(node),
-                "age": calculate_age(node.get("metadata", {}).get("creationTimestamp", "")),
-                "version": node.get("status", {}).get("nodeInfo", {}).get("kubeletVersion", ""),
-                "internal_ip": get_node_internal_ip(node),
-                "instance_type": node.get("metadata", {}).get("labels", {}).get("node.kubernetes.io/instance-type", ""),
-                "cpu_capacity": node.get("status", {}).get("capacity", {}).get("cpu", ""),
-                "memory_capacity": node.get("status", {}).get("capacity", {}).get("memory", ""),
-            }
-            nodes_list.append(node_info)
-
-        # Fetch deployments
-        deployments_cmd = "kubectl get deployments --all-namespaces -o json"
-        deployments_output = run_kubectl_command(deployments_cmd)
-        deployments_data = json.loads(deployments_output) if deployments_output else {"items": []}
-
-        # Process deployments data
-        deployments_list = []
-        for deployment in deployments_data.get("items", []):
-            deployment_info = {
-                "name": deployment.get("metadata", {}).get("name", ""),
-                "namespace": deployment.get("metadata", {}).get("namespace", ""),
-                "desired_replicas": deployment.get("spec", {}).get("replicas", 0),
-                "available_replicas": deployment.get("status", {}).get("availableReplicas", 0),
-                "ready_replicas": deployment.get("status", {}).get("readyReplicas", 0),
-                "age": calculate_age(deployment.get("metadata", {}).get("creationTimestamp", ""))
-            }
-            deployments_list.append(deployment_info)
-
-        # Fetch services
-        services_cmd = "kubectl get services --all-namespaces -o json"
-        services_output = run_kubectl_command(services_cmd)
-        services_data = json.loads(services_output) if services_output else {"items": []}
-
-        # Process services data
-        services_list = []
-        for service in services_data.get("items", []):
-            service_info = {
-                "name": service.get("metadata", {}).get("name", ""),
-                "namespace": service.get("metadata", {}).get("namespace", ""),
-                "type": service.get("spec", {}).get("type", ""),
-                "cluster_ip": service.get("spec", {}).get("clusterIP", ""),
-                "external_ip": get_external_ip(service),
-                "ports": format_ports(service.get("spec", {}).get("ports", [])),
-                "age": calculate_age(service.get("metadata", {}).get("creationTimestamp", ""))
-            }
-            services_list.append(service_info)
-
-        # Update session state
-        st.session_state.kubernetes_resources = {
-            'namespaces': namespaces_list,
-            'pods': pods_list,
-            'nodes': nodes_list,
-            'deployments': deployments_list,
-            'services': services_list
-        }
-        st.session_state.resource_timestamp = datetime.now()
+        poller = get_snapshot_poller(st.session_state.cluster_name, resource_scope())
+        if refresh:
+            poller.refresh()
+        snapshot = poller.current()
+        if refresh or snapshot is None:
+            snapshot = poller.wait(0 if snapshot is None else snapshot.version, KUBECTL_TIMEOUT_SECONDS)
+        if snapshot is None:
+            raise RuntimeError(str(poller.error) if poller.error else "timed out waiting for the first snapshot")
+        use_snapshot(snapshot)
 
     except Exception as e:
         st.error(f"Error fetching Kubernetes resources: {str(e)}")
 
 
-def check_pod_ready(pod):
-    """Check if pod is ready"""
-    container_statuses = pod.get("status", {}).get("containerStatuses", [])
-    if not container_statuses:
-        return "0/0"
-
-    ready_count = sum(1 for status in container_statuses if status.get("ready", False))
-    return f"{ready_count}/{len(container_statuses)}"
-
-
-def get_pod_restarts(pod):
-    """Get total pod restarts"""
-    container_statuses = pod.get("status", {}).get("containerStatuses", [])
-    if not container_statuses:
-        return 0
-
-    return sum(status.get("restartCount", 0) for status in container_statuses)
-
-
-def get_node_roles(node):
-    """Extract node roles from labels"""
-    labels = node.get("metadata", {}).get("labels", {})
-    roles = []
-
-    for label in labels:
-        if label.startswith("node-role.kubernetes.io/"):
-            roles.append(label.split("/")[1])
-
-    return ", ".join(roles) if roles else "worker"
-
-
-def get_node_internal_ip(node):
-    """Get node internal IP"""
-    addresses = node.get("status", {}).get("addresses", [])
-    for address in addresses:
-        if address.get("type") == "InternalIP":
-            return address.get("address", "")
-    return ""
+@st.fragment(run_every=5)
+def watch_snapshot():
+    """Re-render the dashboard when the shared snapshot this session shows has been replaced.
 
+    Also asks again for the kinds on show, so the poller keeps loading them while the page stays open.
+    """
+    if not st.session_state.cluster_name:
+        return
+    poller = get_snapshot_poller(st.session_state.cluster_name, resource_scope())
+    if st.session_state.shown_tab:
+        poller.want(*shown_kinds(st.session_state.shown_tab))
+    snapshot = poller.current()
+    if snapshot and snapshot.version != st.session_state.snapshot_version:
+        st.rerun()
 
-def get_external_ip(service):
-    """Get external IP address of service"""
-    if service.get("spec", {}).get("type") == "LoadBalancer":
-        ingress = service.get("status", {}).get("loadBalancer", {}).get("ingress", [])
-        if ingress and len(ingress) > 0:
-            return ingress[0].get("hostname", "") or ingress[0].get("ip", "")
-    return "N/A"
 
+def process_user_input(user_input):
+    """Send user input to the agent on the agent loop; pending_reply() shows the answer when it comes"""
+    agent = ensure_agent()
+
+    # Add user message to chat history
+    st.session_state.messages.append({"role": "user", "content": user_input})
+
+    if agent:
+        # Tool calls arrive on the agent loop as they run, then the reply; pending_reply() shows them meanwhile
+        reply = StreamedReply()
+        events = stream_reply(agent, user_input, [st.session_state.mcp_client])
+        st.session_state.streamed_reply = reply
+        st.session_state.pending_reply = get_agent_loop().submit(reply.collect(events))
+    else:
+        st.session_state.messages.append({"role": "assistant", "content": "Error: the assistant is not available"})
 
-def format_ports(ports):
-    """Format service ports"""
-    port_strings = []
-    for port in ports:
-        protocol = port.get("protocol", "TCP")
-        port_str = f"{port.get('port', '')}"
-        if "targetPort" in port:
-            port_str += f":{port.get('targetPort', '')}"
-        port_str += f"/{protocol}"
-        port_strings.append(port_str)
 
-    return ", ".join(port_strings)
+@st.fragment(run_every=0.5)
+def pending_reply():
+    """Show the agent's tool calls as they run, then its reply, without holding up the rest of the page"""
+    future, reply = st.session_state.pending_reply, st.session_state.streamed_reply
+    if future is None:
+        return
+    if not future.done():
+        with st.chat_message("assistant"):
+            show_tool_calls(reply.tool_calls)
+            st.write(reply.text or "Awaiting agent response...")
+        return
 
+    st.session_state.pending_reply = st.session_state.streamed_reply = None
+    try:
+        # Add assistant response to chat history
+        st.session_state.messages.append(
+            {"role": "assistant", "content": future.result(), "tool_calls": list(reply.tool_calls)})
+    except Exception as e:
+        error_message = f"Error: {str(e)}"
+        st.session_state.messages.append(
+            {"role": "assistant", "content": error_message, "tool_calls": list(reply.tool_calls)})
+    st.rerun()
 
-def calculate_age(timestamp_str):
-    """Calculate age from timestamp"""
-    if not timestamp_str:
-        return ""
 
-    try:
-        created_time = datetime.strptime(timestamp_str, "%Y-%m-%dT%H:%M:%SZ")
-        # Use timezone-aware datetime
-        now = datetime.now(UTC)
-        diff = now - created_time.replace(tzinfo=UTC)
-
-        days = diff.days
-        hours, remainder = divmod(diff.seconds, 3600)
-        minutes, _ = divmod(remainder, 60)
-
-        if days > 0:
-            return f"{days}d"
-        elif hours > 0:
-            return f"{hours}h"
+def show_tool_calls(tool_calls):
+    """One collapsed box per MCP tool call of a reply: running, done in so many seconds, or failed"""
+    for call in list(tool_calls):
+        if not call.done:
+            label, state = f"🔧 {call.name}...", "running"
         else:
-            return f"{minutes}m"
-    except Exception:
-        return ""
+            label, state = f"🔧 {call.name} ({call.duration:.1f}s)", "error" if call.error else "complete"
+        with st.status(label, state=state, expanded=False):
+            if call.arguments:
+                st.write(call.arguments)
+            if call.done:
+                st.code(call.error or call.output or "(no output)")
+
+
+def shown_kinds(tab):
+    """The kinds a tab shows as it is set up now: its own, and the chart's when the Namespaces tab has it on"""
+    if tab == "Namespaces" and st.session_state.get('namespace_chart'):
+        return RESOURCE_TABS[tab] + NAMESPACE_CHART_KINDS
+    return RESOURCE_TABS[tab]
+
+
+def load_tab(tab):
+    """Make sure this session shows a snapshot with the tab's kinds, and prefetch the likely next tab's.
+
+    Kinds are only fetched once a session has opened their tab (or been predicted to), so the first
+    paint only waits for the namespace list.
+    """
+    predictor = get_tab_predictor()
+    predictor.record(st.session_state.shown_tab, tab)
+    st.session_state.shown_tab = tab
+    if not st.session_state.cluster_name:
+        return
 
+    poller = get_snapshot_poller(st.session_state.cluster_name, resource_scope())
+    kinds = RESOURCE_TABS[tab]
+    next_tab = predictor.predict(tab)
+    poller.want(*shown_kinds(tab), *(RESOURCE_TABS[next_tab] if next_tab else ()))
+
+    tables = st.session_state.resource_tables
+    if tables is None or not tables.loaded.issuperset(kinds):
+        with st.spinner(f"Loading {tab.lower()}..."):
+            snapshot = poller.wait(timeout=KUBECTL_TIMEOUT_SECONDS, has=kinds)
+        if snapshot is not None:
+            use_snapshot(snapshot)
 
-def process_user_input(user_input):
-    """Process user input synchronously by properly managing async code"""
-    with st.session_state.agent_lock:
-        if not st.session_state.agent:
-            st.session_state.agent = run_async(initialize_agent())
-            st.session_state.is_agent_initialized = True
 
-        # Add user message to chat history
-        st.session_state.messages.append({"role": "user", "content": user_input})
+def paged_table(kind, rows, **dataframe_options):
+    """Show one page of rows of a kind's table, sorted server side; returns the page and the dataframe event.
 
-        try:
-            # Get response from agent
-            with st.spinner("Awaiting agent response"):
-                response = run_async(st.session_state.agent.invoke(user_input))
+    Only the page goes to the browser, so reruns cost the same however large the cluster is.
+    """
+    tables = st.session_state.resource_tables
+    columns = list(TABLE_COLUMNS[kind])
 
-            # Add assistant response to chat history
-            st.session_state.messages.append({"role": "assistant", "content": response})
-        except Exception as e:
-            error_message = f"Error: {str(e)}"
-            st.session_state.messages.append({"role": "assistant", "content": error_message})
+    col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
+    with col1:
+        sort_by = st.selectbox("Sort by", [None] + columns, key=f"{kind}_sort_by",
+                               format_func=lambda column: "(as listed)" if column is None else column)
+    with col2:
+        descending = st.toggle("Descending", key=f"{kind}_descending")
+    with col3:
+        size = st.selectbox("Rows per page", TABLE_PAGE_SIZES, index=1, key=f"{kind}_page_size")
+    pages = max(1, -(-len(rows) // size))
+    # Filters and new snapshots can leave fewer pages than the one last shown
+    if st.session_state.get(f"{kind}_page", 1) > pages:
+        st.session_state[f"{kind}_page"] = pages
+    with col4:
+        number = st.number_input("Page", min_value=1, max_value=pages, key=f"{kind}_page")
+
+    page_df, _ = tables.page(kind, rows, sort_by, descending, number, size)
+    first = (number - 1) * size
+    st.caption(f"{first + 1 if len(rows) else 0}–{first + len(page_df)} of {len(rows)} {kind}")
+    event = st.dataframe(page_df, column_order=columns, use_container_width=True, **dataframe_options)
+    return page_df, event
 
 
 def create_resource_monitor():
@@ -431,79 +706,70 @@ def create_resource_monitor():
     col1, col2 = st.columns([1, 3])
     with col1:
         if st.button("🔄 Refresh Data"):
-            fetch_kubernetes_resources()
+            fetch_kubernetes_resources(refresh=True)
     with col2:
         st.text(f"Last updated: {st.session_state.resource_timestamp.strftime('%Y-%m-%d %H:%M:%S')}")
 
-    # Create tabs for different resource types
-    tab1, tab2, tab3, tab4, tab5 = st.tabs(["Namespaces", "Pods", "Nodes", "Deployments", "Services"])
+    # Scope of the pod, deployment and service lists, applied by kubectl in the Lambda; main() fetches
+    # the scoped snapshot on the rerun a change triggers. Only "All namespaces" lists them cluster-wide.
+    tables = st.session_state.resource_tables
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        namespaces = tables.namespaces if tables is not None else []
+        if st.session_state.get('scope_namespace', 'All namespaces') not in ['All namespaces'] + namespaces:
+            st.session_state.scope_namespace = 'All namespaces'
+        st.selectbox("Namespace", ['All namespaces'] + namespaces, key="scope_namespace")
+    with col2:
+        st.text_input("Label selector", key="scope_labels", placeholder="app=web,tier!=db")
+    with col3:
+        st.text_input("Pod field selector", key="scope_fields", placeholder="status.phase=Running")
+
+    # Where the time of recent kubectl Lambda calls went (kubeconfig, token, kubectl, retries, bytes)
+    if st.session_state.lambda_metrics:
+        with st.expander("⏱️ kubectl Lambda timings"):
+            metrics_df = pd.DataFrame(list(st.session_state.lambda_metrics)).fillna(0)
+            summary_df = metrics_df.agg(['mean', 'max']).T
+            summary_df['last'] = metrics_df.iloc[-1]
+            st.caption(f"Across the last {len(metrics_df)} invocations")
+            st.dataframe(summary_df.round(2), use_container_width=True)
+
+    # One tab per resource type; only the shown one is rendered, and its kinds loaded
+    shown_tab = st.segmented_control("Resources", list(RESOURCE_TABS), default="Namespaces", key="resource_tab",
+                                     label_visibility="collapsed") or "Namespaces"
+    load_tab(shown_tab)
+    tables = st.session_state.resource_tables
 
     # Namespaces tab
-    with tab1:
-        if st.session_state.kubernetes_resources['namespaces']:
+    if shown_tab == "Namespaces":
+        if tables is not None and tables.namespaces:
             try:
                 # Convert namespace list to DataFrame for display
-                namespace_df = pd.DataFrame(st.session_state.kubernetes_resources['namespaces'], columns=['Name'])
+                namespace_df = pd.DataFrame(tables.namespaces, columns=['Name'])
 
                 st.dataframe(namespace_df, use_container_width=True)
 
                 # Show namespace count
                 st.metric("Total Namespaces", len(namespace_df))
 
-                # Create namespace visualization
-                if len(namespace_df) > 0:
-                    # Count resources per namespace
-                    namespace_resource_counts = {}
-
-                    # Count pods per namespace
-                    if st.session_state.kubernetes_resources['pods']:
-                        pod_df = pd.DataFrame(st.session_state.kubernetes_resources['pods'])
-                        pod_counts = pod_df['namespace'].value_counts().to_dict()
-                        for ns in namespace_df['Name']:
-                            namespace_resource_counts[ns] = namespace_resource_counts.get(ns, {})
-                            namespace_resource_counts[ns]['pods'] = pod_counts.get(ns, 0)
-
-                    # Count deployments per namespace
-                    if st.session_state.kubernetes_resources['deployments']:
-                        deployment_df = pd.DataFrame(st.session_state.kubernetes_resources['deployments'])
-                        deployment_counts = deployment_df['namespace'].value_counts().to_dict()
-                        for ns in namespace_df['Name']:
-                            namespace_resource_counts[ns] = namespace_resource_counts.get(ns, {})
-                            namespace_resource_counts[ns]['deployments'] = deployment_counts.get(ns, 0)
-
-                    # Count services per namespace
-                    if st.session_state.kubernetes_resources['services']:
-                        service_df = pd.DataFrame(st.session_state.kubernetes_resources['services'])
-                        service_counts = service_df['namespace'].value_counts().to_dict()
-                        for ns in namespace_df['Name']:
-                            namespace_resource_counts[ns] = namespace_resource_counts.get(ns, {})
-                            namespace_resource_counts[ns]['services'] = service_counts.get(ns, 0)
-
-                    # Create a dataframe for visualization
-                    resource_data = []
-                    for ns, counts in namespace_resource_counts.items():
-                        for resource_type, count in counts.items():
-                            resource_data.append({
-                                'namespace': ns,
-                                'resource_type': resource_type,
-                                'count': count
-                            })
-
-                    if resource_data:
-                        resource_df = pd.DataFrame(resource_data)
-
-                        # Create a grouped bar chart
-                        chart = alt.Chart(resource_df).mark_bar().encode(
-                            x=alt.X('namespace:N', title='Namespace'),
-                            y=alt.Y('count:Q', title='Count'),
-                            color=alt.Color('resource_type:N', scale=alt.Scale(
-                                domain=['pods', 'deployments', 'services'],
-                                range=['#4CAF50', '#2196F3', '#FF9800']
-                            )),
-                            tooltip=['namespace', 'resource_type', 'count']
-                        ).properties(title='Resources by Namespace')
-
-                        st.altair_chart(chart, use_container_width=True)
+                # Resources per namespace, counted once per snapshot. It needs the full pod list on every
+                # poll, so load_tab() only asks for the counted kinds while the chart is on; they show up
+                # as they arrive
+                show_chart = st.toggle("Resources per namespace", key="namespace_chart")
+                loading = [kind for kind in NAMESPACE_CHART_KINDS if kind not in tables.loaded]
+                if show_chart and loading:
+                    st.caption(f"Loading {', '.join(loading)} for the chart...")
+                if show_chart and not tables.namespace_counts.empty:
+                    chart = alt.Chart(tables.namespace_counts).mark_bar().encode(
+                        x=alt.X('namespace:N', title='Namespace'),
+                        y=alt.Y('count:Q', title='Count'),
+                        color=alt.Color('resource_type:N', scale=alt.Scale(
+                            domain=NAMESPACE_CHART_KINDS,
+                            range=['#4CAF50', '#2196F3', '#FF9800']
+                        )),
+                        tooltip=['namespace', 'resource_type', 'count']
+                    ).properties(title='Resources by Namespace')
+
+                    st.altair_chart(chart, use_container_width=True)
 
             except Exception as e:
                 st.error(f"Error rendering namespace data: {str(e)}")
@@ -511,36 +777,33 @@ def create_resource_monitor():
             st.info("No namespace data available. Click Refresh to fetch data.")
 
     # Pod metrics
-    with tab2:
-        if st.session_state.kubernetes_resources['pods']:
+    if shown_tab == "Pods":
+        if tables is not None and not tables.pods.empty:
             try:
-                pod_df = pd.DataFrame(st.session_state.kubernetes_resources['pods'])
-
-                # Filter by namespace - use the namespaces from kubernetes_resources
-                available_namespaces = ['All namespaces']
-                if st.session_state.kubernetes_resources['namespaces']:
-                    available_namespaces += sorted(st.session_state.kubernetes_resources['namespaces'])
-                else:
-                    # Fallback to unique namespaces from pods if namespace list is empty
-                    available_namespaces += sorted(pod_df['namespace'].unique().tolist())
-
-                selected_namespace = st.selectbox("Filter by namespace", available_namespaces)
-
-                if selected_namespace != 'All namespaces':
-                    filtered_df = pod_df[pod_df['namespace'] == selected_namespace]
-                else:
-                    filtered_df = pod_df
-
-                # Search filter
-                search_term = st.text_input("Search pods")
+                filtered_df = tables.pods
+
+                # Search filter, answered from the snapshot's pod name index
+                search_term = st.text_input(
+                    "Search pods", placeholder="web ^api ns:default status:failed restarts>3",
+                    help="Name substrings, ^prefixes and ns:, status: and restarts>, >=, <, <=, = filters; "
+                         "every term must match"
+                )
                 if search_term:
-                    filtered_df = filtered_df[filtered_df['name'].str.contains(search_term, case=False)]
+                    try:
+                        filtered_df = tables.search_pods(search_term)
+                    except ValueError as e:
+                        st.warning(str(e))
+                        search_term = ""
 
-                st.dataframe(filtered_df, use_container_width=True)
+                paged_table('pods', filtered_df)
 
                 # Create status chart
-                status_count = filtered_df['status'].value_counts().reset_index()
-                status_count.columns = ['status', 'count']
+                if search_term:
+                    status_count = filtered_df['status'].value_counts().reset_index()
+                    status_count.columns = ['status', 'count']
+                    status_count = status_count[status_count['count'] > 0]
+                else:
+                    status_count = tables.counts(tables.pod_status_counts, 'status')
 
                 if not status_count.empty:
                     status_chart = alt.Chart(status_count).mark_arc().encode(
@@ -559,152 +822,108 @@ def create_resource_monitor():
             st.info("No pod data available. Click Refresh to fetch data.")
 
     # Node metrics
-    with tab3:
-        if st.session_state.kubernetes_resources['nodes']:
+    if shown_tab == "Nodes":
+        if tables is not None and not tables.nodes.empty:
             try:
-                node_df = pd.DataFrame(st.session_state.kubernetes_resources['nodes'])
-                st.dataframe(node_df, use_container_width=True)
-
-                # Create node info visualization
-                if len(node_df) > 0:
-                    # Create a bar chart showing node capacity
-                    node_df['cpu_numeric'] = pd.to_numeric(node_df['cpu_capacity'], errors='coerce')
-
-                    # Clean memory capacity (remove Ki, Mi, etc.)
-                    node_df['memory_numeric'] = node_df['memory_capacity'].apply(
-                        lambda x: float(re.sub(r'[A-Za-z]+', '', x)) if isinstance(x, str) else x
-                    )
-
+                node_df, selection = paged_table('nodes', tables.nodes, on_select="rerun",
+                                                 selection_mode="single-row")
+
+                # Bar charts of the capacity of the nodes on this page, converted from Kubernetes quantities
+                col1, col2 = st.columns(2)
+                with col1:
+                    cpu_chart = alt.Chart(node_df).mark_bar().encode(
+                        x=alt.X('name:N', title='Node Name'),
+                        y=alt.Y('cpu_cores:Q', title='CPU Capacity (cores)'),
+                        color=alt.Color('status:N', scale=alt.Scale(
+                            domain=['Ready', 'NotReady'],
+                            range=['#4CAF50', '#F44336']
+                        ))
+                    ).properties(title='Node CPU Capacity')
+                    st.altair_chart(cpu_chart, use_container_width=True)
+
+                with col2:
+                    memory_chart = alt.Chart(node_df).mark_bar().encode(
+                        x=alt.X('name:N', title='Node Name'),
+                        y=alt.Y('memory_gib:Q', title='Memory Capacity (GiB)'),
+                        color=alt.Color('status:N', scale=alt.Scale(
+                            domain=['Ready', 'NotReady'],
+                            range=['#4CAF50', '#F44336']
+                        ))
+                    ).properties(title='Node Memory Capacity')
+                    st.altair_chart(memory_chart, use_container_width=True)
+
+                # Show the details of the node selected in the table
+                if selection.selection.rows:
+                    node = node_df.iloc[selection.selection.rows[0]]
+                    st.markdown(f"**Node: {node['name']}**")
                     col1, col2 = st.columns(2)
                     with col1:
-                        cpu_chart = alt.Chart(node_df).mark_bar().encode(
-                            x=alt.X('name:N', title='Node Name'),
-                            y=alt.Y('cpu_numeric:Q', title='CPU Capacity (cores)'),
-                            color=alt.Color('status:N', scale=alt.Scale(
-                                domain=['Ready', 'NotReady'],
-                                range=['#4CAF50', '#F44336']
-                            ))
-                        ).properties(title='Node CPU Capacity')
-                        st.altair_chart(cpu_chart, use_container_width=True)
-
+                        st.write("**Status:**", node['status'])
+                        st.write("**Roles:**", node['roles'])
+                        st.write("**Internal IP:**", node['internal_ip'])
                     with col2:
-                        memory_chart = alt.Chart(node_df).mark_bar().encode(
-                            x=alt.X('name:N', title='Node Name'),
-                            y=alt.Y('memory_numeric:Q', title='Memory Capacity'),
-                            color=alt.Color('status:N', scale=alt.Scale(
-                                domain=['Ready', 'NotReady'],
-                                range=['#4CAF50', '#F44336']
-                            ))
-                        ).properties(title='Node Memory Capacity')
-                        st.altair_chart(memory_chart, use_container_width=True)
-
-                    # Show node details in expandable sections
-                    for _, node in node_df.iterrows():
-                        with st.expander(f"Node: {node['name']}"):
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                st.write("**Status:**", node['status'])
-                                st.write("**Roles:**", node['roles'])
-                                st.write("**Internal IP:**", node['internal_ip'])
-                            with col2:
-                                st.write("**Kubernetes Version:**", node['version'])
-                                st.write("**Instance Type:**", node['instance_type'])
-                                st.write("**Age:**", node['age'])
+                        st.write("**Kubernetes Version:**", node['version'])
+                        st.write("**Instance Type:**", node['instance_type'])
+                        st.write("**Age:**", node['age'])
+                else:
+                    st.caption("Select a node in the table to see its details")
             except Exception as e:
                 st.error(f"Error rendering node data: {str(e)}")
         else:
             st.info("No node data available. Click Refresh to fetch data.")
 
     # Deployment metrics
-    with tab4:
-        if st.session_state.kubernetes_resources['deployments']:
+    if shown_tab == "Deployments":
+        if tables is not None and not tables.deployments.empty:
             try:
-                deployment_df = pd.DataFrame(st.session_state.kubernetes_resources['deployments'])
-
-                # Filter by namespace - use the namespaces from kubernetes_resources
-                available_namespaces = ['All namespaces']
-                if st.session_state.kubernetes_resources['namespaces']:
-                    available_namespaces += sorted(st.session_state.kubernetes_resources['namespaces'])
-                else:
-                    # Fallback to unique namespaces from deployments if namespace list is empty
-                    available_namespaces += sorted(deployment_df['namespace'].unique().tolist())
-
-                selected_namespace = st.selectbox("Filter deployments by namespace", available_namespaces,
-                                                  key="deployment_namespace")
-
-                if selected_namespace != 'All namespaces':
-                    filtered_df = deployment_df[deployment_df['namespace'] == selected_namespace]
-                else:
-                    filtered_df = deployment_df
+                filtered_df = tables.deployments
 
                 st.dataframe(filtered_df, use_container_width=True)
 
                 # Create replicas chart
                 if len(filtered_df) > 0:
                     # Melt the dataframe for easier plotting
-                    plot_columns = ['desired_replicas', 'available_replicas', 'ready_replicas']
-                    available_columns = [col for col in plot_columns if col in filtered_df.columns]
-
-                    if available_columns:
-                        melted_df = pd.melt(
-                            filtered_df,
-                            id_vars=['name'],
-                            value_vars=available_columns,
-                            var_name='replica_type',
-                            value_name='count'
-                        )
-
-                        # Create a nicer legend
-                        melted_df['replica_type'] = melted_df['replica_type'].map({
-                            'desired_replicas': 'Desired',
-                            'available_replicas': 'Available',
-                            'ready_replicas': 'Ready'
-                        })
-
-                        replica_chart = alt.Chart(melted_df).mark_bar().encode(
-                            x=alt.X('name:N', title='Deployment Name'),
-                            y=alt.Y('count:Q', title='Replica Count'),
-                            color=alt.Color('replica_type:N', scale=alt.Scale(
-                                domain=['Desired', 'Available', 'Ready'],
-                                range=['#2196F3', '#4CAF50', '#FFC107']
-                            ))
-                        ).properties(title='Deployment Replicas')
-
-                        st.altair_chart(replica_chart, use_container_width=True)
+                    melted_df = pd.melt(
+                        filtered_df,
+                        id_vars=['name'],
+                        value_vars=['desired_replicas', 'available_replicas', 'ready_replicas'],
+                        var_name='replica_type',
+                        value_name='count'
+                    )
+
+                    # Create a nicer legend
+                    melted_df['replica_type'] = melted_df['replica_type'].map({
+                        'desired_replicas': 'Desired',
+                        'available_replicas': 'Available',
+                        'ready_replicas': 'Ready'
+                    })
+
+                    replica_chart = alt.Chart(melted_df).mark_bar().encode(
+                        x=alt.X('name:N', title='Deployment Name'),
+                        y=alt.Y('count:Q', title='Replica Count'),
+                        color=alt.Color('replica_type:N', scale=alt.Scale(
+                            domain=['Desired', 'Available', 'Ready'],
+                            range=['#2196F3', '#4CAF50', '#FFC107']
+                        ))
+                    ).properties(title='Deployment Replicas')
+
+                    st.altair_chart(replica_chart, use_container_width=True)
             except Exception as e:
                 st.error(f"Error rendering deployment data: {str(e)}")
         else:
             st.info("No deployment data available. Click Refresh to fetch data.")
 
     # Service metrics
-    with tab5:
-        if st.session_state.kubernetes_resources['services']:
+    if shown_tab == "Services":
+        if tables is not None and not tables.services.empty:
             try:
-                service_df = pd.DataFrame(st.session_state.kubernetes_resources['services'])
-
-                # Filter by namespace - use the namespaces from kubernetes_resources
-                available_namespaces = ['All namespaces']
-                if st.session_state.kubernetes_resources['namespaces']:
-                    available_namespaces += sorted(st.session_state.kubernetes_resources['namespaces'])
-                else:
-                    # Fallback to unique namespaces from services if namespace list is empty
-                    available_namespaces += sorted(service_df['namespace'].unique().tolist())
-
-                selected_namespace = st.selectbox("Filter services by namespace", available_namespaces,
-                                                  key="service_namespace")
-
-                if selected_namespace != 'All namespaces':
-                    filtered_df = service_df[service_df['namespace'] == selected_namespace]
-                else:
-                    filtered_df = service_df
+                filtered_df = tables.services
 
                 st.dataframe(filtered_df, use_container_width=True)
 
                 # Create a service type chart
-                if 'type' in filtered_df.columns and len(filtered_df) > 0:
-                    type_count = filtered_df['type'].value_counts().reset_index()
-                    type_count.columns = ['type', 'count']
-
+                type_count = tables.counts(tables.service_type_counts, 'type')
+                if not type_count.empty:
                     type_chart = alt.Chart(type_count).mark_arc().encode(
                         theta=alt.Theta(field="count", type="quantitative"),
                         color=alt.Color(field="type", type="nominal", scale=alt.Scale(
@@ -720,6 +939,63 @@ def create_resource_monitor():
         else:
             st.info("No service data available. Click Refresh to fetch data.")
 
+    # Pod counts over the last snapshots, from the shared history of this cluster and scope
+    if shown_tab == "Pod trends":
+        history = get_snapshot_history(st.session_state.cluster_name, resource_scope())
+        if len(history) > 1:
+            try:
+                st.caption(f"Last {len(history)} snapshots (up to {history.depth} are kept)")
+                status_trend = history.pods(by='status')
+                status_chart = alt.Chart(status_trend).mark_area().encode(
+                    x=alt.X('time:T', title='Time'),
+                    y=alt.Y('count:Q', title='Pods', stack=True),
+                    color=alt.Color('status:N', scale=alt.Scale(
+                        domain=['Running', 'Pending', 'Failed', 'Succeeded', 'Unknown'],
+                        range=['#4CAF50', '#FFC107', '#F44336', '#2196F3', '#9E9E9E']
+                    )),
+                    tooltip=['time:T', 'status', 'count']
+                ).properties(title='Pods by Status')
+                st.altair_chart(status_chart, use_container_width=True)
+
+                namespace_trend = history.pods(by='namespace')
+                namespace_chart = alt.Chart(namespace_trend).mark_line().encode(
+                    x=alt.X('time:T', title='Time'),
+                    y=alt.Y('count:Q', title='Pods'),
+                    color='namespace:N',
+                    tooltip=['time:T', 'namespace', 'count']
+                ).properties(title='Pods by Namespace')
+                st.altair_chart(namespace_chart, use_container_width=True)
+            except Exception as e:
+                st.error(f"Error rendering pod trends: {str(e)}")
+        else:
+            st.info("Trends appear once a few snapshots have been taken.")
+
+    # Restarts over the last snapshots: a restart storm shows as a namespace's total climbing
+    if shown_tab == "Restart trends":
+        history = get_snapshot_history(st.session_state.cluster_name, resource_scope())
+        if len(history) > 1:
+            try:
+                restart_trend = history.restarts()
+                restart_chart = alt.Chart(restart_trend).mark_line().encode(
+                    x=alt.X('time:T', title='Time'),
+                    y=alt.Y('restarts:Q', title='Container Restarts'),
+                    color='namespace:N',
+                    tooltip=['time:T', 'namespace', 'restarts']
+                ).properties(title='Container Restarts by Namespace')
+                st.altair_chart(restart_chart, use_container_width=True)
+
+                # Restarts since the oldest snapshot kept
+                totals = restart_trend.groupby('namespace')['restarts'].agg(['first', 'last'])
+                increase = (totals['last'] - totals['first']).rename('restarts').reset_index()
+                increase = increase[increase['restarts'] > 0].sort_values('restarts', ascending=False)
+                if not increase.empty:
+                    st.caption(f"Restarts since {restart_trend['time'].iloc[0]:%H:%M:%S}")
+                    st.dataframe(increase, use_container_width=True, hide_index=True)
+            except Exception as e:
+                st.error(f"Error rendering restart trends: {str(e)}")
+        else:
+            st.info("Trends appear once a few snapshots have been taken.")
+
 
 @st.fragment
 def create_chat_interface():
@@ -729,11 +1005,21 @@ def create_chat_interface():
     # Display chat messages
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
+            show_tool_calls(message.get("tool_calls", ()))
             st.write(message["content"])
 
-    # Chat input
-    if user_input := st.chat_input("Ask something about your Kubernetes cluster..."):
-        # Process the input using our synchronized wrapper
+    if st.session_state.pending_reply is not None:
+        pending_reply()
+
+    # Where the time of this session's startup went; the phases overlap
+    startup_rows = st.session_state.startup_timings.rows()
+    if startup_rows:
+        with st.expander("⏱️ Startup timings"):
+            st.dataframe(pd.DataFrame(startup_rows), use_container_width=True, hide_index=True)
+
+    # Chat input; one question at a time
+    if user_input := st.chat_input("Ask something about your Kubernetes cluster...",
+                                   disabled=st.session_state.pending_reply is not None):
         process_user_input(user_input)
         st.rerun()
 
@@ -742,17 +1028,19 @@ def main():
     """Main function to run the Streamlit app"""
     st.title("☸️ Kubernetes Cluster Manager")
 
-    # Initialize agent if not already done
-    if not st.session_state.is_agent_initialized:
-        with st.spinner("Initializing Kubernetes assistant..."):
-            # Use run_async to properly manage the event loop
-            st.session_state.agent = run_async(initialize_agent())
-            st.session_state.is_agent_initialized = True
-
-    # Initial resource fetch if needed
-    if not st.session_state.kubernetes_resources['pods'] and not st.session_state.kubernetes_resources['nodes']:
-        with st.spinner("Fetching Kubernetes resources..."):
-            fetch_kubernetes_resources()
+    # Greet and start connecting to the MCP server in the background; the agent is built on the first question
+    if not st.session_state.session_started:
+        start_session()
+        st.session_state.session_started = True
+
+    # Show the cluster's current snapshot, waiting for the first one if needed (meanwhile MCP connects)
+    timings = st.session_state.startup_timings
+    with st.spinner("Fetching Kubernetes resources..."):
+        started = time.perf_counter()
+        fetch_kubernetes_resources()
+        if 'first_snapshot' not in timings:
+            timings.record('first_snapshot', started)
+    watch_snapshot()
 
     # Create two columns for layout
     col1, col2 = st.columns([0.4, 0.6])
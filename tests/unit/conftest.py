@@ -0,0 +1,55 @@
+import importlib.util
+import os
+import stat
+from pathlib import Path
+
+import pytest
+
+LAMBDA_INDEX = Path(__file__).resolve().parents[2] / 'lambda' / 'kubectl' / 'index.py'
+
+
+class Clock:
+    """A monotonic clock that only moves when a test advances `now`"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def kubectl_lambda(tmp_path, monkeypatch):
+    """A fresh copy of the kubectl Lambda module writing its kubeconfigs under tmp_path"""
+    monkeypatch.setenv('TEST_OUTDIR', str(tmp_path))
+    monkeypatch.setenv('AWS_REGION', 'us-west-2')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'AKIDEXAMPLE')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY')
+    monkeypatch.delenv('AWS_PROFILE', raising=False)
+    monkeypatch.setenv('PATH', os.environ['PATH'])
+
+    spec = importlib.util.spec_from_file_location('kubectl_lambda_index', LAMBDA_INDEX)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def fake_bin(tmp_path, monkeypatch):
+    """Put fake `kubectl`/`aws` executables first on PATH; each logs its argv to <name>.log"""
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+
+    def install(name, script):
+        path = bin_dir / name
+        path.write_text(f'#!/bin/sh\necho "$@" >> "{bin_dir}/{name}.log"\n{script}\n')
+        path.chmod(path.stat().st_mode | stat.S_IEXEC)
+        return bin_dir / f'{name}.log'
+
+    monkeypatch.setenv('PATH', f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    return install
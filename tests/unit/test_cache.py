@@ -0,0 +1,188 @@
+import threading
+import time
+
+import pytest
+
+from eks_assistant.cache import SharedCache
+
+
+def counting_loader(values=None):
+    calls = []
+
+    def load(previous):
+        calls.append(previous)
+        return values.pop(0) if values else len(calls)
+
+    return load, calls
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_fresh_value_is_served_from_cache(clock):
+    cache = SharedCache(clock=clock)
+    load, calls = counting_loader()
+
+    assert cache.get('pods', load, ttl=10) == 1
+    clock.now += 5
+    assert cache.get('pods', load, ttl=10) == 1
+    assert calls == [None]
+
+
+def test_stale_value_is_served_while_one_refresh_runs(clock):
+    cache = SharedCache(max_stale=60, clock=clock)
+    release = threading.Event()
+    calls = []
+
+    def load(previous):
+        calls.append(previous)
+        if previous is not None:
+            release.wait(5)
+        return len(calls)
+
+    cache.get('pods', load, ttl=10)
+    clock.now += 15
+
+    # every caller gets the stale value at once, and only one refresh starts
+    assert [cache.get('pods', load, ttl=10) for _ in range(5)] == [1] * 5
+    release.set()
+    wait_for(lambda: cache.get('pods', load, ttl=10) == 2)
+    assert calls == [None, 1]
+
+
+def test_concurrent_cold_gets_share_one_load(clock):
+    cache = SharedCache(clock=clock)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def load(previous):
+        calls.append(previous)
+        started.set()
+        release.wait(5)
+        return 'pods'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get('pods', load, ttl=10))) for _ in range(8)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ['pods'] * 8
+    assert calls == [None]
+
+
+def test_value_past_max_stale_is_waited_for(clock):
+    cache = SharedCache(max_stale=30, clock=clock)
+    load, calls = counting_loader()
+
+    cache.get('pods', load, ttl=10)
+    clock.now += 41
+    assert cache.get('pods', load, ttl=10) == 2
+    assert calls == [None, 1]
+
+
+def test_failed_refresh_keeps_stale_value(clock):
+    cache = SharedCache(max_stale=60, clock=clock)
+    cache.get('pods', lambda previous: 'old', ttl=10)
+    clock.now += 15
+    failures = []
+
+    def failing(previous):
+        failures.append(previous)
+        raise RuntimeError("Lambda unavailable")
+
+    assert cache.get('pods', failing, ttl=10) == 'old'
+    wait_for(lambda: failures and not cache._loading)
+    assert cache.get('pods', lambda previous: 'new', ttl=10) == 'old'
+    wait_for(lambda: cache.get('pods', failing, ttl=10) == 'new')
+
+
+def test_cold_load_failure_reaches_the_caller(clock):
+    cache = SharedCache(clock=clock)
+
+    def failing(previous):
+        raise RuntimeError("Lambda unavailable")
+
+    with pytest.raises(RuntimeError):
+        cache.get('pods', failing, ttl=10)
+    assert cache.get('pods', lambda previous: 'pods', ttl=10) == 'pods'
+
+
+def test_least_recently_used_entries_are_evicted(clock):
+    cache = SharedCache(max_entries=2, clock=clock)
+    load, calls = counting_loader(['a', 'b', 'c', 'a2'])
+
+    cache.get('a', load, ttl=10)
+    cache.get('b', load, ttl=10)
+    cache.get('a', load, ttl=10)
+    cache.get('c', load, ttl=10)
+
+    assert cache.get('a', load, ttl=10) == 'a'
+    assert cache.get('b', load, ttl=10) == 'a2'
+
+
+def test_stale_false_waits_for_an_expired_value_to_be_revalidated(clock):
+    cache = SharedCache(max_stale=60, clock=clock)
+    load, calls = counting_loader()
+
+    cache.get('pods', load, ttl=10)
+    clock.now += 5
+    assert cache.get('pods', load, ttl=10, stale=False) == 1
+    clock.now += 10
+    assert cache.get('pods', load, ttl=10, stale=False) == 2
+    assert calls == [None, 1]
+
+
+def test_get_many_loads_every_missing_key_in_one_call(clock):
+    cache = SharedCache(max_stale=60, clock=clock)
+    calls = []
+
+    def load(previous):
+        calls.append(dict(previous))
+        return {key: RuntimeError("forbidden") if key == 'secrets' else f"{key} {len(calls)}" for key in previous}
+
+    requests = {'namespaces': (10, True), 'pods': (10, False), 'secrets': (10, False)}
+    cache.get('namespaces', lambda previous: 'namespaces 0', ttl=10)
+    first = cache.get_many(requests, load)
+    assert first['namespaces'] == 'namespaces 0' and first['pods'] == 'pods 1'
+    assert isinstance(first['secrets'], RuntimeError)
+    assert calls == [{'pods': None, 'secrets': None}]
+
+    clock.now += 15
+    # The expired pods are revalidated, the failed key tried again and the stale namespaces refreshed, in one call
+    second = cache.get_many(requests, load)
+    assert second['pods'] == 'pods 2' and second['namespaces'] == 'namespaces 2'
+    assert calls[-1] == {'namespaces': 'namespaces 0', 'pods': 'pods 1', 'secrets': None}
+
+
+def test_get_many_shares_loads_with_concurrent_gets(clock):
+    cache = SharedCache(clock=clock)
+    started = threading.Event()
+    release = threading.Event()
+
+    def load(previous):
+        started.set()
+        release.wait(5)
+        return {key: key.upper() for key in previous}
+
+    results = {}
+    thread = threading.Thread(target=lambda: results.update(cache.get_many({'a': (10, False), 'b': (10, False)},
+                                                                           load)))
+    thread.start()
+    started.wait(5)
+    waiter = threading.Thread(target=lambda: results.update(b2=cache.get('b', lambda previous: 'other', ttl=10)))
+    waiter.start()
+    release.set()
+    thread.join(5)
+    waiter.join(5)
+
+    assert results == {'a': 'A', 'b': 'B', 'b2': 'B'}
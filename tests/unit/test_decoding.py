@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from eks_assistant import decoding
+from eks_assistant.decoding import list_decoder, loads
+from eks_assistant.envelope import ACCEPT_ENCODING, decode_output
+from eks_assistant.parsing import parse_pods
+
+PODS = {
+    'kind': 'List',
+    'metadata': {'continue': 'rv-1', 'remainingItemCount': 3},
+    'items': [{
+        'metadata': {'name': 'web', 'namespace': 'default', 'creationTimestamp': '2025-01-09T00:00:00Z',
+                     'uid': 'not-projected'},
+        'spec': {'nodeName': 'node-1'},
+        'status': {'phase': 'Running', 'containerStatuses': [{'ready': True, 'restartCount': 2, 'image': 'web'}]},
+    }],
+}
+
+
+def test_loads_matches_json():
+    body = json.dumps(PODS).encode('utf-8')
+    assert loads(body) == PODS
+
+
+def test_typed_decoding_keeps_only_declared_fields():
+    pytest.importorskip('msgspec')
+    pods = list_decoder('pods')(json.dumps(PODS).encode('utf-8'))
+
+    assert pods['metadata'] == {'continue': 'rv-1', 'remainingItemCount': 3}
+    assert pods['items'] == [{
+        'metadata': {'name': 'web', 'namespace': 'default', 'creationTimestamp': '2025-01-09T00:00:00Z'},
+        'status': {'phase': 'Running', 'containerStatuses': [{'ready': True, 'restartCount': 2}]},
+    }]
+
+
+def test_unexpected_types_fall_back_to_untyped_decoding():
+    pytest.importorskip('msgspec')
+    odd = dict(PODS, items=[{'metadata': {'name': 'web'}, 'status': {'containerStatuses': None}}])
+
+    assert list_decoder('pods')(json.dumps(odd).encode('utf-8')) == odd
+
+
+def test_without_msgspec_lists_decode_untyped(monkeypatch):
+    monkeypatch.setattr(decoding, 'msgspec', None)
+    assert list_decoder('pods')(json.dumps(PODS).encode('utf-8')) == PODS
+
+
+def test_envelope_decodes_straight_into_parsable_items(kubectl_lambda):
+    command = kubectl_lambda.parse_command({'Command': 'kubectl get pods -A -o json', 'Limit': 1})
+    envelope = kubectl_lambda.encode_result(json.dumps(PODS), command, ACCEPT_ENCODING)
+
+    pods = decode_output(json.loads(json.dumps(envelope)), decode=list_decoder('pods'))
+    parsed = parse_pods(pods['items'])
+    assert parsed[['name', 'ready', 'restarts']].values.tolist() == [['web', '1/1', 2]]
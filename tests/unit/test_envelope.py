@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from eks_assistant.envelope import ACCEPT_ENCODING, NotModified, decode_output, output_etag
+
+PODS = {'kind': 'List', 'items': [{'metadata': {'name': f'pod-{i}', 'namespace': 'default'}} for i in range(2000)]}
+
+
+@pytest.fixture
+def lambda_output(kubectl_lambda, tmp_path, monkeypatch):
+    """Encode output the way the kubectl Lambda does, spilling to a local object store"""
+    monkeypatch.setattr(kubectl_lambda, 'SPILL_STORE', 'local')
+    monkeypatch.setattr(kubectl_lambda, 'SPILL_DIR', str(tmp_path / 'spill'))
+
+    def encode(output, args=('get', 'pods', '-o', 'json'), accept_encoding=ACCEPT_ENCODING):
+        envelope = kubectl_lambda.encode_output(output, list(args), accept_encoding)
+        kubectl_lambda.fit_inline([envelope])
+        # what the client sees after the Lambda runtime serialized the response
+        return json.loads(json.dumps(envelope))
+
+    return encode
+
+
+def test_small_output_is_inline_identity(lambda_output):
+    envelope = lambda_output(json.dumps({'items': []}))
+
+    assert envelope['Encoding'] == 'identity'
+    assert decode_output(envelope) == {'items': []}
+
+
+def test_large_output_is_compressed(lambda_output):
+    body = json.dumps(PODS)
+    envelope = lambda_output(body, accept_encoding=['gzip'])
+
+    assert envelope['Encoding'] == 'gzip'
+    assert len(envelope['Body']) < len(body) / 5
+    assert decode_output(envelope) == PODS
+
+
+def test_oversized_output_spills_to_object_store(lambda_output, kubectl_lambda, monkeypatch):
+    monkeypatch.setattr(kubectl_lambda, 'MAX_INLINE_BYTES', 1024)
+    envelope = lambda_output(json.dumps(PODS))
+
+    assert 'Body' not in envelope
+    assert envelope['Location'].startswith('file://')
+    assert decode_output(envelope) == PODS
+
+
+def test_text_output_and_legacy_strings(lambda_output):
+    assert decode_output(lambda_output('NAME   READY', args=('get', 'pods'))) == 'NAME   READY'
+    assert decode_output('{"items": []}') == '{"items": []}'
+
+
+def test_newer_envelope_rejected():
+    with pytest.raises(ValueError):
+        decode_output({'Envelope': 99, 'Body': ''})
+
+
+def test_unchanged_output_is_not_modified(kubectl_lambda):
+    command = kubectl_lambda.parse_command({'Command': 'kubectl get pods -A -o json'})
+    first = kubectl_lambda.encode_result(json.dumps(PODS), command, ACCEPT_ENCODING)
+
+    command['if_none_match'] = output_etag(first)
+    second = kubectl_lambda.encode_result(json.dumps(PODS), command, ACCEPT_ENCODING)
+    assert 'Body' not in second
+    assert isinstance(decode_output(second), NotModified)
+
+    changed = dict(PODS, items=PODS['items'][1:])
+    assert decode_output(kubectl_lambda.encode_result(json.dumps(changed), command, ACCEPT_ENCODING)) == changed
+
+
+def test_page_etag_ignores_continue_token(kubectl_lambda):
+    command = kubectl_lambda.parse_command({'Command': 'kubectl get pods -A -o json', 'Limit': 2})
+    page = {'kind': 'List', 'items': PODS['items'][:2], 'metadata': {'continue': 'rv-1', 'remainingItemCount': 5}}
+    command['if_none_match'] = output_etag(kubectl_lambda.encode_result(json.dumps(page), command, ACCEPT_ENCODING))
+
+    page['metadata']['continue'] = 'rv-2'
+    unchanged = decode_output(kubectl_lambda.encode_result(json.dumps(page), command, ACCEPT_ENCODING))
+    assert isinstance(unchanged, NotModified)
+    assert unchanged.metadata == {'continue': 'rv-2', 'remainingItemCount': 5}
+
+
+def test_output_matching_known_etag_is_not_decoded(kubectl_lambda):
+    command = kubectl_lambda.parse_command({'Command': 'kubectl get pods -A -o json', 'Limit': 2})
+    page = {'kind': 'List', 'items': PODS['items'][:2], 'metadata': {'continue': 'rv-1'}}
+    envelope = kubectl_lambda.encode_result(json.dumps(page), command, ACCEPT_ENCODING)
+    assert envelope['Metadata'] == {'continue': 'rv-1'}
+
+    unchanged = decode_output(envelope, if_none_match=output_etag(envelope))
+    assert isinstance(unchanged, NotModified)
+    assert unchanged.metadata == {'continue': 'rv-1'}
+    assert decode_output(envelope, if_none_match='stale') == page
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta, UTC
+
+from eks_assistant.history import SnapshotHistory
+from eks_assistant.parsing import parse_pods
+from eks_assistant.tables import build_tables
+
+START = datetime(2025, 1, 10, tzinfo=UTC)
+
+
+def pod(name, namespace, phase, restarts=0):
+    return {'metadata': {'name': name, 'namespace': namespace, 'creationTimestamp': '2025-01-09T00:00:00Z'},
+            'status': {'phase': phase, 'containerStatuses': [{'ready': True, 'restartCount': restarts}]}}
+
+
+def tables(*pods):
+    return build_tables({'pods': parse_pods(list(pods))})
+
+
+def test_counts_per_status_namespace_and_restarts():
+    history = SnapshotHistory(depth=10)
+    history.record(START, tables(pod('a', 'default', 'Running'), pod('b', 'default', 'Pending', restarts=2)))
+    history.record(START + timedelta(seconds=15),
+                   tables(pod('a', 'default', 'Running'), pod('c', 'jobs', 'Pending', restarts=1)))
+
+    by_status = history.pods(by='status')
+    assert by_status[by_status['status'] == 'Pending']['count'].tolist() == [1, 1]
+    assert history.pods(by='namespace', namespace='jobs')['count'].sum() == 1
+    jobs = history.pods(by='status', namespace='jobs')
+    assert jobs[jobs['status'] == 'Pending']['count'].tolist() == [0, 1]
+
+    restarts = history.restarts().pivot(index='time', columns='namespace', values='restarts')
+    assert restarts['default'].tolist() == [2, 0]
+    assert restarts['jobs'].tolist() == [0, 1]
+
+
+def test_ring_buffer_keeps_the_last_samples_only():
+    history = SnapshotHistory(depth=3)
+    for sample in range(5):
+        history.record(START + timedelta(seconds=sample),
+                       tables(*[pod(f'p{i}', f'ns{sample}', 'Running') for i in range(sample + 1)]))
+
+    assert len(history) == 3
+    by_namespace = history.pods(by='namespace')
+    assert by_namespace.groupby('time')['count'].sum().tolist() == [3, 4, 5]
+    # Namespaces without pods anywhere in the window are forgotten
+    assert set(by_namespace['namespace']) == {'ns2', 'ns3', 'ns4'}
+
+
+def test_empty_history():
+    history = SnapshotHistory(depth=3)
+
+    assert len(history) == 0 and history.pods().empty and history.restarts().empty
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from eks_assistant.inline_agent import StreamingInlineAgent, function_schema, parameter_value
+from eks_assistant.streaming import TextChunk, stream_reply
+
+
+class Session:
+    """Stands in for an MCP ClientSession with one kubectl tool"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def list_tools(self):
+        return SimpleNamespace(tools=[SimpleNamespace(
+            name='kubectl', description="Run kubectl",
+            inputSchema={'type': 'object', 'properties': {'command': {'type': 'string', 'title': 'Command'}},
+                         'required': ['command']})])
+
+    async def call_tool(self, name, arguments=None):
+        self.calls.append((name, arguments))
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(content=[SimpleNamespace(type='text', text=f"ran {arguments['command']}")],
+                               isError=False)
+
+
+class Bedrock:
+    """Stands in for the bedrock-agent-runtime client: hands back a kubectl call, then streams the reply.
+
+    The reply's second chunk is only sent once the test has seen the first, so the test can tell a
+    streamed reply from one delivered whole.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.first_chunk_seen = threading.Event()
+
+    def invoke_inline_agent(self, **request):
+        self.requests.append(request)
+        if 'inlineSessionState' not in request:
+            events = [{'returnControl': {'invocationId': 'call-1', 'invocationInputs': [{'functionInvocationInput': {
+                'actionGroup': 'KubernetesActions', 'function': 'kubectl',
+                'parameters': [{'name': 'command', 'type': 'string', 'value': 'get pods'}]}}]}}]
+        else:
+            events = self.reply()
+        return {'completion': events}
+
+    def reply(self):
+        yield {'chunk': {'bytes': b"There are "}}
+        self.first_chunk_seen.wait(5)
+        yield {'chunk': {'bytes': b"3 pods."}}
+
+
+def agent_on(bedrock, session):
+    return StreamingInlineAgent(
+        foundation_model="us.anthropic.claude-3-5-haiku-20241022-v1:0", instruction="Help with Kubernetes",
+        agent_name="kubernetes-assistant", client=bedrock,
+        action_groups=[{'name': 'KubernetesActions', 'description': "kubectl",
+                        'mcp_clients': [SimpleNamespace(session=session)]}])
+
+
+def test_reply_text_is_streamed_after_the_tool_calls():
+    bedrock, session = Bedrock(), Session()
+    agent = agent_on(bedrock, session)
+
+    async def turn():
+        events = []
+        async for event in stream_reply(agent, "How many pods?", agent.action_groups[0]['mcp_clients']):
+            if isinstance(event, TextChunk):
+                bedrock.first_chunk_seen.set()
+                events.append(event.text)
+            else:
+                events.append((event.name, event.done))
+        return events
+
+    events = asyncio.run(turn())
+    assert events == [('kubectl', False), ('kubectl', True), "There are ", "3 pods."]
+    assert session.calls == [('kubectl', {'command': 'get pods'})]
+
+    first, second = bedrock.requests
+    assert first['inputText'] == "How many pods?" and first['streamingConfigurations'] == {'streamFinalResponse': True}
+    assert first['actionGroups'][0]['functionSchema']['functions'] == [{
+        'name': 'kubectl', 'description': "Run kubectl",
+        'parameters': {'command': {'type': 'string', 'description': 'Command', 'required': True}}}]
+    assert second['sessionId'] == first['sessionId'] and 'inputText' not in second
+    assert second['inlineSessionState'] == {'invocationId': 'call-1', 'returnControlInvocationResults': [{
+        'functionResult': {'actionGroup': 'KubernetesActions', 'function': 'kubectl',
+                           'responseBody': {'TEXT': {'body': "ran get pods"}}}}]}
+
+
+def test_invoke_returns_the_whole_reply_and_error_events_fail_the_turn():
+    bedrock = Bedrock()
+    bedrock.first_chunk_seen.set()
+    assert asyncio.run(agent_on(bedrock, Session()).invoke("How many pods?")) == "There are 3 pods."
+
+    bedrock.invoke_inline_agent = lambda **request: {'completion': [
+        {'throttlingException': {'message': "Rate exceeded"}}]}
+    with pytest.raises(RuntimeError, match="Rate exceeded"):
+        asyncio.run(agent_on(bedrock, Session()).invoke("How many pods?"))
+
+
+def test_tool_schemas_and_arguments():
+    tool = SimpleNamespace(name='scale', description=None, inputSchema={'properties': {
+        'replicas': {'type': 'integer'}, 'selector': {'type': 'object', 'description': "Labels"}}})
+    assert function_schema(tool) == {'name': 'scale', 'description': 'scale', 'parameters': {
+        'replicas': {'type': 'integer', 'description': 'replicas', 'required': False},
+        'selector': {'type': 'string', 'description': 'Labels', 'required': False}}}
+
+    assert parameter_value({'name': 'replicas', 'type': 'integer', 'value': '3'}) == 3
+    assert parameter_value({'name': 'all', 'type': 'boolean', 'value': 'True'}) is True
+    assert parameter_value({'name': 'kinds', 'type': 'array', 'value': '["pods"]'}) == ['pods']
+    assert parameter_value({'name': 'kinds', 'type': 'array', 'value': 'pods'}) == 'pods'
@@ -0,0 +1,444 @@
+import json
+import ssl
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import urllib3
+
+NAMESPACES = json.dumps({"items": [{"metadata": {"name": "default"}}]})
+
+
+@pytest.fixture
+def clusters(kubectl_lambda, monkeypatch):
+    """Replace DescribeCluster with a mutable in-memory table, recording each lookup"""
+    table = {'demo': ('https://demo.eks.example', 'Q0EtMQ==')}
+    calls = []
+
+    def describe_cluster(cluster_name):
+        calls.append(cluster_name)
+        return table[cluster_name]
+
+    monkeypatch.setattr(kubectl_lambda, 'describe_cluster', describe_cluster)
+    return table, calls
+
+
+def invoke(kubectl_lambda, command='kubectl get namespaces -o json', cluster='demo', engine='subprocess'):
+    return kubectl_lambda.handler({'ClusterName': cluster, 'Command': command, 'Engine': engine}, None)
+
+
+def test_kubeconfig_reused_across_warm_invocations(kubectl_lambda, clusters, fake_bin):
+    _, calls = clusters
+    aws_log = fake_bin('aws', 'exit 1')
+    fake_bin('kubectl', f"echo '{NAMESPACES}'")
+
+    for _ in range(5):
+        assert json.loads(invoke(kubectl_lambda))['items'][0]['metadata']['name'] == 'default'
+
+    assert calls == ['demo']
+    assert not aws_log.exists()
+
+
+def test_kubeconfig_rebuilt_when_endpoint_changes(kubectl_lambda, clusters, fake_bin, monkeypatch):
+    table, calls = clusters
+    fake_bin('kubectl', f"echo '{NAMESPACES}'")
+    monkeypatch.setattr(kubectl_lambda, 'KUBECONFIG_TTL_SECONDS', 0)
+
+    path = kubectl_lambda.get_cluster('demo')['path']
+    table['demo'] = ('https://moved.eks.example', 'Q0EtMQ==')
+    assert kubectl_lambda.get_cluster('demo')['path'] == path
+
+    with open(path) as f:
+        assert json.load(f)['clusters'][0]['cluster']['server'] == 'https://moved.eks.example'
+    assert len(calls) == 2
+
+
+def test_kubeconfig_rebuilt_after_auth_failure(kubectl_lambda, clusters, fake_bin, tmp_path):
+    _, calls = clusters
+    flag = tmp_path / 'authorized'
+    fake_bin('kubectl', f"""
+if [ ! -f "{flag}" ]; then
+  touch "{flag}"
+  echo 'error: You must be logged in to the server (Unauthorized)' >&2
+  exit 1
+fi
+echo '{NAMESPACES}'""")
+
+    assert json.loads(invoke(kubectl_lambda))['items']
+    assert calls == ['demo', 'demo']
+
+
+def test_kubeconfig_cache_is_bounded(kubectl_lambda, clusters, monkeypatch):
+    table, _ = clusters
+    monkeypatch.setattr(kubectl_lambda, 'KUBECONFIG_CACHE_SIZE', 2)
+    for name in ('a', 'b', 'c'):
+        table[name] = (f'https://{name}.eks.example', 'Q0EtMQ==')
+        kubectl_lambda.get_cluster(name)
+
+    assert list(kubectl_lambda._kubeconfigs) == ['b', 'c']
+
+
+def test_token_signed_in_process_instead_of_exec_plugin(kubectl_lambda, clusters, fake_bin):
+    aws_log = fake_bin('aws', 'exit 1')
+    kubectl_log = fake_bin('kubectl', f"echo '{NAMESPACES}'")
+
+    for _ in range(3):
+        invoke(kubectl_lambda)
+
+    with open(kubectl_lambda.get_cluster('demo')['path']) as f:
+        assert 'exec' not in json.load(f)['users'][0]['user']
+    calls = kubectl_log.read_text().splitlines()
+    assert len(calls) == 3
+    tokens = {call.split('--token ')[1].split()[0] for call in calls}
+    assert len(tokens) == 1
+    assert tokens.pop().startswith('k8s-aws-v1.')
+    assert not aws_log.exists()
+
+
+def test_token_resigned_near_expiry(kubectl_lambda, monkeypatch):
+    token = kubectl_lambda.get_token('demo')
+    assert kubectl_lambda.get_token('demo') == token
+
+    monkeypatch.setattr(kubectl_lambda, 'TOKEN_REFRESH_MARGIN_SECONDS', kubectl_lambda.TOKEN_LIFETIME_SECONDS)
+    monkeypatch.setattr(kubectl_lambda, 'sign_token', lambda cluster_name: 'k8s-aws-v1.fresh')
+    assert kubectl_lambda.get_token('demo') == 'k8s-aws-v1.fresh'
+
+
+class FakeApiServer(ThreadingHTTPServer):
+    """A tiny stand-in for the Kubernetes API server serving canned JSON documents"""
+
+    daemon_threads = True
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.requests = []
+        super().__init__(('127.0.0.1', 0), FakeApiHandler)
+
+    @property
+    def endpoint(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.client_address[1], self.headers.get('Authorization')))
+        document = self.server.documents.get(self.path, 404)
+        status = 200
+        if isinstance(document, int):
+            # an error status for the path, e.g. 403 for a role that may not read it
+            status, document = document, {'kind': 'Status', 'reason': HTTPStatus(document).phrase.replace(' ', ''),
+                                          'message': f'{self.path} refused'}
+        body = json.dumps(document).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api_server(clusters):
+    table, _ = clusters
+    server = FakeApiServer({
+        '/api': {'kind': 'APIGroupDiscoveryList', 'items': [{
+            'metadata': {},
+            'versions': [{'version': 'v1', 'resources': [
+                {'resource': 'pods', 'singularResource': 'pod', 'scope': 'Namespaced', 'shortNames': ['po'],
+                 'responseKind': {'kind': 'Pod'}, 'verbs': ['get', 'list']},
+                {'resource': 'pods/log', 'scope': 'Namespaced', 'responseKind': {'kind': 'Pod'}},
+                {'resource': 'namespaces', 'singularResource': 'namespace', 'scope': 'Cluster',
+                 'shortNames': ['ns'], 'responseKind': {'kind': 'Namespace'}, 'verbs': ['get', 'list']},
+            ]}],
+        }]},
+        '/apis': {'kind': 'APIGroupDiscoveryList', 'items': [{
+            'metadata': {'name': 'apps'},
+            'versions': [{'version': 'v1', 'resources': [
+                {'resource': 'deployments', 'singularResource': 'deployment', 'scope': 'Namespaced',
+                 'shortNames': ['deploy'], 'responseKind': {'kind': 'Deployment'}, 'verbs': ['get', 'list']},
+            ]}],
+        }]},
+        '/api/v1/pods': {'kind': 'PodList', 'items': [{'metadata': {'name': 'web', 'namespace': 'default'}}]},
+        '/api/v1/pods?limit=1': {'kind': 'PodList', 'metadata': {'continue': 'page-2', 'remainingItemCount': 1},
+                                 'items': [{'metadata': {'name': 'web', 'namespace': 'default'}}]},
+        '/api/v1/pods?limit=1&continue=page-2': {'kind': 'PodList', 'metadata': {},
+                                                 'items': [{'metadata': {'name': 'db', 'namespace': 'default'}}]},
+        '/apis/apps/v1/namespaces/payments/deployments?labelSelector=app%3Dapi': {
+            'kind': 'DeploymentList', 'items': [{'metadata': {'name': 'api', 'namespace': 'payments'}}]},
+    })
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    table['demo'] = (server.endpoint, 'Q0EtMQ==')
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_native_engine_reads_from_api_server(kubectl_lambda, api_server, fake_bin):
+    kubectl_log = fake_bin('kubectl', 'exit 1')
+
+    pods = json.loads(invoke(kubectl_lambda, 'kubectl get pods --all-namespaces -o json', engine='auto'))
+    deployments = json.loads(invoke(kubectl_lambda, 'kubectl get deploy -n payments -l app=api -o json',
+                                    engine='auto'))
+
+    assert pods['kind'] == 'List'
+    assert pods['items'] == [{'metadata': {'name': 'web', 'namespace': 'default'}, 'apiVersion': 'v1', 'kind': 'Pod'}]
+    assert deployments['items'][0]['apiVersion'] == 'apps/v1'
+    assert not kubectl_log.exists()
+
+    paths = [path for path, _, _ in api_server.requests]
+    assert paths.count('/api') == 1 and paths.count('/apis') == 1
+    # every request reuses the same keep-alive connection
+    assert len({port for _, port, _ in api_server.requests}) == 1
+    assert all(auth.startswith('Bearer k8s-aws-v1.') for _, _, auth in api_server.requests)
+
+
+def test_native_engine_falls_back_to_kubectl(kubectl_lambda, api_server, fake_bin):
+    kubectl_log = fake_bin('kubectl', "echo 'NAME   READY'")
+
+    assert invoke(kubectl_lambda, 'kubectl get pods -o wide', engine='auto').startswith('NAME')
+    assert invoke(kubectl_lambda, 'kubectl get widgets -o json', engine='auto').startswith('NAME')
+    assert len(kubectl_log.read_text().splitlines()) == 2
+
+
+def test_native_engine_falls_back_to_kubectl_when_discovery_fails(kubectl_lambda, api_server, fake_bin):
+    kubectl_log = fake_bin('kubectl', f"echo '{NAMESPACES}'")
+    api_server.documents['/apis'] = 403
+
+    assert json.loads(invoke(kubectl_lambda, 'kubectl get namespaces -o json', engine='auto'))['items']
+    assert len(kubectl_log.read_text().splitlines()) == 1
+
+
+def test_native_engine_falls_back_to_kubectl_when_the_connection_fails(kubectl_lambda, api_server, fake_bin,
+                                                                       monkeypatch):
+    kubectl_log = fake_bin('kubectl', f"echo '{NAMESPACES}'")
+    # discovery succeeds, then the connection drops
+    kubectl_lambda.resolve_resource(kubectl_lambda.get_cluster('demo'), None, 'namespaces')
+
+    class Dropped:
+        def request(self, *args, **kwargs):
+            raise urllib3.exceptions.ProtocolError('Connection aborted.', ConnectionResetError(104, 'reset'))
+
+    monkeypatch.setattr(kubectl_lambda, 'api_pool', lambda cluster: Dropped())
+
+    assert json.loads(invoke(kubectl_lambda, 'kubectl get namespaces -o json', engine='auto'))['items']
+    assert len(kubectl_log.read_text().splitlines()) == 1
+
+
+def test_native_engine_rebuilds_kubeconfig_after_certificate_failure(kubectl_lambda, api_server, clusters,
+                                                                   monkeypatch):
+    _, calls = clusters
+    api_pool = kubectl_lambda.api_pool
+    rejected = []
+
+    class RotatedCertificate:
+        """The API server's certificate is no longer signed by the CA in the cached kubeconfig"""
+
+        def request(self, *args, **kwargs):
+            rejected.append(args)
+            raise urllib3.exceptions.SSLError(ssl.SSLCertVerificationError(
+                1, '[SSL: CERTIFICATE_VERIFY_FAILED] certificate verify failed: unable to get local issuer'))
+
+    monkeypatch.setattr(kubectl_lambda, 'api_pool', lambda cluster: RotatedCertificate() if not rejected
+                        else api_pool(cluster))
+
+    pods = json.loads(invoke(kubectl_lambda, 'kubectl get pods --all-namespaces -o json', engine='auto'))
+
+    assert pods['items'][0]['metadata']['name'] == 'web'
+    # Not retried against the stale CA: one rejection, then a rebuilt kubeconfig
+    assert len(rejected) == 1 and calls == ['demo', 'demo']
+
+
+def test_parse_read_command(kubectl_lambda):
+    parse = kubectl_lambda.parse_read_command
+
+    assert parse(['get', 'pods', '-ojson', '-nkube-system']) == {
+        'namespace': 'kube-system', 'all_namespaces': False, 'name': None, 'query': {}, 'resource': 'pods'}
+    assert parse(['get', 'pod/web', '--output=json'])['name'] == 'web'
+    assert parse(['get', 'pods', '--field-selector', 'status.phase=Running', '-o', 'json'])['query'] == {
+        'fieldSelector': 'status.phase=Running'}
+    assert parse(['describe', 'pods']) is None
+    assert parse(['get', 'pods,svc', '-o', 'json']) is None
+    assert parse(['get', 'pods', '-w', '-o', 'json']) is None
+
+
+def test_scoped_command_keeps_quoted_selectors(kubectl_lambda):
+    command = kubectl_lambda.parse_command({'Command': "kubectl get pods -n payments -l 'env in (prod, qa)' -o json"})
+
+    assert command['args'] == ['get', 'pods', '-n', 'payments', '-l', 'env in (prod, qa)', '-o', 'json']
+    assert kubectl_lambda.parse_read_command(command['args'])['query'] == {'labelSelector': 'env in (prod, qa)'}
+
+
+def test_batch_keeps_per_command_errors(kubectl_lambda, clusters, fake_bin):
+    _, calls = clusters
+    fake_bin('kubectl', f"""
+case "$*" in
+  *services*) echo 'error: You must be logged in to the server (Unauthorized)' >&2; exit 1 ;;
+  *) echo '{NAMESPACES}' ;;
+esac""")
+
+    response = kubectl_lambda.handler({
+        'ClusterName': 'demo',
+        'Engine': 'subprocess',
+        'Commands': [
+            {'Id': 'namespaces', 'Command': 'kubectl get namespaces -o json'},
+            {'Id': 'services', 'Command': 'kubectl get services --all-namespaces -o json'},
+            'kubectl get pods --all-namespaces -o json',
+        ],
+    }, None)
+
+    results = response['Results']
+    assert json.loads(results['namespaces']['Output'])['items']
+    assert json.loads(results['kubectl get pods --all-namespaces -o json']['Output'])['items']
+    assert 'Unauthorized' in results['services']['Error']
+    # the rejected command triggered exactly one kubeconfig rebuild
+    assert calls == ['demo', 'demo']
+
+
+def test_batch_keeps_per_command_parse_errors(kubectl_lambda, clusters, fake_bin):
+    fake_bin('kubectl', f"echo '{NAMESPACES}'")
+
+    response = kubectl_lambda.handler({
+        'ClusterName': 'demo',
+        'Engine': 'subprocess',
+        'Commands': [
+            {'Id': 'namespaces', 'Command': 'kubectl get namespaces -o json'},
+            {'Id': 'pods', 'Command': "kubectl get pods -l 'app=web -o json"},
+        ],
+    }, None)
+
+    results = response['Results']
+    assert json.loads(results['namespaces']['Output'])['items']
+    assert 'quotation' in results['pods']['Error']
+    assert response['Metrics']['Commands'] == 1
+
+
+def test_fatal_error_fails_fast(kubectl_lambda, clusters, fake_bin):
+    kubectl_log = fake_bin('kubectl', "echo 'error: unknown flag: --bogus' >&2; exit 1")
+
+    with pytest.raises(Exception, match='unknown flag'):
+        invoke(kubectl_lambda, 'kubectl get pods --bogus')
+    assert len(kubectl_log.read_text().splitlines()) == 1
+
+
+def test_transient_errors_retried_with_backoff(kubectl_lambda, clusters, fake_bin, tmp_path):
+    attempts = tmp_path / 'attempts'
+    kubectl_log = fake_bin('kubectl', f"""
+echo x >> "{attempts}"
+if [ "$(wc -l < "{attempts}")" -lt 3 ]; then
+  echo 'Error from server (TooManyRequests): the server has received too many requests' >&2
+  exit 1
+fi
+echo '{NAMESPACES}'""")
+
+    output = kubectl_lambda.handler({
+        'ClusterName': 'demo', 'Command': 'kubectl get namespaces -o json', 'Engine': 'subprocess',
+        'Retry': {'BaseDelaySeconds': 0.01},
+    }, None)
+
+    assert json.loads(output)['items']
+    assert len(kubectl_log.read_text().splitlines()) == 3
+
+
+def test_hung_kubectl_bounded_by_client_deadline(kubectl_lambda, clusters, fake_bin):
+    fake_bin('kubectl', 'sleep 5')
+
+    class Context:
+        def get_remaining_time_in_millis(self):
+            return 300000
+
+    started = time.monotonic()
+    with pytest.raises(RuntimeError, match='timed out'):
+        kubectl_lambda.handler({
+            'ClusterName': 'demo', 'Command': 'kubectl get namespaces -o json', 'Engine': 'subprocess',
+            'TimeoutSeconds': 1,
+        }, Context())
+    assert time.monotonic() - started < 3
+
+
+def test_retry_policy_classification(kubectl_lambda):
+    policy = kubectl_lambda.RetryPolicy()
+
+    assert policy.is_transient(Exception(b'Unable to connect to the server: dial tcp: i/o timeout'))
+    assert policy.is_transient(Exception('Error from server (NotFound): pods "web" not found'))
+    assert policy.is_transient(kubectl_lambda.KubectlTimeoutError('kubectl timed out after 1.0s'))
+    assert not policy.is_transient(Exception('Error from server (Forbidden): pods is forbidden'))
+    assert kubectl_lambda.is_certificate_failure(urllib3.exceptions.MaxRetryError(
+        None, '/api', urllib3.exceptions.SSLError(ssl.SSLCertVerificationError(1, 'certificate verify failed'))))
+    assert not kubectl_lambda.is_certificate_failure(urllib3.exceptions.ProtocolError('Connection aborted'))
+    assert not kubectl_lambda.RetryPolicy(retry_not_found=False).is_transient(
+        Exception('Error from server (NotFound): pods "web" not found'))
+    assert all(0 <= policy.backoff(attempt) <= policy.max_delay for attempt in range(1, 10))
+
+
+def test_projection_reduces_items(kubectl_lambda, clusters, fake_bin):
+    pod = {
+        'metadata': {'name': 'web', 'namespace': 'default', 'creationTimestamp': '2024-01-01T00:00:00Z',
+                     'managedFields': [{'manager': 'kubectl'}],
+                     'annotations': {'kubectl.kubernetes.io/last-applied-configuration': '{}'}},
+        'spec': {'containers': [{'name': 'web', 'image': 'nginx'}]},
+        'status': {'phase': 'Running', 'containerStatuses': [{'ready': True, 'restartCount': 2, 'image': 'nginx'}]},
+    }
+    fake_bin('kubectl', f"echo '{json.dumps({'kind': 'List', 'items': [pod]})}'")
+
+    output = kubectl_lambda.handler({
+        'ClusterName': 'demo', 'Command': 'kubectl get pods -A -o json', 'Engine': 'subprocess',
+        'Projection': ['metadata.name', 'metadata.namespace', 'status.phase',
+                       'status.containerStatuses.ready', 'status.containerStatuses.restartCount'],
+    }, None)
+
+    assert json.loads(output) == {'kind': 'List', 'items': [{
+        'metadata': {'name': 'web', 'namespace': 'default'},
+        'status': {'phase': 'Running', 'containerStatuses': [{'ready': True, 'restartCount': 2}]},
+    }]}
+
+
+def test_projection_on_native_engine(kubectl_lambda, api_server):
+    output = kubectl_lambda.handler({
+        'ClusterName': 'demo', 'Command': 'kubectl get pods -A -o json', 'Engine': 'auto',
+        'Projection': ['metadata.name', 'metadata'],
+    }, None)
+
+    assert json.loads(output)['items'] == [{'metadata': {'name': 'web', 'namespace': 'default'}}]
+
+
+def test_native_engine_pages_with_continue_tokens(kubectl_lambda, api_server):
+    pages = []
+    token = None
+    while True:
+        page = json.loads(kubectl_lambda.handler({
+            'ClusterName': 'demo', 'Command': 'kubectl get pods -A -o json', 'Engine': 'auto',
+            'Limit': 1, 'Continue': token,
+        }, None))
+        pages.append([item['metadata']['name'] for item in page['items']])
+        token = page['metadata']['continue']
+        if not token:
+            break
+
+    assert pages == [['web'], ['db']]
+
+
+def test_metrics_in_response_and_emf_log(kubectl_lambda, clusters, fake_bin, capsys):
+    fake_bin('kubectl', f"echo '{NAMESPACES}'")
+
+    response = kubectl_lambda.handler({
+        'ClusterName': 'demo', 'Engine': 'subprocess', 'Envelope': 1,
+        'Commands': ['kubectl get namespaces -o json', 'kubectl get pods -A -o json'],
+    }, None)
+
+    metrics = response['Metrics']
+    assert metrics['Commands'] == 2 and metrics['Attempts'] == 2
+    assert metrics['OutputBytes'] == 2 * (len(NAMESPACES) + 1)
+    assert {'KubeconfigMs', 'TokenMs', 'KubectlMs', 'EncodeMs', 'TotalMs'} <= set(metrics)
+
+    emf = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert emf['ClusterName'] == 'demo'
+    directive = emf['_aws']['CloudWatchMetrics'][0]
+    assert directive['Dimensions'] == [['ClusterName']]
+    assert {metric['Name'] for metric in directive['Metrics']} == set(metrics)
+    assert all(emf[name] == value for name, value in metrics.items() if name != 'TotalMs')
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+
+import pytest
+
+from eks_assistant.loop import BackgroundLoop
+
+
+@pytest.fixture
+def background():
+    background = BackgroundLoop(name="test-loop")
+    yield background
+    background.stop()
+
+
+def test_coroutines_run_on_the_loop_thread(background):
+    async def where():
+        return threading.current_thread().name
+
+    assert background.run(where(), timeout=5) == "test-loop"
+    assert not background.in_loop()
+
+
+def test_submitted_work_overlaps(background):
+    started = threading.Event()
+
+    async def slow():
+        started.set()
+        await asyncio.sleep(0.5)
+        return "slow"
+
+    async def fast():
+        return "fast"
+
+    pending = background.submit(slow())
+    assert started.wait(5)
+    # The slow call doesn't hold up the loop, nor the caller
+    assert background.run(fast(), timeout=1) == "fast"
+    assert not pending.done()
+    assert pending.result(5) == "slow"
+
+
+def test_errors_and_timeouts_reach_the_caller(background):
+    async def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        background.run(fail(), timeout=5)
+    with pytest.raises(TimeoutError):
+        background.run(asyncio.sleep(5), timeout=0.1)
+
+
+def test_stop_cancels_pending_work():
+    background = BackgroundLoop()
+    pending = background.submit(asyncio.sleep(60))
+    background.stop()
+
+    assert pending.cancelled()
+    assert not background._thread.is_alive()
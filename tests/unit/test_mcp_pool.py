@@ -0,0 +1,253 @@
+import asyncio
+import socket
+import threading
+import time
+from contextlib import AsyncExitStack
+
+import pytest
+
+from eks_assistant.mcp_pool import MCPConnectionPool
+
+mcp = pytest.importorskip('mcp')
+uvicorn = pytest.importorskip('uvicorn')
+
+from mcp.client.sse import sse_client  # noqa: E402
+from mcp.server.fastmcp import FastMCP  # noqa: E402
+
+
+class MCPServer:
+    """Stands in for the Kubernetes MCP server: a FastMCP SSE server on a thread, that can be restarted"""
+
+    def __init__(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            self.port = sock.getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}/sse"
+        self.calls = 0
+
+    def start(self):
+        app = FastMCP("stand-in")
+
+        @app.tool()
+        def kubectl(command: str) -> str:
+            self.calls += 1
+            return f"ran {command}"
+
+        config = uvicorn.Config(app.sse_app(), host='127.0.0.1', port=self.port, log_level='warning')
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            assert time.monotonic() < deadline, "MCP server did not start"
+            time.sleep(0.01)
+
+    def stop(self):
+        # Open SSE streams never end by themselves, so don't wait for them
+        self._server.should_exit = self._server.force_exit = True
+        self._thread.join(10)
+
+
+class Client:
+    """Stands in for InlineAgent's MCPHttp: an SSE transport and a ClientSession held on an exit stack"""
+
+    def __init__(self):
+        self._stack = AsyncExitStack()
+        self.session = None
+
+    @classmethod
+    async def create(cls, url):
+        client = cls()
+        read, write = await client._stack.enter_async_context(sse_client(url, timeout=5))
+        client.session = await client._stack.enter_async_context(mcp.ClientSession(read, write))
+        await client.session.initialize()
+        return client
+
+    async def call_tool(self, name, arguments=None):
+        return await self.session.call_tool(name, arguments)
+
+    async def aclose(self):
+        await self._stack.aclose()
+
+
+@pytest.fixture
+def server():
+    server = MCPServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+def run(pool_test, **options):
+    """Run pool_test(pool) on a fresh loop with a pool of stand-in clients, closing the pool after"""
+    async def main():
+        pool = MCPConnectionPool(Client.create, health_timeout=2, **options)
+        try:
+            return await pool_test(pool)
+        finally:
+            await pool.close()
+    return asyncio.run(main())
+
+
+def text(result):
+    return result.content[0].text
+
+
+def test_leases_reuse_a_connection_and_share_them_at_the_size_limit(server):
+    async def pool_test(pool):
+        async with pool.lease(server.url) as first:
+            pass
+        async with pool.lease(server.url) as again:
+            assert again is first
+
+        async with pool.lease(server.url) as one, pool.lease(server.url) as two, pool.lease(server.url) as three:
+            assert one is not two
+            # At the size limit, the connection serving the fewest calls is shared
+            assert three in (one, two)
+            assert pool.stats()['leases'] == {server.url: 3}
+            results = await asyncio.gather(*(client.call_tool('kubectl', {'command': f"get {kind}"})
+                                             for client, kind in ((one, 'pods'), (two, 'nodes'), (three, 'svc'))))
+        return pool.stats(), [text(result) for result in results]
+
+    stats, results = run(pool_test, size=2)
+    assert results == ["ran get pods", "ran get nodes", "ran get svc"]
+    assert stats['connections'] == {server.url: 2} and stats['opened'] == 2
+
+
+def test_pooled_clients_call_over_pool_connections_and_leave_them_open(server):
+    async def pool_test(pool):
+        client = pool.client(server.url)
+        tools = await client.session.list_tools()
+        first = await client.call_tool('kubectl', {'command': 'get pods'})
+        second = await client.session.call_tool('kubectl', {'command': 'get nodes'})
+        await client.aclose()
+        third = await pool.client(server.url).call_tool('kubectl', {'command': 'get ns'})
+        return [tool.name for tool in tools.tools], [text(first), text(second), text(third)], pool.stats()
+
+    tools, results, stats = run(pool_test)
+    assert tools == ['kubectl']
+    assert results == ["ran get pods", "ran get nodes", "ran get ns"]
+    assert stats['opened'] == 1 and stats['closed'] == 0 and stats['leases'] == {server.url: 0}
+
+
+def test_dropped_streams_are_detected_and_reconnected(server):
+    async def pool_test(pool):
+        client = pool.client(server.url)
+        await client.call_tool('kubectl', {'command': 'get pods'})
+
+        # The server restarts: the pooled SSE stream is gone and its session with it
+        await asyncio.to_thread(server.stop)
+        await asyncio.to_thread(server.start)
+        await pool.check()
+        stats = pool.stats()
+
+        result = await client.call_tool('kubectl', {'command': 'get nodes'})
+        return stats, text(result)
+
+    stats, result = run(pool_test, health_interval=0)
+    assert stats['failed_checks'] == 1 and stats['reconnected'] == 1
+    assert stats['connections'] == {server.url: 1}
+    assert result == "ran get nodes"
+
+
+def test_a_dropped_connection_is_replaced_when_next_borrowed(server):
+    async def pool_test(pool):
+        async with pool.lease(server.url) as first:
+            pass
+        await asyncio.to_thread(server.stop)
+        await asyncio.to_thread(server.start)
+        async with pool.lease(server.url) as second:
+            result = await second.call_tool('kubectl', {'command': 'get pods'})
+        return first is second, text(result), pool.stats()
+
+    same, result, stats = run(pool_test, health_interval=0)
+    assert not same and result == "ran get pods"
+    assert stats['opened'] == 2 and stats['connections'] == {server.url: 1}
+
+
+def test_idle_connections_are_evicted(server, clock):
+    async def pool_test(pool):
+        async with pool.lease(server.url), pool.lease(server.url):
+            pass
+        clock.now += 200
+        async with pool.lease(server.url):
+            pass
+        clock.now += 200
+        # One connection has been idle for 400s, the other for 200s
+        await pool.check()
+        evicted = pool.stats()
+        clock.now += 400
+        await pool.check()
+        return evicted, pool.stats()
+
+    evicted, emptied = run(pool_test, idle_timeout=300, health_interval=1000, clock=clock)
+    assert evicted['connections'] == {server.url: 1} and evicted['evicted'] == 1
+    assert emptied['connections'] == {} and emptied['evicted'] == 2 and emptied['reconnected'] == 0
+
+
+class NamedClient:
+    """A client with data, a sync method and a coroutine method, like MCPHttp"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def tool_names(self):
+        return ['kubectl']
+
+    async def call_tool(self, name, arguments=None):
+        return f"{self.name} ran {arguments['command']}"
+
+
+def test_pooled_clients_resolve_attributes_after_eviction(clock):
+    opened = []
+
+    async def connect(url):
+        opened.append(NamedClient(f"connection {len(opened) + 1}"))
+        return opened[-1]
+
+    async def pool_test():
+        pool = MCPConnectionPool(connect, ping=None, close=lambda client: asyncio.sleep(0), clock=clock)
+        client = pool.client('http://mcp/sse')
+        with pytest.raises(AttributeError):
+            client.name
+        first = await client.call_tool('kubectl', {'command': 'get pods'})
+
+        clock.now += 400
+        await pool.check()
+        evicted = pool.stats()['connections']
+        # Nothing is open: sync attributes come from the last connection, calls open a new one
+        looked_up = client.name, client.tool_names()
+        second = await client.call_tool('kubectl', {'command': 'get nodes'})
+        await pool.close()
+        return evicted, looked_up, [first, second]
+
+    evicted, looked_up, results = asyncio.run(pool_test())
+    assert evicted == {}
+    assert looked_up == ('connection 1', ['kubectl'])
+    assert results == ["connection 1 ran get pods", "connection 2 ran get nodes"]
+
+
+def test_failed_connects_are_raised_and_retried():
+    attempts = []
+
+    async def connect(url):
+        attempts.append(url)
+        if len(attempts) == 1:
+            raise ConnectionError("refused")
+        return object()
+
+    async def pool_test():
+        pool = MCPConnectionPool(connect, ping=None, close=lambda client: asyncio.sleep(0))
+        with pytest.raises(ConnectionError):
+            async with pool.lease('http://mcp/sse'):
+                pass
+        async with pool.lease('http://mcp/sse'):
+            pass
+        await pool.close()
+        return pool.stats()
+
+    stats = asyncio.run(pool_test())
+    assert len(attempts) == 2 and stats['opened'] == 1 and stats['closed'] == 1
+
+    with pytest.raises(ValueError):
+        MCPConnectionPool(connect, size=0)
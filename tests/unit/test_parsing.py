@@ -0,0 +1,51 @@
+import math
+
+import pandas as pd
+import pytest
+
+from eks_assistant.parsing import ages, cpu_millicores, memory_bytes, parse_nodes, parse_pods, timestamps
+
+NOW = pd.Timestamp('2025-01-10T12:00:00Z')
+
+
+def test_cpu_quantities_in_millicores():
+    assert cpu_millicores(['2', '250m', '1.5', '500000u', '0.1']).tolist() == pytest.approx([2000, 250, 1500, 500, 100])
+
+
+def test_memory_quantities_in_bytes():
+    values = memory_bytes(['7869548Ki', '512Mi', '8Gi', '1G', '1e3', '128974848', '1E', '12Gig', ''])
+
+    assert values[:7].tolist() == [7869548 * 1024, 512 * 2 ** 20, 8 * 2 ** 30, 1e9, 1e3, 128974848, 1e18]
+    assert all(math.isnan(value) for value in values[7:])
+
+
+def test_ages_keep_only_the_largest_unit():
+    created = timestamps(['2025-01-08T11:00:00Z', '2025-01-10T07:30:00Z', '2025-01-10T11:55:10Z',
+                          '', None, '2025-01-10T07:30:00.123Z'])
+
+    assert ages(created, NOW).tolist() == ['2d', '4h', '4m', '', '', '']
+
+
+def test_pods_columns():
+    pods = parse_pods([
+        {'metadata': {'name': 'web', 'namespace': 'default', 'creationTimestamp': '2025-01-09T00:00:00Z'},
+         'status': {'phase': 'Running', 'containerStatuses': [{'ready': True, 'restartCount': 3},
+                                                              {'ready': False, 'restartCount': 1}]}},
+        {'metadata': {'name': 'pending'}, 'status': {'phase': 'Pending'}},
+    ])
+
+    assert pods[['name', 'namespace', 'status', 'ready', 'restarts']].values.tolist() == [
+        ['web', 'default', 'Running', '1/2', 4],
+        ['pending', '', 'Pending', '0/0', 0],
+    ]
+    assert parse_pods([]).empty
+
+
+def test_nodes_columns():
+    nodes = parse_nodes([{
+        'metadata': {'name': 'node-1', 'labels': {'node-role.kubernetes.io/control-plane': ''}},
+        'status': {'conditions': [{'type': 'Ready', 'status': 'False'}], 'capacity': {'cpu': '4', 'memory': '16Gi'}},
+    }])
+
+    assert nodes[['status', 'roles', 'internal_ip', 'cpu_millicores', 'memory_bytes']].values.tolist() == [
+        ['NotReady', 'control-plane', '', 4000, 16 * 2 ** 30]]
@@ -0,0 +1,26 @@
+from eks_assistant.prefetch import NextTabPredictor
+
+TABS = ["Namespaces", "Pods", "Nodes", "Deployments", "Services"]
+
+
+def test_predicts_the_next_tab_without_history():
+    predictor = NextTabPredictor(TABS)
+
+    assert predictor.predict("Namespaces") == "Pods"
+    assert predictor.predict("Services") == "Namespaces"
+
+
+def test_predicts_the_most_frequent_switch():
+    predictor = NextTabPredictor(TABS)
+    predictor.record("Pods", "Services")
+    predictor.record("Pods", "Services")
+    predictor.record("Pods", "Nodes")
+    predictor.record("Pods", "Pods")
+    predictor.record(None, "Pods")
+
+    assert predictor.predict("Pods") == "Services"
+    assert predictor.predict("Nodes") == "Deployments"
+
+
+def test_single_tab_has_nothing_to_prefetch():
+    assert NextTabPredictor(["Pods"]).predict("Pods") is None
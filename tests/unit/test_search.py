@@ -0,0 +1,76 @@
+import pytest
+
+from eks_assistant.parsing import parse_pods
+from eks_assistant.search import NameIndex, parse_query
+from eks_assistant.tables import build_tables
+
+NAMES = ['web-7d9f', 'Web-api-1', 'api-gateway', 'db', 'x', 'coredns-5d78', 'déploiement']
+
+
+def test_contains_matches_a_scan_for_every_length():
+    index = NameIndex(NAMES)
+
+    for query in ['w', 'WE', 'web', 'web-', 'api-1', 'e', 'ns-5d', 'éploi', 'zzzz', 'db', 'a']:
+        expected = [row for row, name in enumerate(NAMES) if query.lower() in name.lower()]
+        assert index.contains(query).tolist() == expected, query
+
+
+def test_startswith_matches_a_scan():
+    index = NameIndex(NAMES)
+
+    for query in ['w', 'WEB-', 'api', 'coredns-5d78', 'coredns-5d78-x', 'z', '']:
+        expected = [row for row, name in enumerate(NAMES) if name.lower().startswith(query.lower())]
+        assert index.startswith(query).tolist() == expected, query
+
+
+def test_grams_stay_within_names_of_any_length():
+    names = ['db', 'x', 'a' * 253 + '-web', '', 'ab']
+    index = NameIndex(names)
+
+    # 'dbx' and 'webab' only exist across the ends of neighbouring names
+    for query in ['bx', 'dbx', 'bab', 'webab', 'aaa-w', 'a' * 200, 'ab', '-web']:
+        expected = [row for row, name in enumerate(names) if query in name]
+        assert index.contains(query).tolist() == expected, query
+    assert index.startswith('aaaa').tolist() == [2] and index.startswith('a' * 300).tolist() == []
+
+
+def test_empty_index():
+    index = NameIndex([])
+
+    assert len(index) == 0
+    assert index.contains('web').tolist() == [] and index.contains('web-1').tolist() == []
+    assert index.startswith('w').tolist() == []
+
+
+def test_query_syntax():
+    parsed = parse_query('web ^api ns:Default namespace:kube-system status:failed restarts>=3 restarts<10')
+
+    assert parsed['contains'] == ['web'] and parsed['prefixes'] == ['api']
+    assert parsed['namespaces'] == {'default', 'kube-system'} and parsed['statuses'] == {'failed'}
+    assert [count for _, count in parsed['restarts']] == [3, 10]
+    with pytest.raises(ValueError):
+        parse_query('restarts>many')
+
+
+def pod(name, namespace, phase, restarts=0):
+    return {'metadata': {'name': name, 'namespace': namespace, 'creationTimestamp': '2025-01-09T00:00:00Z'},
+            'status': {'phase': phase, 'containerStatuses': [{'ready': True, 'restartCount': restarts}]}}
+
+
+def test_search_pods_combines_terms():
+    tables = build_tables({'namespaces': ['default', 'kube-system'], 'pods': parse_pods([
+        pod('web-1', 'default', 'Running'),
+        pod('web-2', 'default', 'Failed', restarts=5),
+        pod('coredns', 'kube-system', 'Running', restarts=4),
+        pod('web-3', 'kube-system', 'Failed', restarts=1),
+    ])})
+
+    def names(query):
+        return tables.search_pods(query)['name'].tolist()
+
+    assert names('WEB') == ['web-1', 'web-2', 'web-3']
+    assert names('web ns:default') == ['web-1', 'web-2']
+    assert names('status:failed') == ['web-2', 'web-3']
+    assert names('restarts>3') == ['web-2', 'coredns']
+    assert names('^core restarts=4 status:Running') == ['coredns']
+    assert names('ns:missing') == []
@@ -0,0 +1,294 @@
+import json
+import threading
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from eks_assistant.snapshots import SnapshotPoller, snapshot_builder
+
+
+def counting_build():
+    builds = []
+
+    def build(previous, publish):
+        builds.append(previous)
+        publish({'pods': [{'name': f'pod-{len(builds)}'}]})
+
+    return build, builds
+
+
+def test_first_read_starts_polling_and_waits_for_a_snapshot():
+    build, builds = counting_build()
+    poller = SnapshotPoller(build, interval=60)
+
+    assert poller.current() is None
+    snapshot = poller.wait(timeout=5)
+    poller.stop()
+
+    assert snapshot.version == 1
+    assert snapshot.resources['pods'] == [{'name': 'pod-1'}]
+    assert builds == [None]
+
+
+def test_snapshots_are_immutable_and_versioned():
+    build, builds = counting_build()
+    poller = SnapshotPoller(build, interval=60)
+
+    first = poller.wait(timeout=5)
+    poller.refresh()
+    second = poller.wait(after_version=first.version, timeout=5)
+    poller.stop()
+
+    assert second.version == 2
+    assert builds[1] is first
+    assert first.resources['pods'] == [{'name': 'pod-1'}]
+    with pytest.raises(TypeError):
+        first.resources['pods'] = ()
+
+
+def test_partial_snapshots_are_published_while_paging():
+    pages = threading.Event()
+
+    def build(previous, publish):
+        publish({'pods': [1]}, complete=False)
+        pages.wait(5)
+        publish({'pods': [1, 2]})
+
+    poller = SnapshotPoller(build, interval=60)
+    partial = poller.wait(timeout=5)
+    pages.set()
+    final = poller.wait(after_version=partial.version, timeout=5)
+    poller.stop()
+
+    assert (partial.complete, partial.resources['pods']) == (False, [1])
+    assert (final.complete, final.resources['pods']) == (True, [1, 2])
+
+
+def test_failed_build_keeps_last_snapshot():
+    calls = []
+
+    def build(previous, publish):
+        calls.append(previous)
+        if previous:
+            raise RuntimeError("Lambda unavailable")
+        publish({'pods': []})
+
+    poller = SnapshotPoller(build, interval=60)
+    snapshot = poller.wait(timeout=5)
+    poller.refresh()
+    assert poller.wait(after_version=1, timeout=0.5).version == 1
+    poller.stop()
+
+    assert poller.current() is snapshot
+    assert isinstance(poller.error, RuntimeError)
+
+
+def test_interval_backs_off_without_readers(clock):
+    poller = SnapshotPoller(lambda previous, publish: None, interval=10, idle_after=60, max_interval=45,
+                            clock=clock)
+    assert poller.delay() == 10
+
+    clock.now += 61
+    delays = []
+    for _ in range(4):
+        delays.append(poller.delay())
+        poller._idle_polls += 1
+    assert delays == [10, 20, 40, 45]
+
+    poller.current()
+    poller.stop()
+    assert poller.delay() == 10
+
+
+def test_poller_stops_without_readers_and_restarts_on_read(clock):
+    build, builds = counting_build()
+    poller = SnapshotPoller(build, interval=60, idle_after=10, stop_after=100, clock=clock)
+
+    poller.wait(timeout=5)
+    thread = poller._thread
+    clock.now += 101
+    poller._wake.set()
+    thread.join(5)
+    assert not thread.is_alive() and poller._thread is None
+
+    last = poller.current()
+    assert poller.wait(after_version=last.version, timeout=5).version == last.version + 1
+    poller.stop()
+
+
+def test_wanted_keys_are_loaded_on_demand():
+    def build(previous, publish, wanted):
+        publish({key: f'{key} items' for key in sorted(wanted)})
+
+    poller = SnapshotPoller(build, interval=60, wanted={'namespaces'})
+    first = poller.wait(timeout=5)
+    assert list(first.resources) == ['namespaces']
+
+    assert poller.want('pods', 'nodes')
+    loaded = poller.wait(timeout=5, has=['pods'])
+    assert not poller.want('pods')
+    poller.stop()
+
+    assert list(loaded.resources) == ['namespaces', 'nodes', 'pods']
+
+
+def test_wanted_keys_nobody_asks_for_again_are_forgotten(clock):
+    def build(previous, publish, wanted):
+        publish({key: f'{key} items' for key in sorted(wanted)})
+
+    poller = SnapshotPoller(build, interval=60, wanted={'namespaces'}, forget_after=45, clock=clock)
+    poller.want('pods', 'nodes')
+    loaded = poller.wait(timeout=5, has=['pods', 'nodes'])
+
+    clock.now += 30
+    assert not poller.want('pods')
+    clock.now += 30
+    poller.refresh()
+    # nodes were last asked for 60s ago, pods 30s ago; the initial keys are kept however old
+    renewed = poller.wait(after_version=loaded.version, timeout=5)
+    assert list(renewed.resources) == ['namespaces', 'pods']
+    assert poller.want('nodes')
+    poller.stop()
+
+
+def test_complete_snapshots_are_handed_to_on_snapshot():
+    seen = []
+
+    def build(previous, publish):
+        publish({'pods': [1]}, complete=False)
+        publish({'pods': [1, 2]})
+
+    poller = SnapshotPoller(build, interval=60, on_snapshot=seen.append)
+    snapshot = poller.wait(after_version=1, timeout=5)
+    thread = poller._thread
+    poller.stop()
+    thread.join(5)
+
+    assert seen == [snapshot] and snapshot.complete
+
+
+class Lambda:
+    """Stands in for the kubectl Lambda: each kind's items, listed two pod names per page"""
+
+    def __init__(self, **items):
+        self.items = items
+        self.failing = set()
+        self.loads = []
+        self.not_modified = []
+
+    def load_first(self, commands):
+        self.loads.append(sorted(commands))
+        metrics = {'keys': sorted(commands)}
+        results = {}
+        for kind in commands:
+            try:
+                results[kind] = self.load_page(kind, commands[kind], None, None, metrics)
+            except RuntimeError as e:
+                results[kind] = e
+        return results
+
+    def load_page(self, key, command, continue_token, etag, metrics=None):
+        if metrics is None:
+            self.loads.append(key)
+        if key in self.failing:
+            raise RuntimeError(f"{key} timed out")
+        kind = key.split('#')[0]
+        page = int(continue_token or 0)
+        names = self.items[kind][2 * page:2 * page + 2] if kind == 'pods' else self.items[kind]
+        body = json.dumps({'items': [{'metadata': {'name': name}} for name in names]})
+        more = kind == 'pods' and 2 * page + 2 < len(self.items[kind])
+        output = {'Envelope': 1, 'ETag': str(hash(body)), 'ContentType': 'application/json', 'Body': body,
+                  'Metadata': {'continue': str(page + 1)} if more else {}}
+        if etag == output['ETag']:
+            self.not_modified.append(key)
+            output = {'Envelope': 1, 'NotModified': True, 'ETag': output['ETag'], 'Metadata': output['Metadata']}
+        return {'Output': output, 'Metrics': metrics or {'keys': [key]}}
+
+
+def parse_names(items):
+    parse_names.calls += 1
+    return pd.DataFrame({'name': [item['metadata']['name'] for item in items]})
+
+
+parse_names.calls = 0
+
+
+@pytest.fixture
+def builds():
+    """Run a snapshot_builder over a Lambda; returns (lambda, build(wanted) -> what it published)"""
+    fake = Lambda(namespaces=['default'], pods=['a', 'b', 'c'])
+    commands = {'namespaces': "kubectl get namespaces -o json", 'pods': "kubectl get pods -A -o json"}
+    parsers = {'namespaces': parse_names, 'pods': parse_names}
+    build = snapshot_builder(fake.load_first, fake.load_page, commands, parsers)
+    last = {}
+
+    def run(wanted=('namespaces', 'pods')):
+        published = []
+
+        def publish(resources, complete=True, errors=None, metrics=()):
+            published.append(dict(resources, complete=complete, errors=dict(errors or {}), metrics=list(metrics)))
+
+        build(last.get('snapshot'), publish, frozenset(wanted))
+        last['snapshot'] = SimpleNamespace(resources={key: value for key, value in published[-1].items()
+                                                      if key in commands})
+        return published
+
+    return fake, run
+
+
+def names(table):
+    return list(table['name'])
+
+
+def test_builder_pages_pods_in_and_reuses_unchanged_outputs(builds):
+    fake, run = builds
+    parse_names.calls = 0
+
+    first = run()
+    assert [(names(build['pods']), build['complete']) for build in first] == [(['a', 'b'], False),
+                                                                            (['a', 'b', 'c'], True)]
+    assert names(first[-1]['namespaces']) == ['default']
+    # One invocation for the first page of every kind, one for the next pod page
+    assert fake.loads == [['namespaces', 'pods'], 'pods#1'] and len(first[-1]['metrics']) == 2
+    assert parse_names.calls == 3
+
+    second = run()
+    assert len(second) == 1 and second[0]['complete'] and not second[0]['errors']
+    assert names(second[0]['pods']) == ['a', 'b', 'c']
+    assert second[0]['namespaces'] is first[-1]['namespaces']
+    # Every output had the ETag parsed last time, so nothing was parsed again
+    assert parse_names.calls == 3
+    # and the continuation page, which has no cache entry to revalidate, sent that ETag itself
+    assert fake.not_modified == ['pods#1']
+
+
+def test_a_failed_pod_page_keeps_the_previous_pods_whole(builds):
+    fake, run = builds
+    first = run()[-1]
+
+    fake.items['pods'] = ['a', 'x', 'c', 'd', 'e']
+    fake.failing.add('pods#1')
+    failed = run()
+    assert len(failed) == 1 and failed[0]['complete']
+    assert failed[0]['pods'] is first['pods'] and 'pods#1 timed out' in failed[0]['errors']['pods']
+
+    fake.failing.clear()
+    recovered = run()[-1]
+    assert names(recovered['pods']) == ['a', 'x', 'c', 'd', 'e'] and not recovered['errors']
+
+
+def test_a_failed_page_in_the_first_build_shows_the_pages_so_far(builds):
+    fake, run = builds
+    fake.failing.add('pods#1')
+    first = run()
+    assert names(first[-1]['pods']) == ['a', 'b'] and 'pods' in first[-1]['errors']
+
+    fake.failing.clear()
+    assert names(run()[-1]['pods']) == ['a', 'b', 'c']
+
+
+def test_unwanted_kinds_are_not_fetched(builds):
+    fake, run = builds
+    published = run(wanted=['namespaces'])
+    assert fake.loads == [['namespaces']] and 'pods' not in published[-1]
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from eks_assistant.startup import StartupTimings
+
+
+def test_phases_are_timed_from_the_session_start(clock):
+    timings = StartupTimings(clock=clock)
+
+    clock.now += 1
+    with timings.phase('first_snapshot'):
+        clock.now += 2
+    started = clock.now
+    clock.now += 0.5
+    timings.record('mcp_connect', started - 3)
+
+    assert 'first_snapshot' in timings and 'agent_build' not in timings
+    assert timings.rows() == [
+        {'phase': 'first_snapshot', 'seconds': 2.0, 'ready_after': 3.0},
+        {'phase': 'mcp_connect', 'seconds': 3.5, 'ready_after': 3.5},
+    ]
+
+
+def test_failed_phases_and_coroutines_are_timed():
+    timings = StartupTimings()
+
+    async def connect():
+        with timings.phase('mcp_connect'):
+            await asyncio.sleep(0.01)
+            raise ConnectionError("refused")
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(connect())
+    assert timings.rows()[0]['phase'] == 'mcp_connect'
+    assert timings.rows()[0]['seconds'] >= 0.01
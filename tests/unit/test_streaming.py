@@ -0,0 +1,98 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from eks_assistant.streaming import StreamedReply, ToolCall, instrument, stream_reply
+
+
+class Session:
+    """Stands in for an MCP ClientSession"""
+
+    async def call_tool(self, name, arguments=None):
+        await asyncio.sleep(0.01)
+        if name == 'broken':
+            raise RuntimeError("connection lost")
+        return SimpleNamespace(content=[SimpleNamespace(type='text', text=f"ran {arguments['command']}")],
+                               isError=name == 'failing')
+
+
+class Agent:
+    def __init__(self, client, tools=('kubectl',)):
+        self.client, self.tools = client, tools
+
+    async def invoke(self, prompt):
+        for tool in self.tools:
+            await self.client.session.call_tool(tool, {'command': 'get pods'})
+        return f"answer to {prompt}"
+
+
+async def events_of(agent, prompt="hi"):
+    return [(type(event).__name__, event.done if isinstance(event, ToolCall) else event.text)
+            async for event in stream_reply(agent, prompt, [agent.client])]
+
+
+def test_tool_calls_are_reported_as_they_start_and_end():
+    client = SimpleNamespace(session=Session())
+    events = asyncio.run(events_of(Agent(client)))
+
+    assert events == [('ToolCall', False), ('ToolCall', True), ('TextChunk', 'answer to hi')]
+
+
+def test_reply_collects_text_and_each_call_once():
+    client = SimpleNamespace(session=Session())
+    reply = StreamedReply()
+    agent = Agent(client, tools=('kubectl', 'failing'))
+    text = asyncio.run(reply.collect(stream_reply(agent, "hi", [client])))
+
+    assert text == reply.text == "answer to hi"
+    assert [call.name for call in reply.tool_calls] == ['kubectl', 'failing']
+    assert reply.tool_calls[0].output == "ran get pods" and reply.tool_calls[0].duration > 0
+    assert reply.tool_calls[1].error == "ran get pods"
+
+
+def test_failed_calls_and_turns_are_reported():
+    client = SimpleNamespace(session=Session())
+    reply = StreamedReply()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(reply.collect(stream_reply(Agent(client, tools=('broken',)), "hi", [client])))
+    assert reply.tool_calls[0].error == "connection lost" and reply.tool_calls[0].done
+
+
+def test_concurrent_turns_only_see_their_own_calls():
+    client = SimpleNamespace(session=Session())
+
+    async def both():
+        first, second = StreamedReply(), StreamedReply()
+        await asyncio.gather(first.collect(stream_reply(Agent(client, tools=('a', 'b')), "1", [client])),
+                             second.collect(stream_reply(Agent(client, tools=('c',)), "2", [client])))
+        return first, second
+
+    first, second = asyncio.run(both())
+    assert [call.name for call in first.tool_calls] == ['a', 'b']
+    assert [call.name for call in second.tool_calls] == ['c']
+
+
+def test_calls_outside_a_streamed_turn_are_untouched():
+    client = SimpleNamespace(session=Session())
+    assert instrument(client) and instrument(client)
+
+    result = asyncio.run(client.session.call_tool('kubectl', {'command': 'get pods'}))
+    assert result.content[0].text == "ran get pods"
+    assert not instrument(SimpleNamespace())
+
+
+def test_calls_through_two_instrumented_layers_are_reported_once():
+    connection = SimpleNamespace(session=Session())
+    instrument(connection)
+
+    class Pooled:
+        """A client whose session forwards to an instrumented connection's, as a pooled client does"""
+        session = SimpleNamespace(call_tool=lambda *args, **kwargs: connection.session.call_tool(*args, **kwargs))
+
+    client = Pooled()
+    reply = StreamedReply()
+    asyncio.run(reply.collect(stream_reply(Agent(client), "hi", [client])))
+
+    assert [call.name for call in reply.tool_calls] == ['kubectl']
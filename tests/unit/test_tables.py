@@ -0,0 +1,136 @@
+import pandas as pd
+
+from eks_assistant.parsing import parse_deployments, parse_nodes, parse_pods, parse_services
+from eks_assistant.tables import build_tables
+
+NOW = pd.Timestamp('2025-01-10T00:00:00Z')
+
+
+def pod(name, namespace, phase, ready=(True,), restarts=0):
+    return {
+        'metadata': {'name': name, 'namespace': namespace, 'creationTimestamp': '2025-01-09T00:00:00Z'},
+        'status': {'phase': phase, 'containerStatuses': [
+            {'ready': container_ready, 'restartCount': restarts} for container_ready in ready]},
+    }
+
+
+RESOURCES = {
+    'namespaces': ['default', 'kube-system', 'empty'],
+    'pods': parse_pods([
+        pod('web-1', 'default', 'Running'),
+        pod('web-2', 'default', 'Pending', ready=(False,), restarts=2),
+        pod('dns', 'kube-system', 'Running', restarts=1),
+        pod('job', 'late', 'Evicted', ready=(False,)),
+    ]),
+    'nodes': parse_nodes([{
+        'metadata': {'name': 'node-1', 'creationTimestamp': '2025-01-01T00:00:00Z',
+                     'labels': {'node.kubernetes.io/instance-type': 'm5.large'}},
+        'status': {'conditions': [{'type': 'Ready', 'status': 'True'}], 'nodeInfo': {'kubeletVersion': 'v1.30'},
+                   'addresses': [{'type': 'InternalIP', 'address': '10.0.0.1'}],
+                   'capacity': {'cpu': '2', 'memory': '8Gi'}},
+    }]),
+    'deployments': parse_deployments([{
+        'metadata': {'name': 'web', 'namespace': 'default', 'creationTimestamp': '2025-01-09T00:00:00Z'},
+        'spec': {'replicas': 2}, 'status': {'availableReplicas': None, 'readyReplicas': 1},
+    }]),
+    'services': parse_services([{
+        'metadata': {'name': 'web', 'namespace': 'default', 'creationTimestamp': '2025-01-09T00:00:00Z'},
+        'spec': {'type': 'ClusterIP', 'clusterIP': '10.100.0.1', 'ports': [{'port': 80, 'protocol': 'TCP'}]},
+    }]),
+}
+
+
+def counts(frame, *columns):
+    return {tuple(row[:-1]): row[-1] for row in frame[list(columns) + ['count']].itertuples(index=False)}
+
+
+def test_tables_are_typed():
+    tables = build_tables(RESOURCES, now=NOW)
+
+    assert tables.namespaces == ['default', 'empty', 'kube-system']
+    assert list(tables.pods.columns)[:6] == ['name', 'namespace', 'status', 'ready', 'restarts', 'age']
+    assert tables.pods['namespace'].dtype == 'category'
+    assert list(tables.pods['status'].cat.categories) == ['Running', 'Pending', 'Failed', 'Succeeded', 'Unknown',
+                                                           'Evicted']
+    assert tables.pods['age'].tolist() == ['1d'] * 4
+    assert tables.deployments['available_replicas'].tolist() == [0]
+    assert tables.nodes[['cpu_cores', 'memory_gib']].values.tolist() == [[2, 8]]
+    assert tables.nodes['age'].tolist() == ['9d']
+
+
+def test_namespace_counts_cover_every_listed_namespace():
+    tables = build_tables(RESOURCES, now=NOW)
+
+    by_namespace = counts(tables.namespace_counts, 'namespace', 'resource_type')
+    assert by_namespace[('default', 'pods')] == 2
+    assert by_namespace[('kube-system', 'pods')] == 1
+    assert by_namespace[('empty', 'services')] == 0
+    # pods of a namespace missing from the namespace list are still in the pod table
+    assert ('late', 'pods') not in by_namespace
+    assert tables.kind('pods', 'late')['name'].tolist() == ['job']
+
+
+def test_status_counts_per_namespace_and_overall():
+    tables = build_tables(RESOURCES, now=NOW)
+
+    assert counts(tables.counts(tables.pod_status_counts, 'status'), 'status') == {
+        ('Running',): 2, ('Pending',): 1, ('Evicted',): 1}
+    assert counts(tables.counts(tables.pod_status_counts, 'status', 'default'), 'status') == {
+        ('Running',): 1, ('Pending',): 1}
+    assert counts(tables.counts(tables.service_type_counts, 'type', 'kube-system'), 'type') == {}
+
+
+def test_empty_snapshot():
+    tables = build_tables({})
+
+    assert tables.namespaces == []
+    assert tables.pods.empty and tables.nodes.empty
+    assert tables.counts(tables.pod_status_counts, 'status').empty
+    assert tables.loaded == frozenset()
+
+
+def test_loaded_kinds():
+    tables = build_tables({'namespaces': RESOURCES['namespaces'], 'pods': RESOURCES['pods']}, NOW)
+
+    assert tables.loaded == {'namespaces', 'pods'}
+    assert tables.nodes.empty and len(tables.pods) == 4
+    assert set(tables.namespace_counts['resource_type']) == {'pods'}
+
+    namespaces_only = build_tables({'namespaces': RESOURCES['namespaces']}, NOW)
+    assert namespaces_only.namespace_counts.empty
+    assert list(namespaces_only.namespace_counts.columns) == ['namespace', 'resource_type', 'count']
+
+
+def test_pages_are_sorted_once_and_sliced():
+    tables = build_tables({'pods': parse_pods([pod(f'pod-{i:03}', f'ns-{i % 3}', 'Running', restarts=i % 7)
+                                               for i in range(250)])}, now=NOW)
+
+    first, pages = tables.page('pods', sort_by='restarts', descending=True, size=100)
+    assert pages == 3 and len(first) == 100
+    assert first['restarts'].tolist() == sorted(first['restarts'].tolist(), reverse=True)
+    assert tables.order('pods', 'restarts', True) is tables.order('pods', 'restarts', True)
+
+    last, _ = tables.page('pods', number=99, size=100)
+    assert last['name'].tolist() == [f'pod-{i:03}' for i in range(200, 250)]
+
+
+def test_pages_of_filtered_rows_keep_the_sort_order():
+    tables = build_tables({'pods': parse_pods([pod(f'pod-{i:03}', f'ns-{i % 3}', 'Running', restarts=i % 7)
+                                               for i in range(250)])}, now=NOW)
+
+    rows = tables.kind('pods', 'ns-1')
+    page, pages = tables.page('pods', rows, sort_by='name', descending=True, number=2, size=50)
+    assert pages == 2
+    assert page['name'].tolist() == sorted(rows['name'], reverse=True)[50:]
+    assert set(page['namespace']) == {'ns-1'}
+
+
+def test_age_sorts_by_creation_time():
+    tables = build_tables({'pods': parse_pods([
+        dict(pod('old', 'default', 'Running'), metadata={'name': 'old', 'creationTimestamp': '2024-12-01T00:00:00Z'}),
+        dict(pod('new', 'default', 'Running'), metadata={'name': 'new', 'creationTimestamp': '2025-01-09T23:00:00Z'}),
+        dict(pod('mid', 'default', 'Running'), metadata={'name': 'mid', 'creationTimestamp': '2025-01-08T00:00:00Z'}),
+    ])}, now=NOW)
+
+    page, _ = tables.page('pods', sort_by='age')
+    assert page[['name', 'age']].values.tolist() == [['new', '1h'], ['mid', '2d'], ['old', '40d']]